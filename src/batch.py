@@ -0,0 +1,108 @@
+"""Batch analysis of captures
+Validates every query interval of a set of captures in parallel, using a process per CPU core,
+and writes the merged results of all captures to a CSV file.
+
+Usage:
+    python src/batch.py output/ "captures/**/*.pcapng" --output output/batch_results.csv
+
+Directories are searched for pcap and pcapng files, other arguments are used as glob pattern.
+The captures are streamed by the workers and the workers are restarted regularly,
+so the memory usage of each worker stays bounded, also for large captures.
+"""
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from configuration import IGMPV3_SUPPORT
+import lib.cache as cache
+import lib.utils as utils
+
+CAPTURE_EXTENSIONS = (".pcap", ".pcapng", ".cap", ".pcap.gz")
+RESULT_FIELDS = [
+    "file",
+    "version",
+    "intervals",
+    "devices",
+    "passed",
+    "failed",
+    "reports",
+    "reports_before_first_query",
+    "min_response_time",
+    "median_response_time",
+    "max_response_time",
+    "error",
+]
+# Restart a worker after this many captures, so memory held after a large capture is returned to the system
+TASKS_PER_WORKER = 16
+
+
+def find_captures(paths):
+    captures = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                captures += [os.path.join(root, f) for f in files if f.endswith(CAPTURE_EXTENSIONS)]
+        else:
+            captures += glob.glob(path, recursive=True)
+    return sorted(set(captures))
+
+
+def analyse_capture(pcap_file, versions):
+    """Validate all query intervals of a single capture
+    Returns a row for the results table per IGMP version.
+    """
+    rows = []
+    for version in versions:
+        row = {"file": pcap_file, "version": version}
+        try:
+            # The validators print every step, which is not useful when analysing many captures
+            with contextlib.redirect_stdout(io.StringIO()), cache.use():
+                results, summary = utils.validate_query_intervals(pcap_file, version)
+            row.update(summary)
+            errors = [result["error"] for result in results if result["error"] is not None]
+            if errors:
+                row["error"] = errors[0].splitlines()[0]
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the IGMP query intervals of a set of captures")
+    parser.add_argument("paths", nargs="+", help="capture files, directories or glob patterns")
+    parser.add_argument("--output", default="output/batch_results.csv", help="CSV file to write the results to")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    captures = find_captures(args.paths)
+    if not captures:
+        print("No captures found")
+        return 1
+    versions = ["v2", "v3"] if IGMPV3_SUPPORT else ["v2"]
+    print(f"Analysing {len(captures)} captures with {args.jobs} workers")
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.jobs, max_tasks_per_child=TASKS_PER_WORKER) as executor:
+        for capture_rows in executor.map(analyse_capture, captures, [versions] * len(captures)):
+            for row in capture_rows:
+                status = row.get("error") or f"{row.get('passed')}/{row.get('intervals')} intervals passed"
+                print(f"{row['file']} ({row['version']}): {status}")
+            rows += capture_rows
+
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Results written to {args.output}")
+
+    return 1 if any(row.get("error") for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
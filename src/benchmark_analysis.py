@@ -0,0 +1,187 @@
+"""Analysis benchmark
+Times and memory-profiles the extraction and validation functions against a synthetic capture corpus,
+so performance regressions of the analysis can be detected between releases.
+
+Usage:
+    python src/benchmark_analysis.py --scenario small medium large
+    python src/benchmark_analysis.py --devices 10 --groups 100 --intervals 50 --sacn-ratio 2 --pcapng
+    python src/benchmark_analysis.py --scenario large --json output/benchmark_analysis.json
+
+The captures are generated in the corpus directory the first time and reused afterwards, the same scenario
+always results in the same capture. Every capture has to pass the validation, otherwise its benchmarks are
+skipped and a non-zero exit code is returned. The execution time is the fastest of the repeats, the memory is the peak
+of the memory allocated by Python and NumPy during a separate run, as traced by tracemalloc.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tracemalloc
+import warnings
+from time import perf_counter
+
+import lib.cache as cache
+import lib.corpus as corpus
+import lib.packet as packet
+import lib.pcapfile as pcapfile
+import lib.timing as timing
+import lib.utils as utils
+
+
+def _count_frames(capture):
+    return sum(1 for _ in pcapfile.iter_frames(capture))
+
+
+def _extract_igmp_events(capture):
+    return packet.extract_igmp_events(capture)
+
+
+def _read_igmp_columns(capture):
+    return packet.read_igmp_columns(capture)
+
+
+def _get_membership_reports(capture):
+    # Without the event cache, to measure the parsing
+    packet._event_cache.clear()
+    return packet.get_v2_membership_reports(capture), packet.get_v3_membership_reports(capture)
+
+
+def _analyse_timing_per_source(capture):
+    columns = packet.read_igmp_columns(capture)
+    return timing.analyse_timing_per_key(columns["time_ns"][0], columns["time_ns"], columns["src"])
+
+
+def _validate_query_intervals(capture, version):
+    return utils.validate_query_intervals(capture, version)
+
+
+def _validate_query_intervals_cached(capture, version):
+    # Only the first run validates the capture, the other runs are served from the analysis cache
+    return utils.validate_query_intervals(capture, version)
+
+
+BENCHMARKS = {
+    "iter_frames": _count_frames,
+    "extract_igmp_events": _extract_igmp_events,
+    "read_igmp_columns": _read_igmp_columns,
+    "get_membership_reports": _get_membership_reports,
+    "analyse_timing_per_source": _analyse_timing_per_source,
+    "validate_query_intervals": _validate_query_intervals,
+    "validate_query_intervals_cached": _validate_query_intervals_cached,
+}
+# Benchmarks which use the analysis cache, the others run with the cache disabled to measure the analysis
+CACHED_BENCHMARKS = (_validate_query_intervals_cached,)
+
+
+def corpus_capture(directory, devices, groups, intervals, version, sacn_ratio, pcapng):
+    """Get the path of the capture of a scenario, the capture is generated when it doesn't exist yet"""
+    extension = "pcapng" if pcapng else "pcap"
+    capture = os.path.join(directory, f"{devices}d_{groups}g_{intervals}i_{version}_sacn{sacn_ratio}.{extension}")
+    if not os.path.exists(capture):
+        os.makedirs(directory, exist_ok=True)
+        print(f"Generating {capture}")
+        corpus.generate_capture(capture, devices=devices, groups=groups, intervals=intervals, version=version,
+                                sacn_ratio=sacn_ratio, pcapng=pcapng)
+    return capture
+
+
+def validate_capture(capture, version):
+    """Validate every query interval of a capture, the benchmarks of a capture which doesn't validate would only
+    measure the failure path. Returns the errors of the failed query intervals.
+    """
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings(), cache.use(False):
+        warnings.simplefilter("ignore")
+        results, _ = utils.validate_query_intervals(capture, version)
+    return [result["error"] for result in results if result["error"] is not None]
+
+
+def run_benchmark(function, capture, version, repeat):
+    """Run a benchmark function, returns the fastest execution time and the peak traced memory"""
+    args = (capture, version) if function in (_validate_query_intervals, _validate_query_intervals_cached) \
+        else (capture,)
+    use_cache = cache.use(function in CACHED_BENCHMARKS)
+    # The validators print every step and warn about multiple sources, which is not useful here
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings(), use_cache:
+        warnings.simplefilter("ignore")
+        times = []
+        for _ in range(repeat):
+            start = perf_counter()
+            function(*args)
+            times.append(perf_counter() - start)
+
+        tracemalloc.start()
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def benchmark_capture(capture, version, names, repeat):
+    frames = _count_frames(capture)
+    size = os.path.getsize(capture)
+    print(f"{capture}: {frames} frames, {size / 1e6:.1f} MB")
+    results = []
+    for name in names:
+        elapsed, peak = run_benchmark(BENCHMARKS[name], capture, version, repeat)
+        result = {
+            "capture": os.path.basename(capture),
+            "function": name,
+            "frames": frames,
+            "seconds": elapsed,
+            "frames_per_second": frames / elapsed,
+            "megabytes_per_second": size / 1e6 / elapsed,
+            "peak_memory": peak,
+        }
+        print(f"  {name:<28} {elapsed * 1000:>10.1f} ms {result['frames_per_second']:>12.0f} frames/s "
+              f"{result['megabytes_per_second']:>8.1f} MB/s {peak / 1e6:>9.1f} MB peak")
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the capture analysis against a synthetic corpus")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(corpus.SCENARIOS), help="predefined scenarios")
+    parser.add_argument("--devices", type=int, default=1, help="number of devices")
+    parser.add_argument("--groups", type=int, default=10, help="number of groups per device")
+    parser.add_argument("--intervals", type=int, default=10, help="number of query intervals")
+    parser.add_argument("--version", choices=["v2", "v3"], default="v2", help="IGMP version")
+    parser.add_argument("--sacn-ratio", type=float, default=0, help="background sACN packets per IGMP packet")
+    parser.add_argument("--pcapng", action="store_true", help="generate pcapng instead of pcap captures")
+    parser.add_argument("--corpus", default="output/corpus", help="directory of the generated captures")
+    parser.add_argument("--benchmark", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="functions to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs per function")
+    parser.add_argument("--json", help="file to write the results to")
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        scenarios = [corpus.SCENARIOS[name] for name in args.scenario]
+    else:
+        scenarios = [{"devices": args.devices, "groups": args.groups, "intervals": args.intervals,
+                      "version": args.version, "sacn_ratio": args.sacn_ratio}]
+
+    results = []
+    failed = []
+    for scenario in scenarios:
+        capture = corpus_capture(args.corpus, pcapng=args.pcapng, **scenario)
+        errors = validate_capture(capture, scenario["version"])
+        if errors:
+            print(f"{len(errors)} query intervals of {capture} failed, first error: {errors[0]}")
+            failed.append(capture)
+            continue
+        results += benchmark_capture(capture, scenario["version"], args.benchmark, args.repeat)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    if failed:
+        print(f"The captures {', '.join(failed)} don't validate, their benchmarks were skipped")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Capture throughput benchmark
+Measures the maximum packet rate the capturing process can sustain without dropping packets.
+A local veth pair is created, IGMPv2 membership reports are transmitted on one end at increasing
+rates and captured on the other end with the same capture settings as used during the tests.
+
+Usage (Linux only, requires root privileges):
+    python src/benchmark_capture.py --rates 1000 10000 50000 100000 --duration 5
+
+The transmitted rate is reported as well, at high rates the sender itself can be the bottleneck.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+from time import perf_counter, sleep
+
+import configuration
+import lib.capture as capture
+import lib.packet as packet
+
+VETH_TX = "igmpbench0"
+VETH_RX = "igmpbench1"
+DEFAULT_RATES = [1000, 5000, 10000, 25000, 50000, 100000, 200000]
+# Time to let the capturing process empty the capture buffer after transmitting
+DRAIN_TIME = 1
+
+
+def membership_report_frame(index):
+    """Build an IGMPv2 membership report for group 239.255.x.y"""
+    return packet.build_igmp_v2_membership_report("00:11:22:33:44:66", "2.0.0.10", packet.group_address(index))
+
+
+def create_veth_pair():
+    subprocess.run(["ip", "link", "add", VETH_TX, "type", "veth", "peer", "name", VETH_RX], check=True)
+    for interface in (VETH_TX, VETH_RX):
+        subprocess.run(["ip", "link", "set", interface, "up"], check=True)
+
+
+def delete_veth_pair():
+    subprocess.run(["ip", "link", "del", VETH_TX], check=False)
+
+
+def transmit(sock, frames, rate, duration):
+    """Transmit frames at a constant rate, returns the number of transmitted frames and the duration"""
+    total = int(rate * duration)
+    sent = 0
+    start = perf_counter()
+    while sent < total:
+        # Transmit all frames which are due, so the average rate is kept when the sender falls behind
+        due = min(total, int((perf_counter() - start) * rate) + 1)
+        while sent < due:
+            sock.send(frames[sent % len(frames)])
+            sent += 1
+    return sent, perf_counter() - start
+
+
+def run_rate(sock, frames, rate, duration, directory, buffer_size, batch_size):
+    filename = os.path.join(directory, f"throughput_{rate}.pcap")
+    capture.start_capture(VETH_RX, filename, profile="igmp", buffer_size=buffer_size, batch_size=batch_size)
+    sleep(0.5)
+    sent, elapsed = transmit(sock, frames, rate, duration)
+    sleep(DRAIN_TIME)
+    capture.stop_capture(filename)
+    os.remove(filename)
+
+    statistics = capture.capture_statistics[filename]
+    lost = max(0, sent - statistics["packets"])
+    return {
+        "rate": rate,
+        "sent": sent,
+        "tx_rate": sent / elapsed,
+        "handled": statistics["packets"],
+        "lost": lost,
+        "dropped": statistics["dropped"],
+        "if_dropped": statistics["if_dropped"],
+        "max_batch": statistics["max_batch"],
+        "handling_time": statistics["handling_time"] / max(1, statistics["packets"]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the maximum packet rate captured without drops")
+    parser.add_argument("--rates", type=int, nargs="+", default=DEFAULT_RATES, help="packet rates to test (pps)")
+    parser.add_argument("--duration", type=float, default=5, help="duration of each rate in seconds")
+    parser.add_argument("--buffer-size", type=int, default=configuration.CAPTURE_BUFFER_SIZE,
+                        help="capture buffer size in bytes")
+    parser.add_argument("--batch-size", type=int, default=capture.DISPATCH_BATCH_SIZE,
+                        help="maximum number of packets per dispatch call")
+    args = parser.parse_args(argv)
+
+    if not sys.platform.startswith("linux"):
+        print("This benchmark requires Linux")
+        return 1
+
+    frames = [membership_report_frame(index) for index in range(256)]
+    create_veth_pair()
+    try:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+        sock.bind((VETH_TX, 0))
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            for rate in sorted(args.rates):
+                result = run_rate(sock, frames, rate, args.duration, directory, args.buffer_size, args.batch_size)
+                print(f"{result['rate']:>8} pps: transmitted {result['tx_rate']:.0f} pps, "
+                      f"handled {result['handled']}/{result['sent']}, lost {result['lost']}, "
+                      f"dropped {result['dropped']}, if_dropped {result['if_dropped']}, "
+                      f"largest batch {result['max_batch']}, {result['handling_time'] * 1e6:.1f} us per packet")
+                results.append(result)
+        sock.close()
+    finally:
+        delete_veth_pair()
+
+    sustained = [result["tx_rate"] for result in results if result["lost"] == 0 and not result["dropped"]]
+    if sustained:
+        print(f"Maximum rate captured without drops: {max(sustained):.0f} pps")
+    else:
+        print("Packets were dropped at every rate")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Startup benchmark
+Measures the time to import the modules of the different kinds of runs in a fresh interpreter, and checks
+that configuration validation and pcap analysis don't import scapy, which takes seconds to import.
+
+Usage:
+    python src/benchmark_startup.py
+    python src/benchmark_startup.py --capture output/v2_general_query_response.pcap --json output/startup.json
+
+The import time is the fastest of the repeats, the process time includes the startup of the interpreter.
+Returns a non-zero exit code when scapy is imported by a run which shouldn't need it.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+SRC_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Code of every kind of run, and whether it may import scapy
+SCENARIOS = {
+    # The imports of test_configuration.py
+    "configuration": ("import configuration\nimport lib.utils", False),
+    # The imports of test_pcap.py, batch.py and timeline.py, the capture is decoded when given
+    "pcap_analysis": ("import lib.utils\nimport lib.membership\nif capture:\n"
+                      "    lib.packet.extract_igmp_events(capture)", False),
+    # The imports of the live tests and building a membership query
+    "live": ("import lib.capture\nimport lib.utils\nlib.packet.build_igmp_v2_membership_query()", True),
+}
+
+RUNNER = """
+import sys
+from time import perf_counter
+sys.path.insert(0, {src!r})
+capture = {capture!r}
+start = perf_counter()
+exec({code!r})
+print(perf_counter() - start, any(name == "scapy" or name.startswith("scapy.") for name in sys.modules))
+"""
+
+
+def run_scenario(code, capture=None):
+    """Run the code of a scenario in a fresh interpreter
+    Returns the import time, the time of the whole process and whether scapy was imported.
+    """
+    runner = RUNNER.format(src=SRC_DIRECTORY, capture=capture, code=code)
+    start = perf_counter()
+    result = subprocess.run([sys.executable, "-c", runner], capture_output=True, text=True)
+    elapsed = perf_counter() - start
+    if result.returncode != 0:
+        raise Exception(f"Scenario failed:\n{result.stderr}")
+    seconds, scapy = result.stdout.split()[-2:]
+    return float(seconds), elapsed, scapy == "True"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the startup time of configuration, pcap and live runs")
+    parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help="kinds of runs to measure")
+    parser.add_argument("--capture", help="capture to decode in the pcap_analysis scenario")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs per scenario")
+    parser.add_argument("--json", help="file to write the results to")
+    args = parser.parse_args(argv)
+
+    results = []
+    failed = []
+    for name in args.scenario:
+        code, scapy_allowed = SCENARIOS[name]
+        runs = [run_scenario(code, args.capture) for _ in range(args.repeat)]
+        result = {
+            "scenario": name,
+            "import_seconds": min(run[0] for run in runs),
+            "process_seconds": min(run[1] for run in runs),
+            "scapy_imported": any(run[2] for run in runs),
+        }
+        print(f"  {name:<16} {result['import_seconds'] * 1000:>8.1f} ms import "
+              f"{result['process_seconds'] * 1000:>8.1f} ms process  scapy imported: {result['scapy_imported']}")
+        if result["scapy_imported"] and not scapy_allowed:
+            failed.append(name)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    if failed:
+        print(f"scapy was imported by {', '.join(failed)}, which should run without scapy")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -32,12 +32,93 @@ MGROUP_2 = "239.255.0.2"  # sACN universe 2
 # such a limit with the number of multicast addresses they would like to register
 IGMP_MEMBERSHIP_REPORT_THRESHOLD = 256
 
+# The querier (e.g. the CPU of a switch) handles membership reports at a limited rate and queues the
+# reports it can't handle immediately. The tests fail when the membership reports in any window of
+# 1, 10 or 100 ms exceed what such a querier can take: QUERIER_REPORT_BURST reports in its queue plus
+# QUERIER_REPORT_CAPACITY reports per second handled during the window.
+QUERIER_REPORT_CAPACITY = 1000  # reports per second
+QUERIER_REPORT_BURST = 50  # reports
+
+# Set the capture profile used during the tests
+# - "igmp": only IGMP packets are captured, using a filter in the kernel. This keeps the CPU load,
+#   disk usage and the risk of dropping packets low on busy networks, e.g. with a lot of sACN traffic.
+# - "full": all traffic is captured
+CAPTURE_PROFILE = "igmp"
+
+# Size of the capture buffer in the kernel in bytes. Packets are stored in this buffer until the
+# capturing process handles them, increase it when captures report dropped packets.
+# Set to None to use the default size of pcap.
+CAPTURE_BUFFER_SIZE = 8 * 1024 * 1024
+
+# Source of the capture timestamps
+# - "host": timestamps of the system clock, taken by the kernel
+# - "adapter": timestamps taken by the network adapter, synchronized with the system clock.
+#   Host timestamps are used when the adapter doesn't support it.
+# Adapter timestamps and nanosecond precision require a pcapy binding exposing pcap_set_tstamp_type and
+# pcap_set_tstamp_precision. pcapy-ng 1.0.9 (docker/requirements.txt) doesn't, so its captures always
+# have microsecond precision host timestamps.
+CAPTURE_TIMESTAMP_TYPE = "host"
+
+# A single capture is made during the whole test session and the capture of each test is cut from it,
+# instead of starting a capturing process per test. Set this to the file to capture the whole session to,
+# or to False to start a capturing process per test.
+SESSION_CAPTURE = "output/session.pcap"
+
+# The phase timings and DUT metrics of every test (see src/lib/metrics.py) are added to the JUnit file
+# as properties and written to this JSON file, which is overwritten by every test session.
+# Set to None to only add them to the JUnit file.
+METRICS_FILE = "output/test_metrics.json"
+
+# Optionally set the MAC and/or IP address of the DUT to only capture IGMP packets
+# from the DUT (and the queries transmitted by this tool) in the "igmp" capture profile.
+DUT_MAC = ""
+DUT_IP = ""
+
+# Set this to True to test all devices connected to the test computer at once.
+# A single query is transmitted per test and the membership reports are grouped
+# per device (source MAC address), every device is validated separately.
+MULTI_DUT = False
+
+# When testing multiple devices at once, the MAC or IP addresses of the DUTs can be
+# listed here so that a DUT which doesn't respond at all is also detected.
+# MULTI_DUT_DEVICES = ["00:11:22:33:44:66", "2.0.0.10"]
+MULTI_DUT_DEVICES = []
+
+# The querier load test transmits a lot of membership queries per second, from multiple querier IPs and
+# mixing IGMPv2 and IGMPv3, to validate that the DUT keeps responding when the querier is noisy.
+# Set this to the query rates (queries per second) to test, the rates are tested in increasing order.
+# QUERY_LOAD_RATES = [10, 100, 1000, 5000]
+QUERY_LOAD_RATES = []
+# Time to transmit queries at every rate, in seconds
+QUERY_LOAD_DURATION = 10
+# Maximum fraction of the probe queries for MGROUP_1 which the DUT may leave unanswered during the load
+QUERY_LOAD_MAX_LOSS = 0.0
+
+# The response time distribution test transmits this many group specific queries for MGROUP_1 within a
+# single capture and tests whether the response times of the DUT are uniformly distributed over the
+# maximum response time. More queries detect smaller deviations. The test takes about 1.5 seconds per query
+# for each IGMP version, so it only runs when enabled, 0 skips the test.
+# RANDOMNESS_TRIALS = 50
+RANDOMNESS_TRIALS = 0
+# Maximum response time of the queries of the response time distribution test, in seconds
+RANDOMNESS_MAX_RESPONSE_TIME = 1
+# Significance level at which the response times are considered not uniformly distributed
+RANDOMNESS_SIGNIFICANCE = 0.01
+
 # It is possible to test the contents of a PCAP file instead of running 'live'
 # against a device.
-# To do this, filter 1 IGMP query interval from the capture. Meaning: the capture
-# should only contain 1 IGMP query and the IGMP reports on this query.
+# The capture is split at every IGMP query and each query interval, meaning the
+# query and the IGMP reports until the next query, is validated separately.
 # If it is IGMPv3, make sure to enable IGMPV3_SUPPORT above.
 # Set the following parameter to the path to the pcap file
 # Run the test by appending `src/test_pcap.py` to the run command
 # PCAP_FILE = "output/my_capture.pcapng"
 PCAP_FILE = False
+
+# The IGMP packets and validation results of captures analysed offline are cached in this directory, so
+# unchanged captures aren't parsed and validated again when re-running test_pcap.py or batch.py. The cache
+# is keyed by the contents of the capture and the configuration values above, the captures of live tests
+# are not cached. Set to None to disable the cache.
+ANALYSIS_CACHE = "output/cache"
+# Maximum size of the analysis cache in bytes, the least recently used results are removed first
+ANALYSIS_CACHE_SIZE = 512 * 1024 * 1024
@@ -0,0 +1,86 @@
+"""Test result properties
+Attaches the statistics of the captures made during a test to the test result,
+so they end up in the JUnit file. Packets lost by the capture can then be told apart
+from packets which were never transmitted by the DUT.
+The phase timings and DUT metrics of every test are attached as well, and written to
+the JSON file configured in METRICS_FILE, so they can be compared between runs.
+The capture of the whole test session is stopped at the end of the session.
+"""
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+import configuration
+import lib.metrics as metrics
+
+# Metrics of the tests of this session, written to METRICS_FILE after every test
+session_metrics = {"started": datetime.now(timezone.utc).isoformat(), "tests": []}
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    # The outcome of the test itself, used for the metrics file
+    if report.when == "call" or (report.when == "setup" and report.outcome != "passed"):
+        item.metrics_report = report
+
+
+@pytest.fixture(scope="session", autouse=True)
+def session_capture():
+    yield
+    # The session capture is started by the first test which captures
+    capture = sys.modules.get("lib.capture")
+    if capture is not None:
+        capture.stop_session_capture()
+
+
+@pytest.fixture(autouse=True)
+def capture_statistics(record_property):
+    # Only tests which capture import lib.capture, the other tests don't need pcapy
+    capture = sys.modules.get("lib.capture")
+    if capture is not None:
+        capture.capture_statistics.clear()
+    yield
+    capture = sys.modules.get("lib.capture")
+    if capture is None:
+        return
+    for filename, statistics in capture.capture_statistics.items():
+        for key, value in (statistics or {}).items():
+            record_property(f"capture {filename} {key}", value)
+
+
+@pytest.fixture(autouse=True)
+def test_metrics(request, record_property):
+    metrics.clear()
+    yield
+    summary = metrics.summary()
+    for name, seconds in summary["phases"].items():
+        record_property(f"phase {name} seconds", round(seconds, 6))
+    for name, value in summary["dut"].items():
+        if isinstance(value, dict):
+            for key, number in value.items():
+                record_property(f"dut {name} {key}", number)
+        else:
+            record_property(f"dut {name}", value)
+
+    if not configuration.METRICS_FILE:
+        return
+    report = getattr(request.node, "metrics_report", None)
+    capture = sys.modules.get("lib.capture")
+    session_metrics["tests"].append({
+        "test": request.node.nodeid,
+        "outcome": report.outcome if report is not None else None,
+        "duration": report.duration if report is not None else None,
+        "phases": summary["phases"],
+        "dut": summary["dut"],
+        "capture": dict(capture.capture_statistics) if capture is not None else {},
+        })
+    directory = os.path.dirname(configuration.METRICS_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(configuration.METRICS_FILE, "w") as f:
+        json.dump(session_metrics, f, indent=2, default=str)
@@ -0,0 +1,156 @@
+"""Analysis cache
+Persistent cache of the analysis results of captures, like the IGMP event table and the results of the
+query interval validation, so an unchanged capture is not parsed and validated again in a new run.
+Entries are keyed by a hash of the contents of the capture, so a copied or touched capture is still found,
+together with the configuration values the result depends on. The entries are pickled to files in the
+ANALYSIS_CACHE directory, the least recently used entries are removed when the total size of the entries
+exceeds ANALYSIS_CACHE_SIZE.
+The cache is only used for offline analysis (test_pcap.py, batch.py and the benchmarks), within use().
+The captures of live tests are written once and analysed right away, caching them only costs time and disk space.
+"""
+import contextlib
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import configuration
+
+# Increase when the format of the cached results changes, so older entries are not used anymore
+CACHE_FORMAT = 2
+# Configuration values the validation results depend on
+VALIDATION_SETTINGS = (
+    "MGROUP_1",
+    "IGMP_MEMBERSHIP_REPORT_THRESHOLD",
+    "IGMPV3_SUPPORT",
+    "QUERIER_REPORT_CAPACITY",
+    "QUERIER_REPORT_BURST",
+)
+ENTRY_EXTENSION = ".pickle"
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+_active = False
+
+
+@functools.lru_cache(maxsize=256)
+def _digest(path, size, mtime_ns):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def capture_digest(capture):
+    """Get the SHA-256 hash of the contents of a capture
+    The hash is kept in memory for as long as the size and modification time of the capture don't change.
+    """
+    stat = os.stat(capture)
+    return _digest(os.path.abspath(capture), stat.st_size, stat.st_mtime_ns)
+
+
+def validation_settings():
+    """Get the configuration values the validation results depend on, to be part of the cache key"""
+    return tuple(getattr(configuration, name, None) for name in VALIDATION_SETTINGS)
+
+
+def cache_key(kind, capture, *values):
+    """Get the key of an analysis result of a capture
+    The key combines the kind of result, the hash of the capture contents and the values the result depends
+    on, e.g. the IGMP version or the validation settings.
+    """
+    h = hashlib.sha256(repr((CACHE_FORMAT, kind, capture_digest(capture), values)).encode())
+    return f"{kind}-{h.hexdigest()}"
+
+
+def _directory():
+    return getattr(configuration, "ANALYSIS_CACHE", None) if _active else None
+
+
+def active():
+    """Whether analysis results are read from and written to the cache"""
+    return bool(_directory())
+
+
+@contextlib.contextmanager
+def use(enable=True):
+    """Context in which the analysis cache is used, or not used when enable is False"""
+    global _active
+    previous, _active = _active, enable
+    try:
+        yield
+    finally:
+        _active = previous
+
+
+def load(key):
+    """Get a cached result, returns a tuple (found, result)"""
+    directory = _directory()
+    if not directory:
+        return False, None
+    path = os.path.join(directory, key + ENTRY_EXTENSION)
+    try:
+        with open(path, "rb") as f:
+            result = pickle.load(f)
+    except FileNotFoundError:
+        return False, None
+    except Exception as e:
+        # A corrupt or incompatible entry is a cache miss, it is replaced by the new result
+        print(f"Ignoring analysis cache entry {path}: {type(e).__name__}: {e}")
+        return False, None
+    # The modification time marks when an entry was last used, for the eviction
+    with contextlib.suppress(OSError):
+        os.utime(path)
+    return True, result
+
+
+def store(key, result):
+    """Store a result in the cache and evict the least recently used entries when the cache is full"""
+    directory = _directory()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    # Written to a temporary file first, so parallel processes never read a partially written entry
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, os.path.join(directory, key + ENTRY_EXTENSION))
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary)
+        raise
+    evict(directory, configuration.ANALYSIS_CACHE_SIZE)
+
+
+def evict(directory, max_size):
+    """Remove the least recently used entries until the total size of the entries is at most max_size bytes"""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith(ENTRY_EXTENSION):
+                with contextlib.suppress(FileNotFoundError):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        # Another process might have removed the entry already
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total -= size
+
+
+def cached(kind, capture, compute, *values):
+    """Get an analysis result of a capture from the cache, or compute and store it
+    compute is called without arguments when the result is not in the cache.
+    """
+    if not active():
+        return compute()
+    key = cache_key(kind, capture, *values)
+    found, result = load(key)
+    if not found:
+        result = compute()
+        store(key, result)
+    return result
@@ -3,11 +3,115 @@ import signal
 import traceback
 import select
 import sys
+import threading
+from time import perf_counter, time_ns
+import warnings
+import numpy as np
 import pcapy
+import configuration
+import lib.metrics as metrics
+import lib.packet as packet
+from lib.ringbuffer import RingBuffer
+
+# Record of a parsed IGMP event in the ring buffer: a row of lib.packet.read_igmp_columns with the time in
+# nanoseconds, so IGMPv3 membership reports result in a record per group record.
+EVENT_COLUMNS = tuple(column for column in packet.IGMP_COLUMNS if column[0] != "time")
+EVENT_RECORD_FORMAT = "<" + "".join(typecode for _, typecode in EVENT_COLUMNS)
+EVENT_BUFFER_SIZE = 4096  # records
+# Time in seconds between the reads of the event buffer by the test process, so the events are read before
+# they are overwritten: a buffer of EVENT_BUFFER_SIZE records keeps up with 40000 IGMP events per second
+EVENT_READ_INTERVAL = 0.1
+
+# Large enough for a full (VLAN tagged) Ethernet frame, since an IGMPv3 membership report
+# with a lot of group records can fill a whole frame.
+IGMP_SNAPLEN = 1522
+FULL_SNAPLEN = 65536
+
+# Maximum number of packets handled per pcap dispatch call. The capture buffer is drained with
+# consecutive dispatch calls, the stop event is checked in between.
+DISPATCH_BATCH_SIZE = 256
+# Time in seconds the capturing process waits for packets before checking the stop event
+WAKEUP_INTERVAL = 0.1
+
+# pcap timestamp types and precisions, see pcap-tstamp(7)
+PCAP_TSTAMP_TYPES = {
+    "host": 0,
+    "adapter": 3,
+}
+PCAP_TSTAMP_PRECISION_NANO = 1
+
+
+def igmp_filter(dut_mac="", dut_ip=""):
+    '''
+    Create a bpf filter only matching IGMP packets, optionally only the ones from the DUT
+
+    The queries transmitted by this tool are always matched, they are needed for the validation.
+    The first vlan keyword changes the offsets for the rest of the expression, so the untagged packets
+    are matched first and the VLAN tagged packets last, with the host filter repeated after the vlan
+    keyword. The ether src filters don't depend on the offset of the IP header.
+    '''
+    hosts = []
+    if dut_mac:
+        hosts.append(f"ether src {dut_mac}")
+    if dut_ip:
+        hosts.append(f"src host {dut_ip}")
+    if not hosts:
+        return "(ip proto 2 or (vlan and ip proto 2))"
+    hosts.append(f"ether src {packet.QUERIER_MAC}")
+    hosts = " or ".join(hosts)
+    return f"((ip proto 2 and ({hosts})) or (vlan and ip proto 2 and ({hosts})))"
+
+
+def capture_profile(profile):
+    '''
+    Get the CapturingProcess options of a capture profile
+
+    Args:
+        profile: "igmp" to only capture IGMP packets or "full" to capture all traffic
+
+    Returns:
+        dict: options passed to CapturingProcess
+    '''
+    if profile == "igmp":
+        return {
+            "bpf_filter": igmp_filter(configuration.DUT_MAC, configuration.DUT_IP),
+            "snaplen": IGMP_SNAPLEN,
+        }
+    if profile == "full":
+        return {"bpf_filter": None, "snaplen": FULL_SNAPLEN}
+    raise Exception(f'Unknown capture profile: {profile}')
+
+
+class GroupsReported:
+    '''
+    stop_cb which stops the capture once membership reports for all given groups are captured
+
+    Both IGMPv2 membership reports and the group records of IGMPv3 membership reports are taken into account.
+    Without groups, the capture is never stopped.
+    '''
+    def __init__(self, groups):
+        self.groups = set(groups)
+        self._remaining = {packet.ip_to_int(group) for group in groups}
+
+    def __call__(self, pkt):
+        if not self.groups:
+            return False
+        event = packet.decode_igmp_frame(pkt)
+        if event is None:
+            return False
+        _, type, data = event
+        if type == packet.IGMPMessageType.V2_MEMBERSHIP_REPORT.value:
+            self._remaining.discard(data.gaddr)
+        elif type == packet.IGMPMessageType.V3_MEMBERSHIP_REPORT.value:
+            for record in data.records:
+                self._remaining.discard(record.maddr)
+        return not self._remaining
 
 
 class CapturingProcess(Process):
-    def __init__(self, interface, filename, bpf_filter=None, stop_cb=None):
+    def __init__(self, interface, filename, bpf_filter=None, stop_cb=None, events=False,
+                 event_buffer_size=EVENT_BUFFER_SIZE, snaplen=FULL_SNAPLEN, buffer_size=None,
+                 batch_size=DISPATCH_BATCH_SIZE, timestamp_type="host"):
         '''
         Create CapturingProcess, creating a process for packet captures
 
@@ -19,14 +123,36 @@ class CapturingProcess(Process):
                     This must be set if you want to wait for a packet with waitfor_capture
                     The cb expects a pkt argument and returns a Bool.
                     When the cb returns True, the capturing stops
+            events: True to decode the captured IGMP messages in the capturing process and pass them to
+                    the test process while capturing, see read_events. Only needed when the capture file
+                    isn't analysed afterwards, it costs a ring buffer, a reader thread and the decoding.
+            event_buffer_size: number of parsed IGMP events which can be buffered
+                    between the capturing process and the test process, see read_events
+            snaplen: maximum number of bytes captured per packet
+            buffer_size: size of the capture buffer in the kernel in bytes, None to use the default of pcap.
+                    A larger buffer absorbs longer bursts of packets without dropping them.
+            batch_size: maximum number of packets handled per pcap dispatch call
+            timestamp_type: "host" for timestamps of the system clock, taken by the kernel, or "adapter"
+                    for timestamps taken by the network adapter, which has to be synchronized with the
+                    system clock. Host timestamps are used when the adapter doesn't support it.
         '''
         self.interface = interface
         self.filename = filename
         self.bpf_filter = bpf_filter
+        self.snaplen = snaplen
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.timestamp_type = timestamp_type
+        # Timestamp ticks per second, nanoseconds when supported by pcap
+        self._resolution = 1000000
         self.stop_cb = stop_cb
         self.ready_event = Event()
         self._parent_conn, self._child_conn = Pipe()
         self._exception = None
+        self._statistics = None
+        self._event_buffer = RingBuffer(EVENT_RECORD_FORMAT, event_buffer_size) if events else None
+        self._events_dropped = 0
+        self._event_records = []
 
         Process.__init__(self)
 
@@ -38,94 +164,552 @@ class CapturingProcess(Process):
 
     def start(self):
         Process.start(self)
+        if self._event_buffer is not None:
+            # Created after starting the process, so they are not passed to a spawned capturing process
+            self._events_lock = threading.Lock()
+            self._reader_stop = threading.Event()
+            self._reader = threading.Thread(target=self._read_events_loop, daemon=True)
+            self._reader.start()
         if not self.ready_event.wait(5):
             if self.exception:
                 _, traceback = self.exception
                 raise (Exception(traceback))
 
+    def _read_events_loop(self):
+        # The test process is mostly waiting while capturing, so the event buffer is read in the background
+        while not self._reader_stop.wait(EVENT_READ_INTERVAL):
+            self.read_events()
+
     def stop(self):
         self.ready_event.clear()
         if self.exception:
             _, traceback = self.exception
             raise (Exception(traceback))
 
-    def run(self):  # noqa: C901
-        print("Starting CapturingProcess on interface {} with '{}' as bpf filter and dumping data to {}"
-              .format(self.interface, self.bpf_filter, self.filename))
-        try:
-            cap = pcapy.open_live(self.interface, 65536, True, 10)
+    def _publish_event(self, hdr, pkt, linktype):
+        event = packet.decode_igmp_frame(pkt, linktype=linktype)
+        if event is None:
+            return
+        time = self._timestamp(hdr)
+        for row in packet.igmp_rows(*event):
+            self._event_buffer.put(time, *row)
 
-            if self.bpf_filter:
-                cap.setfilter(self.bpf_filter)
-            cap.setnonblock(True)
-            pcap_dumper = cap.dump_open(self.filename)
-            signal.signal(signal.SIGTERM, self._handle_capture_term)
+    def _timestamp(self, hdr):
+        '''
+        Get the timestamp of a captured packet as an integer number of nanoseconds since the epoch
+        '''
+        sec, frac = hdr.getts()
+        return sec * 1000000000 + frac * (1000000000 // self._resolution)
 
-            self.ready_event.set()
+    def read_events(self):
+        '''
+        Read the IGMP events decoded by the capturing process since the previous call
 
-            if not sys.platform.startswith('win'):
-                read_fds = [cap.getfd()]
-                write_fds = []
-                except_fds = []
+        The events are available while capturing, without reading the capture file.
+        Only available when the capture was created with events=True.
 
+        Returns:
+            dict: the events in the columns of lib.packet.read_igmp_columns, with a row per IGMP message,
+                  or per group record for IGMPv3 membership reports
+        '''
+        if self._event_buffer is None:
+            raise Exception(f'Capture \'{self.filename}\' doesn\'t decode IGMP events, create it with events=True')
+        with self._events_lock:
+            records = self._event_buffer.get()
+            self._event_records += records
+            if self._event_buffer.dropped > self._events_dropped:
+                self._events_dropped = self._event_buffer.dropped
+                print(f"Capture {self.filename}: {self._events_dropped} IGMP events were dropped")
+        return _event_columns(records)
+
+    @property
+    def events(self):
+        '''
+        All IGMP events read so far, see read_events, or None when the capture doesn't decode IGMP events
+        '''
+        if self._event_buffer is None:
+            return None
+        return _event_columns(self._event_records)
+
+    def close_events(self):
+        if self._event_buffer is None:
+            return
+        self._reader_stop.set()
+        self._reader.join()
+        self.read_events()
+        self._event_buffer.close(unlink=True)
+
+    def _handle_packet(self, pcap_dumper, linktype, hdr, pkt):
+        start = perf_counter()
+        pcap_dumper.dump(hdr, pkt)
+        if self._event_buffer is not None:
+            self._publish_event(hdr, pkt, linktype)
+        stop = self._handle_callbacks(hdr, pkt)
+
+        handling_time = perf_counter() - start
+        self._stats["packets"] += 1
+        self._stats["handling_time"] += handling_time
+        if handling_time > self._stats["max_handling_time"]:
+            self._stats["max_handling_time"] = handling_time
+        return stop
+
+    def _handle_callbacks(self, hdr, pkt):
+        '''
+        Call the stop_cb for a captured packet, the time is part of the handling time of the packet
+
+        Returns:
+            bool: True when the stop_cb requested to stop capturing
+        '''
+        if not self.stop_cb:
+            return False
+        return self._call_stop_cb(self.stop_cb, pkt)
+
+    def _call_stop_cb(self, stop_cb, pkt):
+        start = perf_counter()
+        try:
+            return stop_cb(pkt)
+        finally:
+            self._stats["stop_cb_time"] += perf_counter() - start
+
+    def _dispatch(self, cap, pcap_dumper, linktype):
+        '''
+        Handle all packets which are available in the capture buffer, in batches of at most batch_size packets
+
+        Returns:
+            bool: True when the stop_cb requested to stop capturing
+        '''
+        stop = False
+
+        def handle(hdr, pkt):
+            nonlocal stop
+            # The remaining packets of the batch are discarded once the stop_cb requested to stop
+            if stop or hdr is None:
+                return
+            stop = self._handle_packet(pcap_dumper, linktype, hdr, pkt)
+
+        while not stop and self.ready_event.is_set():
+            count = cap.dispatch(self.batch_size, handle)
+            if count <= 0:
+                break
+            self._stats["batches"] += 1
+            if count > self._stats["max_batch"]:
+                self._stats["max_batch"] = count
+        return stop
+
+    def _open(self):
+        if not hasattr(pcapy, "create"):
+            return pcapy.open_live(self.interface, self.snaplen, True, 10)
+
+        # The buffer size and the timestamp options can only be set before the capture is activated
+        cap = pcapy.create(self.interface)
+        cap.set_snaplen(self.snaplen)
+        cap.set_promisc(1)
+        cap.set_timeout(10)
+        if self.buffer_size:
+            cap.set_buffer_size(self.buffer_size)
+        # The timestamp options need a pcapy binding exposing pcap_set_tstamp_precision and pcap_set_tstamp_type,
+        # which pcapy-ng 1.0.9 doesn't. The default is microsecond precision host timestamps.
+        if not hasattr(cap, "set_tstamp_precision"):
+            print("The pcapy binding doesn't support the timestamp precision, using microsecond timestamps")
+        else:
             try:
-                while self.ready_event.is_set():
-                    if sys.platform.startswith('win'):
-                        hdr, pkt = cap.next()
+                cap.set_tstamp_precision(PCAP_TSTAMP_PRECISION_NANO)
+                self._resolution = 1000000000
+            except Exception:
+                print(f"Interface {self.interface} doesn't support nanosecond timestamps, "
+                      f"using microsecond timestamps")
+        if self.timestamp_type != "host":
+            if not hasattr(cap, "set_tstamp_type"):
+                print(f"The pcapy binding doesn't support timestamp types, using host timestamps instead of "
+                      f"{self.timestamp_type} timestamps")
+            else:
+                try:
+                    cap.set_tstamp_type(PCAP_TSTAMP_TYPES[self.timestamp_type])
+                except Exception:
+                    print(f"Interface {self.interface} doesn't support {self.timestamp_type} timestamps, "
+                          f"using host timestamps")
+        cap.activate()
+        return cap
 
-                        if hdr is None:
-                            continue
+    @staticmethod
+    def _pcap_stats(cap):
+        try:
+            received, dropped, if_dropped = cap.stats()
+        except Exception:
+            # Not all capture sources support statistics, e.g. capture files
+            received, dropped, if_dropped = None, None, None
+        return {"received": received, "dropped": dropped, "if_dropped": if_dropped}
 
-                        pcap_dumper.dump(hdr, pkt)
+    def _send_statistics(self, cap):
+        self._stats.update(self._pcap_stats(cap))
+        self._child_conn.send(("statistics", self._stats))
 
-                        if self.stop_cb:
-                            if self.stop_cb(pkt):
-                                break
-                    else:
-                        # use select because while we're in a blocking cap.next() signals aren't delivered,
-                        # and this process wouldn't terminate
-                        readable, _, _ = select.select(read_fds, write_fds, except_fds, 0.1)
+    def _capture_loop(self, cap, pcap_dumper, linktype):
+        if not sys.platform.startswith('win'):
+            read_fds = [cap.getfd()]
 
-                        if cap.getfd() in readable:
-                            hdr, pkt = cap.next()
+        while self.ready_event.is_set():
+            if not sys.platform.startswith('win'):
+                # use select because while we're blocked in pcap, signals aren't delivered,
+                # and this process wouldn't terminate
+                readable, _, _ = select.select(read_fds, [], [], WAKEUP_INTERVAL)
+                self._stats["wakeups"] += 1
+                if not readable:
+                    continue
 
-                            if hdr is None:
-                                continue
+            if self._dispatch(cap, pcap_dumper, linktype):
+                break
 
-                            pcap_dumper.dump(hdr, pkt)
+    def run(self):
+        print("Starting CapturingProcess on interface {} with '{}' as bpf filter and dumping data to {}"
+              .format(self.interface, self.bpf_filter, self.filename))
+        self._stats = {
+            "packets": 0,
+            "handling_time": 0.0,
+            "max_handling_time": 0.0,
+            "stop_cb_time": 0.0,
+            "wakeups": 0,
+            "batches": 0,
+            "max_batch": 0,
+        }
+        try:
+            cap = self._open()
 
-                            if self.stop_cb:
-                                if self.stop_cb(pkt):
-                                    break
+            if self.bpf_filter:
+                cap.setfilter(self.bpf_filter)
+            cap.setnonblock(True)
+            pcap_dumper = cap.dump_open(self.filename)
+            linktype = cap.datalink()
+            signal.signal(signal.SIGTERM, self._handle_capture_term)
 
+            self.ready_event.set()
+
+            try:
+                self._capture_loop(cap, pcap_dumper, linktype)
             finally:
                 self.ready_event.clear()
+                # Also sent when the process is terminated, the SIGTERM handler exits through here
+                self._send_statistics(cap)
                 cap.close()
                 pcap_dumper.close()
                 del pcap_dumper
         except Exception as e:
             tb = traceback.format_exc()
-            self._child_conn.send((e, tb))
+            self._child_conn.send(("exception", (e, tb)))
+
+    def _handle_message(self, kind, value):
+        if kind == "exception":
+            self._exception = value
+        elif kind == "statistics":
+            self._statistics = value
+
+    def _receive(self):
+        while self._parent_conn.poll():
+            self._handle_message(*self._parent_conn.recv())
 
     @property
     def exception(self):
-        if self._parent_conn.poll():
-            self._exception = self._parent_conn.recv()
+        self._receive()
         return self._exception
 
+    @property
+    def statistics(self):
+        '''
+        Statistics of the capture, available after the capturing process stopped
+
+        Returns:
+            dict: the number of packets received, dropped by the kernel (dropped) and dropped by the interface
+                  (if_dropped) as reported by pcap, the number of packets handled, the total and maximum time
+                  spent handling a single packet and the time spent in the stop_cb (in seconds), the number of
+                  select wakeups, the number of dispatch batches and the size of the largest batch (max_batch)
+                  and, when the capture decodes IGMP events, the number of events dropped between the processes
+                  (events_dropped). None if the capturing process didn't report any statistics.
+        '''
+        self._receive()
+        if self._statistics is None:
+            return None
+        if self._event_buffer is None:
+            return dict(self._statistics)
+        return dict(self._statistics, events_dropped=self._event_buffer.dropped)
+
+
+class SessionCapturingProcess(CapturingProcess):
+    def __init__(self, interface, filename, **kwargs):
+        '''
+        Create SessionCapturingProcess, a CapturingProcess capturing during a whole test session
+
+        A single capturing process captures to filename during the whole session, instead of a capturing
+        process per test. A test opens a capture window with open_window. The packets captured while the
+        window is open are also written to the capture file of the window, so every test still gets its
+        own capture file, without starting and stopping a capturing process.
+
+        Args:
+            interface: interface to capture on
+            filename: filename to capture the whole session to
+            **kwargs: options passed to CapturingProcess
+        '''
+        CapturingProcess.__init__(self, interface, filename, **kwargs)
+        self._command_conn, self._child_command_conn = Pipe()
+        self._windows = {}
+        self._opened_windows = {}
+        self._closed_windows = {}
+        # Stop the session capture when the test process exits without stopping it
+        self.daemon = True
+
+    def _capture_loop(self, cap, pcap_dumper, linktype):
+        self._cap = cap
+        self._window_dumpers = {}
+        if not sys.platform.startswith('win'):
+            read_fds = [cap.getfd(), self._child_command_conn.fileno()]
+
+        try:
+            while self.ready_event.is_set():
+                if not sys.platform.startswith('win'):
+                    select.select(read_fds, [], [], WAKEUP_INTERVAL)
+                    self._stats["wakeups"] += 1
+
+                self._dispatch(cap, pcap_dumper, linktype)
+                # Commands are handled after the captured packets, so a window which is closed
+                # contains all packets captured before the close command
+                while self._child_command_conn.poll():
+                    self._handle_command(*self._child_command_conn.recv())
+        finally:
+            for filename in list(self._window_dumpers):
+                self._close_window(filename)
+
+    def _handle_callbacks(self, hdr, pkt):
+        # The packet is written to the open windows and their stop_cb closes the window instead of
+        # stopping the session capture, the time is part of the handling time like the stop_cb of a capture
+        if not self._window_dumpers:
+            return False
+        time = self._timestamp(hdr)
+        for filename, window in list(self._window_dumpers.items()):
+            # Packets still in the capture buffer when the window was opened don't belong to it
+            if time < window["start"]:
+                continue
+            window["dumper"].dump(hdr, pkt)
+            if window["stop_cb"] and self._call_stop_cb(window["stop_cb"], pkt):
+                self._close_window(filename)
+        return False
+
+    def _handle_command(self, command, filename, stop_cb):
+        if command == "open":
+            start = time_ns()
+            self._window_dumpers[filename] = {
+                "dumper": self._cap.dump_open(filename),
+                "stop_cb": stop_cb,
+                "start": start,
+                "stats": dict(self._stats),
+                "pcap_stats": self._pcap_stats(self._cap),
+            }
+            self._child_conn.send(("opened", (filename, start)))
+        elif command == "close" and filename in self._window_dumpers:
+            # A window might already be closed by its stop_cb
+            self._close_window(filename)
+
+    def _close_window(self, filename):
+        window = self._window_dumpers.pop(filename)
+        window["dumper"].close()
+        statistics = {}
+        for key, start in window["stats"].items():
+            # The maximum values are the ones of the whole session
+            statistics[key] = self._stats[key] if key.startswith("max_") else self._stats[key] - start
+        for key, value in self._pcap_stats(self._cap).items():
+            start = window["pcap_stats"][key]
+            statistics[key] = None if value is None or start is None else value - start
+        self._child_conn.send(("window", (filename, window["start"], time_ns(), statistics)))
+
+    def _handle_message(self, kind, value):
+        if kind == "opened":
+            filename, start = value
+            self._opened_windows[filename] = start
+        elif kind == "window":
+            filename, start, stop, statistics = value
+            self._closed_windows[filename] = (stop, statistics)
+        else:
+            CapturingProcess._handle_message(self, kind, value)
+
+    def _wait_message(self, condition, timeout):
+        deadline = perf_counter() + timeout
+        while not condition():
+            if self.exception:
+                _, traceback = self.exception
+                raise (Exception(traceback))
+            remaining = deadline - perf_counter()
+            if remaining <= 0 or not self.is_alive():
+                self._receive()
+                return condition()
+            if self._parent_conn.poll(min(remaining, WAKEUP_INTERVAL)):
+                self._receive()
+        return True
+
+    def open_window(self, filename, stop_cb=None):
+        '''
+        Start writing the captured packets to a capture file
+
+        Args:
+            filename: filename to capture to
+            stop_cb: optional callback to be called for each packet captured in the window,
+                    the window is closed when it returns True, see CapturingProcess
+
+        Returns:
+            CaptureWindow: the window, available once the capturing process started writing to the file
+        '''
+        self._command_conn.send(("open", filename, stop_cb))
+        if not self._wait_message(lambda: filename in self._opened_windows, 5):
+            raise Exception(f'Capture window \'{filename}\' could not be opened')
+        window = CaptureWindow(self, filename, self._opened_windows.pop(filename))
+        self._windows[filename] = window
+        return window
+
+    def close_window(self, filename, timeout=0):
+        '''
+        Stop writing the captured packets to the capture file of a window
+
+        Args:
+            filename: the filename of the window
+            timeout: time to wait for the stop_cb of the window to close the window
+
+        Returns:
+            bool: True if the window was not closed by its stop_cb within the timeout
+        '''
+        with metrics.phase("wait"):
+            timedout = not self._wait_message(lambda: filename in self._closed_windows, timeout)
+        if timedout:
+            self._command_conn.send(("close", filename, None))
+            if not self._wait_message(lambda: filename in self._closed_windows, 5):
+                raise Exception(f'Capture window \'{filename}\' could not be closed')
+
+        window = self._windows.pop(filename)
+        window.stop, window.statistics = self._closed_windows.pop(filename)
+        return timedout
+
+
+class CaptureWindow:
+    def __init__(self, session, filename, start):
+        '''
+        Create CaptureWindow, the part of a session capture belonging to a single capture file
+
+        Args:
+            session: the SessionCapturingProcess capturing the window
+            filename: filename the packets of the window are captured to
+            start: time at which the window was opened, in nanoseconds since the epoch
+        '''
+        self.session = session
+        self.filename = filename
+        self.start = start
+        self.stop = None
+        self.statistics = None
+
+
+def _event_columns(records):
+    records = np.array(records, dtype=[(name, typecode) for name, typecode in EVENT_COLUMNS])
+    columns = {name: records[name] for name, _ in EVENT_COLUMNS}
+    columns["time"] = columns["time_ns"] / 1000000000
+    return {name: columns[name] for name, _ in packet.IGMP_COLUMNS}
+
 
 capture_procs = {}
+# Statistics of the stopped captures by filename, see CapturingProcess.statistics
+capture_statistics = {}
+# The capturing process of the test session, see start_session_capture
+session_capture = None
+
+
+def _collect_statistics(filename, t):
+    statistics = t.statistics
+    capture_statistics[filename] = statistics
+    if statistics is None:
+        return
+    # Only the pcap counters are packets missing from the capture file. Events dropped from the event buffer
+    # were not read by the test process in time, the packets themselves are still in the capture file.
+    dropped = sum(statistics[key] or 0 for key in ("dropped", "if_dropped"))
+    if dropped:
+        warnings.warn(f"Capture {filename} lost packets (dropped: {statistics['dropped']}, "
+                      f"if_dropped: {statistics['if_dropped']}), "
+                      "missing packets might be caused by the capture instead of the DUT")
+    if statistics.get("events_dropped"):
+        print(f"Capture {filename}: {statistics['events_dropped']} IGMP events were overwritten in the event "
+              f"buffer before they were read, the packets are still in the capture file")
+
+
+def start_session_capture(interface, filename, profile=None, **kwargs):
+    '''
+    start capturing for the whole test session
+
+    Captures started afterwards with start_capture on the same interface, without other options than a stop_cb,
+    are cut from the session capture instead of starting a capturing process per capture.
+
+    Args:
+        interface: interface to capture on
+        filename: filename to capture the whole session to
+        profile: capture profile, see start_capture
+        **kwargs: options passed to SessionCapturingProcess
+    '''
+    global session_capture
+    if session_capture is not None:
+        raise Exception(f'Session capture already started: {session_capture.filename}')
+
+    options = capture_profile(profile or configuration.CAPTURE_PROFILE)
+    options["buffer_size"] = configuration.CAPTURE_BUFFER_SIZE
+    options["timestamp_type"] = configuration.CAPTURE_TIMESTAMP_TYPE
+    options.update(kwargs)
+    p = SessionCapturingProcess(interface, filename, **options)
+    p.start()
+    session_capture = p
+
 
+def stop_session_capture():
+    global session_capture
+    if session_capture is None:
+        return
 
-def start_capture(interface, filename, **kwargs):
+    t = session_capture
+    session_capture = None
+    for filename in list(t._windows):
+        t.close_window(filename)
+        del capture_procs[filename]
+    t.stop()
+    t.join(1)
+    if t.is_alive():
+        t.terminate()
+        t.join(8)  # wait for capture process to terminate
+
+    t.close_events()
+    if t.exitcode != 0:
+        raise Exception('Session capture \'{}\': process exited abnormally ({})'
+                        .format(t.filename, t.exitcode))
+
+
+def _use_session_capture(interface, profile, kwargs):
+    return (configuration.SESSION_CAPTURE and interface == configuration.IFACE and profile is None
+            and set(kwargs) <= {"stop_cb"})
+
+
+def _close_window(filename, timeout=0):
+    t = capture_procs[filename]
+    timedout = t.session.close_window(filename, timeout)
+    _collect_statistics(filename, t)
+    del capture_procs[filename]
+    return timedout
+
+
+@metrics.timed("capture_start")
+def start_capture(interface, filename, profile=None, **kwargs):
     '''
     start a capture
 
     This will start a new thread to capture packets.
+    When SESSION_CAPTURE is set in the configuration, captures on IFACE without other options than
+    a stop_cb are cut from a capture of the whole session, which is started by the first capture.
+    The session capture doesn't decode IGMP events, a capture started with events=True always gets
+    its own capturing process.
 
     Args:
         interface: interface to capture on
         filename: filename to capture to, this is also used as an identifier
+        profile: capture profile, see capture_profile. Defaults to CAPTURE_PROFILE of the configuration.
+                 Options in kwargs take precedence over the options of the profile.
         **kwargs: options passed to CapturingProcess
     '''
     if filename is None:
@@ -133,19 +717,41 @@ def start_capture(interface, filename, **kwargs):
     if filename in capture_procs:
         raise Exception(f'Trying to start duplicate capture: {filename}')
 
-    p = CapturingProcess(interface, filename, **kwargs)
+    if _use_session_capture(interface, profile, kwargs):
+        if session_capture is None:
+            start_session_capture(interface, configuration.SESSION_CAPTURE)
+        capture_procs[filename] = session_capture.open_window(filename, kwargs.get("stop_cb"))
+        return
+
+    options = capture_profile(profile or configuration.CAPTURE_PROFILE)
+    options["buffer_size"] = configuration.CAPTURE_BUFFER_SIZE
+    options["timestamp_type"] = configuration.CAPTURE_TIMESTAMP_TYPE
+    options.update(kwargs)
+    p = CapturingProcess(interface, filename, **options)
 
     capture_procs[filename] = p
     p.start()
 
 
+@metrics.timed("capture_stop")
 def stop_capture(filename):
+    '''
+    stop a capture
+
+    Returns:
+        dict: the IGMP events of the capture when it was started with events=True, see CapturingProcess.read_events,
+              otherwise None
+    '''
     if filename is None:
         raise Exception('Filename for capturing cannot be None')
     if filename not in capture_procs:
         raise Exception('Capture \'{}\'was never started'.format(filename))
 
     t = capture_procs[filename]
+    if isinstance(t, CaptureWindow):
+        _close_window(filename)
+        return None
+
     t.stop()
     t.join(1)
     if t.is_alive():
@@ -153,13 +759,34 @@ def stop_capture(filename):
         t.terminate()
         t.join(8)  # wait for capture process to terminate
 
+    t.close_events()
+    _collect_statistics(filename, t)
     if t.exitcode != 0:
         raise Exception('Capture \'{}\': process exited abnormally ({})'
                         .format(filename, t.exitcode))
 
     del capture_procs[filename]
+    return t.events
+
+
+def read_capture_events(filename):
+    '''
+    Read the IGMP events of a running capture since the previous call
+
+    Args:
+        filename: the same as passed to the start_capture call,
+                  this is used to identify the capture thread
+
+    Returns:
+        list: the new IGMP events, see CapturingProcess.read_events
+    '''
+    if filename not in capture_procs:
+        raise Exception('Capture \'{}\'was never started'.format(filename))
+
+    return capture_procs[filename].read_events()
 
 
+@metrics.timed("capture_stop")
 def waitfor_capture(filename, timeout=0):
     '''
     This will wait for the packet capturing thread
@@ -178,8 +805,11 @@ def waitfor_capture(filename, timeout=0):
         raise Exception('Capture \'{}\'was never started'.format(filename))
 
     t = capture_procs[filename]
+    if isinstance(t, CaptureWindow):
+        return _close_window(filename, timeout)
 
-    t.join(timeout)
+    with metrics.phase("wait"):
+        t.join(timeout)
 
     if t.is_alive():
         timedout = True
@@ -191,6 +821,8 @@ def waitfor_capture(filename, timeout=0):
         t.terminate()
         t.join(8)  # wait for capture process to terminate
 
+    t.close_events()
+    _collect_statistics(filename, t)
     if t.exitcode != 0:
         raise Exception('Capture \'{}\': process exited abnormally ({})'
                         .format(filename, t.exitcode))
@@ -0,0 +1,110 @@
+"""Synthetic capture corpus
+Generates deterministic captures of a scenario: a number of devices, each a member of a number of groups,
+responding to a number of query intervals, optionally with background sACN traffic.
+The same scenario and seed always result in the same capture, so the captures can be used to compare the
+performance of the analysis between releases.
+"""
+import random
+import socket
+import struct
+import lib.packet as packet
+from lib.pcapfile import PcapWriter, PcapngWriter
+
+SACN_PORT = 5568
+# Size of the UDP payload of an sACN data packet with 512 slots
+SACN_PAYLOAD_SIZE = 638
+# Timestamp of the first query of every capture, 2024-01-01 00:00:00 UTC
+START_TIME = 1704067200 * 1000000000
+
+SCENARIOS = {
+    "small": {"devices": 1, "groups": 10, "intervals": 10, "version": "v2", "sacn_ratio": 0},
+    "medium": {"devices": 10, "groups": 100, "intervals": 20, "version": "v3", "sacn_ratio": 1},
+    "large": {"devices": 100, "groups": 256, "intervals": 20, "version": "v2", "sacn_ratio": 4},
+}
+
+
+def device_address(index):
+    """Get the MAC and IP address of the device with the given index"""
+    return f"02:00:00:00:{(index >> 8) & 0xFF:02x}:{index & 0xFF:02x}", f"2.0.{(index >> 8) & 0xFF}.{index & 0xFF}"
+
+
+def sacn_frame(source_mac, source_ip, universe, sequence):
+    """Build an sACN data frame from the raw header bytes, the payload is not a valid E1.31 packet"""
+    group = packet.group_address(universe)
+    payload = bytes([sequence & 0xFF]) * SACN_PAYLOAD_SIZE
+    udp = struct.pack("!HHHH", SACN_PORT, SACN_PORT, 8 + len(payload), 0) + payload
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), 0, 0x4000, 64, socket.IPPROTO_UDP, 0,
+                     socket.inet_aton(source_ip), socket.inet_aton(group))
+    ip = ip[:10] + struct.pack("!H", packet.igmp_checksum(ip)) + ip[12:]
+    mac = b"\x01\x00\x5e" + socket.inet_aton(group)[1:]
+    mac = mac[:3] + bytes([mac[3] & 0x7F]) + mac[4:]
+    return mac + bytes.fromhex(source_mac.replace(":", "")) + b"\x08\x00" + ip + udp
+
+
+def _interval_frames(rng, start, devices, groups, version, sacn_ratio, query_interval, max_response_time):
+    query = packet.build_igmp_v2_membership_query if version == "v2" else packet.build_igmp_v3_membership_query
+    frames = [(start, query(mrcode=int(max_response_time * 10)))]
+    for device in range(1, devices + 1):
+        mac, ip = device_address(device)
+        if version == "v2":
+            for group in range(1, groups + 1):
+                delay = int(rng.uniform(0, max_response_time) * 1000000000)
+                report = packet.build_igmp_v2_membership_report(mac, ip, packet.group_address(group))
+                frames.append((start + delay, report))
+        else:
+            delay = int(rng.uniform(0, max_response_time) * 1000000000)
+            records = [(packet.GroupRecordType.MODE_IS_EXCLUDE.value, packet.group_address(group))
+                       for group in range(1, groups + 1)]
+            size = packet.V3_REPORT_MAX_RECORDS
+            for index in range(0, len(records), size):
+                report = packet.build_igmp_v3_membership_report(mac, ip, records[index:index + size])
+                # The membership reports of a device are transmitted right after each other
+                frames.append((start + delay + index * 1000, report))
+
+    # Background sACN traffic, spread over the whole query interval
+    interval = int(query_interval * 1000000000)
+    for sequence in range(int(len(frames) * sacn_ratio)):
+        device = rng.randint(1, devices)
+        mac, ip = device_address(device)
+        frames.append((start + rng.randrange(interval), sacn_frame(mac, ip, rng.randint(1, groups), sequence)))
+    frames.sort(key=lambda frame: frame[0])
+    return frames
+
+
+def generate_capture(capture, devices=1, groups=10, intervals=10, version="v2", sacn_ratio=0, query_interval=10,
+                     max_response_time=1, pcapng=False, nanosecond=False, seed=0):
+    '''
+    Generate a capture of a scenario
+
+    Every query interval starts with a general membership query, every device responds with a membership report
+    for each of its groups within the maximum response time. IGMPv3 devices combine their groups into as few
+    membership reports as possible. The query intervals are generated and written one at a time, so also
+    very large captures can be generated.
+
+    Args:
+        capture: path of the capture file
+        devices: number of devices
+        groups: number of groups per device, starting at 239.255.0.1
+        intervals: number of query intervals
+        version: IGMP version of the queries and membership reports, "v2" or "v3"
+        sacn_ratio: number of background sACN packets per IGMP packet
+        query_interval: time between the queries in seconds
+        max_response_time: maximum response time of the queries in seconds
+        pcapng: True to write a pcapng file instead of a pcap file
+        nanosecond: True to write nanosecond timestamps
+        seed: seed of the random response delays and background traffic
+
+    Returns:
+        int: the number of frames in the capture
+    '''
+    rng = random.Random(seed)
+    writer_class = PcapngWriter if pcapng else PcapWriter
+    count = 0
+    with writer_class(capture, nanosecond=nanosecond) as writer:
+        for interval in range(intervals):
+            start = START_TIME + interval * int(query_interval * 1000000000)
+            for timestamp, frame in _interval_frames(rng, start, devices, groups, version, sacn_ratio,
+                                                     query_interval, max_response_time):
+                writer.write(frame, timestamp)
+                count += 1
+    return count
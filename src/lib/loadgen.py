@@ -0,0 +1,108 @@
+"""Querier load generator
+Transmits IGMP membership queries at a target rate, to test how a DUT behaves when the querier is noisy:
+many general and group specific queries per second, from multiple querier IPs, mixing IGMPv2 and IGMPv3.
+The queries are built once with the lib.packet query builders and transmitted in batches from a persistent
+socket, on Linux with a single system call per batch.
+"""
+import random
+from time import perf_counter, sleep
+import lib.packet as packet
+
+DEFAULT_QUERIER_IPS = ("2.0.0.1", "2.0.0.2", "2.0.0.3", "10.0.0.1")
+# Group specific queries are sent for these groups, the DUT is not expected to be a member
+DEFAULT_LOAD_GROUPS = tuple(f"239.254.0.{index}" for index in range(1, 33))
+# Number of queries in the transmitted pattern, the pattern is repeated
+PATTERN_SIZE = 1024
+# The last part of every wait is busy waited, since sleep is not accurate enough for high rates
+SPIN_TIME = 0.002  # seconds
+
+
+class QueryLoadGenerator:
+    def __init__(self, interface, rate, querier_ips=DEFAULT_QUERIER_IPS, versions=("v2", "v3"),
+                 general_ratio=0.2, groups=DEFAULT_LOAD_GROUPS, mrcode=100, seed=0):
+        '''
+        Create QueryLoadGenerator
+
+        Args:
+            interface: interface to transmit on
+            rate: number of queries per second
+            querier_ips: source IP addresses of the queries, the queries are spread over them
+            versions: IGMP versions of the queries, "v2" and/or "v3"
+            general_ratio: fraction of general queries, the others are group specific queries. Note that the
+                    responses to general queries include membership reports for every group of the DUT,
+                    so use 0 when measuring the responses to probe queries, see run.
+            groups: groups of the group specific queries
+            mrcode: max response code of the queries
+            seed: seed of the random query pattern, the same seed results in the same pattern
+        '''
+        self.interface = interface
+        self.rate = rate
+        rng = random.Random(seed)
+        builders = {
+            "v2": packet.build_igmp_v2_membership_query,
+            "v3": packet.build_igmp_v3_membership_query,
+        }
+        self.frames = []
+        for _ in range(PATTERN_SIZE):
+            gaddr = "0.0.0.0" if rng.random() < general_ratio else rng.choice(groups)
+            build = builders[rng.choice(versions)]
+            self.frames.append(build(rng.choice(querier_ips), True, mrcode, gaddr))
+        # Transmit timestamps are not needed for the load, only for the probe queries
+        self._sender = packet.QuerySender(interface, tx_timestamps=False)
+        self._batch = self._sender.batch(self.frames)
+
+    def run(self, duration, probe_frame=None, probe_interval=1):
+        '''
+        Transmit queries at the configured rate
+
+        All queries which are due are transmitted at once, as a single batch, afterwards the generator waits until
+        the next query is due. When the generator falls behind, the average rate is kept by transmitting the missed
+        queries in the next batch.
+
+        Args:
+            duration: time to transmit queries in seconds
+            probe_frame: optional query, transmitted every probe_interval seconds in between the load, e.g. to
+                    measure the response of the DUT during the load. Every membership report for the probed group
+                    counts as a response, so the load shouldn't contain general queries or queries for that group.
+            probe_interval: time between the probe queries in seconds
+
+        Returns:
+            dict: the number of transmitted queries (sent), the achieved rate in queries per second (tx_rate),
+                  the largest number of queries transmitted at once (max_batch) and the transmit times of the
+                  probe queries in nanoseconds since the epoch (probe_times)
+        '''
+        probe_sender = packet.get_query_sender(self.interface) if probe_frame else None
+        probe_times = []
+        total = int(self.rate * duration)
+        sent = 0
+        index = 0
+        max_batch = 0
+        start = perf_counter()
+        next_probe = start if probe_frame else float("inf")
+        while True:
+            now = perf_counter()
+            if now - start >= duration:
+                break
+            if now >= next_probe:
+                probe_times.append(probe_sender.send(probe_frame))
+                next_probe += probe_interval
+
+            due = min(total, int((now - start) * self.rate) + 1)
+            max_batch = max(max_batch, due - sent)
+            index = self._batch.send(index, due - sent)
+            sent = due
+
+            wait = min(start + sent / self.rate, next_probe, start + duration) - perf_counter()
+            if wait > SPIN_TIME:
+                sleep(wait - SPIN_TIME)
+
+        elapsed = perf_counter() - start
+        return {
+            "sent": sent,
+            "tx_rate": sent / elapsed,
+            "max_batch": max_batch,
+            "probe_times": probe_times,
+        }
+
+    def close(self):
+        self._sender.close()
@@ -0,0 +1,276 @@
+"""IGMP membership timeline
+Replays the IGMP packets of a capture and reconstructs, for every host and group, the intervals during which
+the host was a member of the group. For IGMPv3 hosts the source filter (INCLUDE or EXCLUDE mode and the
+source list) is tracked as well, a membership interval ends when the filter of the host changes.
+The intervals are stored in an interval index, so questions like "which hosts were a member of a group at
+a given time" or "until when was the group joined after a leave" are answered in logarithmic time, also
+for captures covering hours of traffic of hundreds of hosts.
+All times are integer nanoseconds since the epoch, like the time_ns of the lib.packet message types.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+import lib.packet as packet
+
+# Group Membership Interval with the default robustness variable, query interval and
+# query response interval (RFC 3376 section 8.4), after which a silent member times out
+GROUP_MEMBERSHIP_INTERVAL = 260  # seconds
+
+MODE_INCLUDE = "include"
+MODE_EXCLUDE = "exclude"
+
+# Reasons why a membership interval ended
+END_LEAVE = "leave"
+END_TIMEOUT = "timeout"
+END_FILTER_CHANGE = "filter_change"
+END_CAPTURE = "end_of_capture"
+
+_EMPTY = frozenset()
+
+
+class MembershipInterval(namedtuple("MembershipInterval",
+                                    "host group start_ns end_ns mode sources last_report_ns end_reason")):
+    """Interval [start_ns, end_ns) during which a host was a member of a group with the same source filter
+    The host, group and sources are integer encoded addresses, see lib.packet.ip_to_int. IGMPv1 and IGMPv2
+    memberships are in EXCLUDE mode without sources. last_report_ns is the time of the last membership
+    report of the host for the group during the interval.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        sources = [packet.int_to_ip(source) for source in sorted(self.sources)]
+        return f"MembershipInterval(host={packet.int_to_ip(self.host)!r}, group={packet.int_to_ip(self.group)!r}, " \
+               f"start_ns={self.start_ns}, end_ns={self.end_ns}, mode={self.mode!r}, sources={sources}, " \
+               f"last_report_ns={self.last_report_ns}, end_reason={self.end_reason!r})"
+
+
+def _address(address):
+    return packet.ip_to_int(address) if isinstance(address, str) else address
+
+
+def _filter_record(mode, sources, rtype, record_sources):
+    """Apply an IGMPv3 group record to a source filter, as a router does (RFC 3376 section 6.4)
+    Returns the new mode and sources.
+    """
+    if rtype in (packet.GroupRecordType.MODE_IS_INCLUDE.value, packet.GroupRecordType.CHANGE_TO_INCLUDE_MODE.value):
+        return MODE_INCLUDE, record_sources
+    if rtype in (packet.GroupRecordType.MODE_IS_EXCLUDE.value, packet.GroupRecordType.CHANGE_TO_EXCLUDE_MODE.value):
+        return MODE_EXCLUDE, record_sources
+    if rtype == packet.GroupRecordType.ALLOW_NEW_SOURCES.value:
+        return mode, sources | record_sources if mode == MODE_INCLUDE else sources - record_sources
+    if rtype == packet.GroupRecordType.BLOCK_OLD_SOURCES.value:
+        return mode, sources - record_sources if mode == MODE_INCLUDE else sources | record_sources
+    return mode, sources
+
+
+class IntervalIndex:
+    '''
+    Static centered interval tree over half-open [start_ns, end_ns) intervals
+
+    Every node holds the intervals containing its center, sorted by start and by end, the intervals
+    completely before or after the center are in the left and right subtree. Finding the intervals
+    containing a time takes O(log n + k) for k results. Empty intervals are not indexed.
+    '''
+    def __init__(self, intervals):
+        self._root = self._build([interval for interval in intervals if interval.end_ns > interval.start_ns])
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        # The center is the start of an interval, so every node holds at least one interval
+        starts = sorted(interval.start_ns for interval in intervals)
+        center = starts[len(starts) // 2]
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval.end_ns <= center:
+                left.append(interval)
+            elif interval.start_ns > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        by_start = sorted(here, key=lambda interval: interval.start_ns)
+        by_end = sorted(here, key=lambda interval: interval.end_ns, reverse=True)
+        return center, by_start, by_end, self._build(left), self._build(right)
+
+    def at(self, time_ns):
+        """Get the intervals containing a time"""
+        result = []
+        node = self._root
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if time_ns < center:
+                # All intervals of the node end after the center, so they contain the time if they started
+                for interval in by_start:
+                    if interval.start_ns > time_ns:
+                        break
+                    result.append(interval)
+                node = left
+            else:
+                # All intervals of the node started at or before the center
+                for interval in by_end:
+                    if interval.end_ns <= time_ns:
+                        break
+                    result.append(interval)
+                node = right
+        return result
+
+
+class MembershipTimeline:
+    def __init__(self, intervals):
+        '''
+        Create MembershipTimeline, the index of the membership intervals of a capture, see build_timeline
+
+        Args:
+            intervals: MembershipInterval of all hosts and groups
+        '''
+        self.intervals = sorted(intervals, key=lambda interval: interval.start_ns)
+        per_group = {}
+        self._per_host = {}
+        for interval in self.intervals:
+            per_group.setdefault(interval.group, []).append(interval)
+            self._per_host.setdefault((interval.host, interval.group), []).append(interval)
+        self._host_starts = {key: [interval.start_ns for interval in intervals]
+                             for key, intervals in self._per_host.items()}
+        self._index = {group: IntervalIndex(intervals) for group, intervals in per_group.items()}
+        # The time ranges during which a group had at least one member, as sorted disjoint intervals
+        self._joined = {group: self._merge(intervals) for group, intervals in per_group.items()}
+
+    @staticmethod
+    def _merge(intervals):
+        starts, ends = [], []
+        for interval in intervals:
+            if starts and interval.start_ns <= ends[-1]:
+                ends[-1] = max(ends[-1], interval.end_ns)
+            else:
+                starts.append(interval.start_ns)
+                ends.append(interval.end_ns)
+        return starts, ends
+
+    def groups(self):
+        return sorted(self._index)
+
+    def hosts(self, group=None):
+        group = _address(group)
+        return sorted({host for host, key_group in self._per_host if group is None or key_group == group})
+
+    def members(self, group, time_ns):
+        """Get the membership intervals of all hosts which were a member of a group at a time"""
+        index = self._index.get(_address(group))
+        return sorted(index.at(time_ns), key=lambda interval: interval.host) if index else []
+
+    def membership(self, host, group, time_ns):
+        """Get the membership interval of a host and group containing a time, None when it wasn't a member"""
+        key = (_address(host), _address(group))
+        intervals = self._per_host.get(key)
+        if not intervals:
+            return None
+        position = bisect_right(self._host_starts[key], time_ns) - 1
+        if position >= 0 and time_ns < intervals[position].end_ns:
+            return intervals[position]
+        return None
+
+    def host_intervals(self, host, group):
+        return list(self._per_host.get((_address(host), _address(group)), []))
+
+    def joined_until(self, group, time_ns):
+        '''
+        Get the time until which a group had a member without interruption, starting at a time
+
+        E.g. for the time of a leave, this is the time at which the last member left the group afterwards,
+        so the time the network kept forwarding the group after the leave. Returns None when the group
+        had no member at the time.
+        '''
+        starts, ends = self._joined.get(_address(group), ([], []))
+        position = bisect_right(starts, time_ns) - 1
+        if position >= 0 and time_ns < ends[position]:
+            return ends[position]
+        return None
+
+
+class _MembershipReplay:
+    def __init__(self, timeout):
+        '''
+        Create _MembershipReplay, the state of the memberships while replaying a capture, see build_timeline
+
+        Args:
+            timeout: time in nanoseconds after the last report at which a membership times out
+        '''
+        self.timeout = timeout
+        # Open membership per host and group: start, mode, sources and time of the last report
+        self.memberships = {}
+        self.intervals = []
+        self.end_ns = None
+
+    def handle(self, type, pkt):
+        """Apply an IGMP message to the memberships"""
+        self.end_ns = pkt.time_ns
+        if type in (packet.IGMPMessageType.V1_MEMBERSHIP_REPORT.value,
+                    packet.IGMPMessageType.V2_MEMBERSHIP_REPORT.value):
+            self._update((pkt.src, pkt.gaddr), pkt.time_ns, MODE_EXCLUDE, _EMPTY)
+        elif type == packet.IGMPMessageType.LEAVE_GROUP.value:
+            self._update((pkt.src, pkt.gaddr), pkt.time_ns, MODE_INCLUDE, _EMPTY)
+        elif type == packet.IGMPMessageType.V3_MEMBERSHIP_REPORT.value:
+            for record in pkt.records:
+                self._handle_record(pkt.src, record, pkt.time_ns)
+
+    def _handle_record(self, host, record, time_ns):
+        key = (host, record.maddr)
+        current = self._current_filter(key, time_ns)
+        mode, sources = (current[1], current[2]) if current is not None else (MODE_INCLUDE, _EMPTY)
+        mode, sources = _filter_record(mode, sources, record.rtype, frozenset(record.srcaddrs))
+        self._update(key, time_ns, mode, sources)
+
+    def _close(self, key, time_ns, reason):
+        start_ns, mode, sources, last_report_ns = self.memberships.pop(key)
+        if last_report_ns + self.timeout < time_ns:
+            time_ns, reason = last_report_ns + self.timeout, END_TIMEOUT
+        self.intervals.append(MembershipInterval(key[0], key[1], start_ns, time_ns, mode, sources, last_report_ns,
+                                                 reason))
+
+    def _current_filter(self, key, time_ns):
+        current = self.memberships.get(key)
+        if current is not None and current[3] + self.timeout < time_ns:
+            self._close(key, time_ns, END_TIMEOUT)
+            current = None
+        return current
+
+    def _update(self, key, time_ns, mode, sources):
+        current = self._current_filter(key, time_ns)
+        if mode == MODE_INCLUDE and not sources:
+            if current is not None:
+                self._close(key, time_ns, END_LEAVE)
+            return
+        if current is None:
+            self.memberships[key] = (time_ns, mode, sources, time_ns)
+        elif (current[1], current[2]) != (mode, sources):
+            self._close(key, time_ns, END_FILTER_CHANGE)
+            self.memberships[key] = (time_ns, mode, sources, time_ns)
+        else:
+            self.memberships[key] = current[:3] + (time_ns,)
+
+    def finish(self):
+        """Close the memberships which are still open at the end of the capture, returns all intervals"""
+        for key in list(self.memberships):
+            self._close(key, self.end_ns, END_CAPTURE)
+        return self.intervals
+
+
+def build_timeline(capture, group_membership_interval=GROUP_MEMBERSHIP_INTERVAL):
+    '''
+    Replay the IGMP packets of a capture and build the membership timeline
+
+    A membership starts at a membership report, and ends at a leave (an IGMPv2 leave, or an IGMPv3 group
+    record resulting in an empty INCLUDE filter), when the host didn't report the group for the group
+    membership interval, or at the end of the capture. The capture is streamed, only the open memberships
+    are kept besides the finished intervals.
+
+    Args:
+        capture: pcap or pcapng file
+        group_membership_interval: time in seconds after the last report at which a membership times out
+
+    Returns:
+        MembershipTimeline
+    '''
+    replay = _MembershipReplay(int(group_membership_interval * 1000000000))
+    for version, type, pkt in packet.iter_igmp_events(capture):
+        replay.handle(type, pkt)
+    return MembershipTimeline(replay.finish())
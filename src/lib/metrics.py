@@ -0,0 +1,87 @@
+"""Test metrics
+Collects the timing of the phases of a test (starting the capture, transmitting queries, waiting for the
+membership reports, stopping the capture, parsing and validation) and the measured DUT metrics, like the
+latency of the first response and the peak number of reports in a window. conftest.py attaches the metrics
+of every test to the JUnit file and writes them to the JSON file configured in METRICS_FILE.
+
+Phases can be nested, the time of a phase excludes the time of the phases within it, e.g. the parsing of
+a capture by a validation function is counted as parsing and not as validation.
+"""
+import contextlib
+import functools
+from statistics import median
+from time import perf_counter
+
+# Time spent per phase in seconds, since the last clear
+phases = {}
+# Measured values per DUT metric, in the order they were recorded
+dut_metrics = {}
+
+# Time spent in nested phases, per running phase
+_nested = []
+_device = None
+
+
+def clear():
+    phases.clear()
+    dut_metrics.clear()
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Context in which the time is counted as the time of a phase"""
+    _nested.append(0.0)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        nested = _nested.pop()
+        phases[name] = phases.get(name, 0.0) + elapsed - nested
+        if _nested:
+            _nested[-1] += elapsed
+
+
+def timed(name):
+    """Decorator counting the time of every call of a function as the time of a phase"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def device(name):
+    """Context in which the DUT metrics are recorded for a device, when testing multiple devices"""
+    global _device
+    previous, _device = _device, name
+    try:
+        yield
+    finally:
+        _device = previous
+
+
+def record(name, value):
+    """Record a measured DUT metric, a metric recorded multiple times during a test keeps all values"""
+    if _device is not None:
+        name = f"{_device} {name}"
+    dut_metrics.setdefault(name, []).append(value)
+
+
+def summary():
+    """Get the phase times and DUT metrics of the test
+    Returns a dictionary with the time per phase and, per DUT metric, its value when it was recorded once,
+    otherwise the minimum, median and maximum of the numeric values and the number of values.
+    """
+    metrics = {}
+    for name, values in dut_metrics.items():
+        numbers = [value for value in values if value is not None]
+        if len(values) == 1:
+            metrics[name] = values[0]
+        elif numbers:
+            metrics[name] = {"min": min(numbers), "median": median(numbers), "max": max(numbers),
+                             "count": len(values)}
+    return {"phases": dict(phases), "dut": metrics}
@@ -1,12 +1,25 @@
-import scapy
-from scapy.layers.l2 import Ether
-from scapy.layers.inet import IP, IPOption_Router_Alert
-from scapy.sendrecv import sendp
-from scapy.contrib.igmp import IGMP
-from scapy.contrib.igmpv3 import IGMPv3, IGMPv3mr, IGMPv3mq
-
+# Importing scapy and its IGMP layers takes seconds, so scapy is imported in the functions which use it.
+# Decoding captures with decode_igmp_frame and validating the results doesn't need scapy, scapy is only loaded
+# to build the membership queries and to dissect frames with unusual headers.
+from collections import namedtuple
 from enum import Enum
+import array
+import ctypes
+import errno
+import functools
+import numpy as np
+import os
+import select
+import socket
+import struct
+import sys
+import time
 import configuration
+from lib import cache, metrics, pcapfile
+
+
+# Source MAC address of the membership queries transmitted by this tool
+QUERIER_MAC = "00:11:22:33:44:55"
 
 
 class IGMPMessageType(Enum):
@@ -17,12 +30,244 @@ class IGMPMessageType(Enum):
     V3_MEMBERSHIP_REPORT = 0x22
 
 
-def send_igmp_v2_membership_query(
+# Kernel transmit timestamps (see Documentation/networking/timestamping.rst of the Linux kernel)
+SO_TIMESTAMPING = 37
+SOF_TIMESTAMPING_TX_SOFTWARE = 1 << 1
+SOF_TIMESTAMPING_SOFTWARE = 1 << 4
+SOF_TIMESTAMPING_OPT_ID = 1 << 7
+SOF_TIMESTAMPING_OPT_TSONLY = 1 << 11
+MSG_ERRQUEUE = 0x2000
+SOL_PACKET = 263
+PACKET_TX_TIMESTAMP = 16
+TX_TIMESTAMP_TIMEOUT = 10  # milliseconds
+# The timestamp is accompanied by the extended error of the error queue message
+TX_TIMESTAMP_ANCBUFSIZE = 512
+_TIMESPECS = struct.Struct("qqqqqq")
+# struct sock_extended_err, with SOF_TIMESTAMPING_OPT_ID the ID of the frame is in ee_data, the last field
+_EXTENDED_ERROR = struct.Struct("IBBBBII")
+
+
+class QuerySender:
+    def __init__(self, interface, tx_timestamps=True):
+        '''
+        Create QuerySender, transmitting frames on an interface using a single, persistent L2 socket
+
+        On Linux, a packet socket is used and the kernel is asked for a software transmit timestamp of every frame,
+        which is taken by the network driver and uses the same clock as the capture timestamps. The timestamps
+        are matched to the frames by their ID, so a late timestamp is never used for the next frame. When the
+        timestamp of the first frame doesn't arrive, the driver doesn't support them and they are disabled.
+        On other platforms, a scapy L2 socket is used and the time right before transmitting is used instead.
+
+        Args:
+            interface: interface to transmit on
+            tx_timestamps: False to not request transmit timestamps, e.g. when transmitting at a high rate
+        '''
+        self.interface = interface
+        self.tx_timestamps = False
+        if hasattr(socket, "AF_PACKET"):
+            self._socket = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+            self._socket.bind((interface, 0))
+            if not tx_timestamps:
+                return
+            try:
+                self._socket.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPING,
+                                        SOF_TIMESTAMPING_TX_SOFTWARE | SOF_TIMESTAMPING_SOFTWARE
+                                        | SOF_TIMESTAMPING_OPT_ID | SOF_TIMESTAMPING_OPT_TSONLY)
+                self._poll = select.poll()
+                self._poll.register(self._socket, select.POLLERR)
+                self.tx_timestamps = True
+                # The kernel numbers the frames transmitted since enabling the timestamps, starting at 0
+                self._tx_id = 0
+                self._tx_timestamp_received = False
+            except OSError:
+                pass
+        else:
+            from scapy.config import conf
+            self._socket = conf.L2socket(iface=interface)
+
+    def send(self, frame):
+        '''
+        Transmit a frame
+
+        Returns:
+            int: the time at which the frame was transmitted, in nanoseconds since the epoch
+        '''
+        sent_time = time.time_ns()
+        self._socket.send(frame)
+        if self.tx_timestamps:
+            tx_id = self._tx_id
+            self._tx_id = (self._tx_id + 1) & 0xFFFFFFFF
+            tx_time = self._read_tx_timestamp(tx_id)
+            if tx_time is not None:
+                return tx_time
+        return sent_time
+
+    def _read_tx_timestamp(self, tx_id):
+        # The timestamp is queued on the error queue of the socket once the frame is handed to the driver.
+        # Timestamps of earlier frames which arrived after their timeout are still queued, they are skipped.
+        deadline = time.monotonic() + TX_TIMESTAMP_TIMEOUT / 1000
+        while True:
+            for queued_id, tx_time in self._read_error_queue():
+                self._tx_timestamp_received = True
+                if queued_id == tx_id:
+                    return tx_time
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._poll.poll(remaining * 1000):
+                break
+        if not self._tx_timestamp_received:
+            print(f"Interface {self.interface} doesn't deliver transmit timestamps, using the time before "
+                  f"transmitting instead")
+            self.tx_timestamps = False
+            self._socket.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPING, 0)
+        return None
+
+    def _read_error_queue(self):
+        '''
+        Read the transmit timestamps queued on the error queue of the socket, without waiting
+
+        Returns:
+            list: a tuple (ID, timestamp in nanoseconds since the epoch) per timestamp
+        '''
+        timestamps = []
+        while True:
+            try:
+                _, ancdata, _, _ = self._socket.recvmsg(1, TX_TIMESTAMP_ANCBUFSIZE, MSG_ERRQUEUE | socket.MSG_DONTWAIT)
+            except OSError:
+                return timestamps
+            tx_id = tx_time = None
+            for level, type, data in ancdata:
+                if level == socket.SOL_SOCKET and type == SO_TIMESTAMPING and len(data) >= _TIMESPECS.size:
+                    sec, nsec = _TIMESPECS.unpack_from(data)[:2]
+                    if sec or nsec:
+                        tx_time = sec * 1000000000 + nsec
+                elif level == SOL_PACKET and type == PACKET_TX_TIMESTAMP and len(data) >= _EXTENDED_ERROR.size:
+                    tx_id = _EXTENDED_ERROR.unpack_from(data)[-1]
+            if tx_id is not None and tx_time is not None:
+                timestamps.append((tx_id, tx_time))
+
+    def batch(self, frames):
+        '''
+        Prepare frames to be transmitted in batches, see FrameBatch
+
+        The frames of a batch are transmitted without transmit timestamps, which would also make the IDs of the
+        timestamps of the frames transmitted with send unknown, so the QuerySender has to be created with
+        tx_timestamps=False.
+        '''
+        if self.tx_timestamps:
+            raise Exception("Frames can only be transmitted in batches by a QuerySender without transmit timestamps")
+        return FrameBatch(self._socket, frames)
+
+    def close(self):
+        self._socket.close()
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    # struct mmsghdr, a struct msghdr followed by the number of transmitted bytes
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+        ("msg_len", ctypes.c_uint),
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _sendmmsg():
+    """Get sendmmsg of the C library, None when it is not available"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        sendmmsg = ctypes.CDLL(None, use_errno=True).sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    return sendmmsg
+
+
+class FrameBatch:
+    def __init__(self, sock, frames):
+        '''
+        Create FrameBatch, a fixed list of frames which are transmitted in batches
+
+        On Linux, a batch of consecutive frames is transmitted with a single sendmmsg system call. The message
+        headers of all frames are prepared once, so transmitting a batch doesn't touch the frames in Python.
+        On other platforms, the frames of a batch are transmitted one at a time.
+
+        Args:
+            sock: socket to transmit on, see QuerySender.batch
+            frames: list of frames
+        '''
+        self._socket = sock
+        self.frames = [bytes(frame) for frame in frames]
+        self._sendmmsg = _sendmmsg() if hasattr(sock, "fileno") else None
+        if self._sendmmsg is None:
+            return
+        self._buffers = [ctypes.create_string_buffer(frame, len(frame)) for frame in self.frames]
+        self._iovecs = (_IOVec * len(self.frames))(*[(ctypes.addressof(buffer), len(buffer))
+                                                     for buffer in self._buffers])
+        self._messages = (_MMsgHdr * len(self.frames))()
+        for message, iovec in zip(self._messages, self._iovecs):
+            message.msg_iov = ctypes.pointer(iovec)
+            message.msg_iovlen = 1
+        self._address = ctypes.addressof(self._messages)
+
+    def send(self, start, count):
+        '''
+        Transmit count frames, starting at the frame with index start and wrapping around at the end of the list
+
+        Returns:
+            int: the index of the frame after the last transmitted frame
+        '''
+        while count > 0:
+            size = min(count, len(self.frames) - start)
+            if self._sendmmsg is None:
+                for frame in self.frames[start:start + size]:
+                    self._socket.send(frame)
+                sent = size
+            else:
+                sent = self._sendmmsg(self._socket.fileno(), self._address + start * ctypes.sizeof(_MMsgHdr),
+                                      size, 0)
+                if sent < 0:
+                    error = ctypes.get_errno()
+                    if error == errno.EINTR:
+                        continue
+                    raise OSError(error, os.strerror(error))
+            count -= sent
+            start = (start + sent) % len(self.frames)
+        return start
+
+
+_query_senders = {}
+
+
+def get_query_sender(interface):
+    """Get the QuerySender of an interface, the socket is opened the first time and kept open afterwards"""
+    if interface not in _query_senders:
+        _query_senders[interface] = QuerySender(interface)
+    return _query_senders[interface]
+
+
+@functools.lru_cache(maxsize=256)
+def build_igmp_v2_membership_query(
         source_ip="2.0.0.1",
         router_alert_option=True,
         mrcode=100,
         gaddr="0.0.0.0"):
-    a = Ether(src="00:11:22:33:44:55")
+    """Build an IGMPv2 membership query frame
+    The frame is built with scapy once per parameter set, afterwards the serialized frame is served from the cache.
+    """
+    from scapy.layers.l2 import Ether
+    from scapy.layers.inet import IP, IPOption_Router_Alert
+    from scapy.contrib.igmp import IGMP
+    a = Ether(src=QUERIER_MAC)
     b = IP(src=source_ip, dst="224.0.0.1")
     if router_alert_option:
         b.options = [IPOption_Router_Alert()]
@@ -32,15 +277,28 @@ def send_igmp_v2_membership_query(
             gaddr=gaddr
         )
     packet = a/b/c
-    sendp(packet, iface=configuration.IFACE)
+    return bytes(packet)
 
 
-def send_igmp_v3_membership_query(
+def build_igmp_v3_membership_query(
         source_ip="2.0.0.1",
         router_alert_option=True,
         mrcode=100,
         gaddr="0.0.0.0"):
-    a = Ether(src="00:11:22:33:44:55")
+    """Build an IGMPv3 membership query frame
+    The frame is built with scapy once per parameter set, afterwards the serialized frame is served from the cache.
+    """
+    if isinstance(gaddr, list):
+        gaddr = tuple(gaddr)
+    return _build_igmp_v3_membership_query(source_ip, router_alert_option, mrcode, gaddr)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_igmp_v3_membership_query(source_ip, router_alert_option, mrcode, gaddr):
+    from scapy.layers.l2 import Ether
+    from scapy.layers.inet import IP, IPOption_Router_Alert
+    from scapy.contrib.igmpv3 import IGMPv3, IGMPv3mq
+    a = Ether(src=QUERIER_MAC)
     b = IP(src=source_ip, dst="224.0.0.1")
     if router_alert_option:
         b.options = [IPOption_Router_Alert()]
@@ -53,29 +311,452 @@ def send_igmp_v3_membership_query(
     d = IGMPv3mq()
     d.gaddr = gaddr
     if gaddr != '0.0.0.0':
-        if isinstance(gaddr, list):
-            c.srcaddrs = gaddr
+        if isinstance(gaddr, tuple):
+            c.srcaddrs = list(gaddr)
         else:
             c.srcaddrs = [gaddr]
     packet = a/b/c/d
-    sendp(packet, iface=configuration.IFACE)
+    return bytes(packet)
+
+
+@metrics.timed("query_send")
+def send_igmp_v2_membership_query(
+        source_ip="2.0.0.1",
+        router_alert_option=True,
+        mrcode=100,
+        gaddr="0.0.0.0"):
+    """Transmit an IGMPv2 membership query on IFACE
+    Returns the time at which the query was transmitted, in nanoseconds since the epoch.
+    """
+    frame = build_igmp_v2_membership_query(source_ip, router_alert_option, mrcode, gaddr)
+    return get_query_sender(configuration.IFACE).send(frame)
+
+
+@metrics.timed("query_send")
+def send_igmp_v3_membership_query(
+        source_ip="2.0.0.1",
+        router_alert_option=True,
+        mrcode=100,
+        gaddr="0.0.0.0"):
+    """Transmit an IGMPv3 membership query on IFACE
+    Returns the time at which the query was transmitted, in nanoseconds since the epoch.
+    """
+    frame = build_igmp_v3_membership_query(source_ip, router_alert_option, mrcode, gaddr)
+    return get_query_sender(configuration.IFACE).send(frame)
+
+
+class GroupRecordType(Enum):
+    MODE_IS_INCLUDE = 1
+    MODE_IS_EXCLUDE = 2
+    CHANGE_TO_INCLUDE_MODE = 3
+    CHANGE_TO_EXCLUDE_MODE = 4
+    ALLOW_NEW_SOURCES = 5
+    BLOCK_OLD_SOURCES = 6
+
+
+def group_address(index):
+    """Get the group address of the sACN universe with the given index, 1 is 239.255.0.1"""
+    return f"239.255.{(index >> 8) & 0xFF}.{index & 0xFF}"
+
+
+# Number of group records without sources which fit in a membership report in a 1500 byte IP packet
+V3_REPORT_MAX_RECORDS = (1500 - 24 - 8) // 8
+
+
+def igmp_checksum(data):
+    """Calculate the internet checksum of an IP header or IGMP message"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(array.array("H", data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return socket.htons(~total & 0xFFFF)
+
+
+def _igmp_frame(source_mac, source_ip, dst, igmp):
+    """Build an Ethernet frame with an IPv4 header with router alert option around an IGMP message"""
+    igmp = igmp[:2] + struct.pack("!H", igmp_checksum(igmp)) + igmp[4:]
+    ip = struct.pack("!BBHHHBBH4s4sI", 0x46, 0xC0, 24 + len(igmp), 0, 0, 1, IPPROTO_IGMP, 0,
+                     socket.inet_aton(source_ip), socket.inet_aton(dst), 0x94040000)
+    ip = ip[:10] + struct.pack("!H", igmp_checksum(ip)) + ip[12:]
+    # The multicast MAC address contains the lower 23 bits of the group address
+    mac = b"\x01\x00\x5e" + struct.pack("!I", ip_to_int(dst) & 0x7FFFFF)[1:]
+    return mac + bytes.fromhex(source_mac.replace(":", "")) + struct.pack("!H", ETH_P_IP) + ip + igmp
+
+
+@functools.lru_cache(maxsize=16384)
+def build_igmp_v2_membership_report(source_mac, source_ip, gaddr, dst=None):
+    """Build an IGMPv2 membership report frame from the raw header bytes
+    The report is addressed to the group, unless another destination address is given.
+    """
+    igmp = struct.pack("!BBH4s", IGMPMessageType.V2_MEMBERSHIP_REPORT.value, 0, 0, socket.inet_aton(gaddr))
+    return _igmp_frame(source_mac, source_ip, dst or gaddr, igmp)
+
+
+def build_igmp_v3_membership_report(source_mac, source_ip, records, dst="224.0.0.22"):
+    """Build an IGMPv3 membership report frame from the raw header bytes
+    Every record is a tuple of the group record type and the group address, records without sources are built.
+    At most V3_REPORT_MAX_RECORDS records fit in a single report.
+    """
+    igmp = struct.pack("!BBHHH", IGMPMessageType.V3_MEMBERSHIP_REPORT.value, 0, 0, 0, len(records))
+    igmp += b"".join(struct.pack("!BBH4s", rtype, 0, 0, socket.inet_aton(maddr)) for rtype, maddr in records)
+    return _igmp_frame(source_mac, source_ip, dst, igmp)
+
+
+def _capture_key(capture):
+    stat = os.stat(capture)
+    return (os.path.abspath(capture), stat.st_size, stat.st_mtime_ns)
+
+
+_IPV4 = struct.Struct("!I")
+
+
+def ip_to_int(address):
+    return _IPV4.unpack(socket.inet_aton(address))[0]
+
+
+def int_to_ip(address):
+    return socket.inet_ntoa(_IPV4.pack(address))
+
+
+# Fields of the IGMP message types holding integer encoded IPv4 addresses
+_ADDRESS_FIELDS = ("src", "dst", "gaddr", "maddr")
+_ADDRESS_LIST_FIELDS = ("srcaddrs",)
+
+
+def _record_repr(record):
+    fields = []
+    for name, value in zip(record._fields, record):
+        if name in _ADDRESS_FIELDS:
+            value = int_to_ip(value)
+        elif name in _ADDRESS_LIST_FIELDS:
+            value = [int_to_ip(address) for address in value]
+        fields.append(f"{name}={value!r}")
+    return f"{type(record).__name__}({', '.join(fields)})"
+
+
+def _record_time(record):
+    return record.time_ns / 1000000000
+
+
+class GroupRecord(namedtuple("GroupRecord", "rtype maddr srcaddrs")):
+    """Group record of an IGMPv3 membership report, with the group and source addresses as integers"""
+    __slots__ = ()
+    __repr__ = _record_repr
+
+
+class IGMPv2Message(namedtuple("IGMPv2Message", "src dst mac gaddr mrcode time_ns")):
+    """IGMPv2 membership query, membership report or leave
+    The addresses are integers, see ip_to_int and int_to_ip, the MAC address is a string or None.
+    time_ns is the timestamp in nanoseconds since the epoch, time the timestamp in seconds.
+    """
+    __slots__ = ()
+    __repr__ = _record_repr
+    time = property(_record_time)
+
+
+class IGMPv3Query(namedtuple("IGMPv3Query", "src dst mac gaddr mrcode resv srcaddrs time_ns")):
+    """IGMPv3 membership query, see IGMPv2Message"""
+    __slots__ = ()
+    __repr__ = _record_repr
+    time = property(_record_time)
+
+
+class IGMPv3Report(namedtuple("IGMPv3Report", "src dst mac records time_ns")):
+    """IGMPv3 membership report with a tuple of GroupRecord, see IGMPv2Message"""
+    __slots__ = ()
+    __repr__ = _record_repr
+    time = property(_record_time)
+
+
+def _ether_src(pkt):
+    from scapy.layers.l2 import Ether
+    return sys.intern(pkt[Ether].src) if pkt.haslayer(Ether) else None
+
+
+def _pkt_time_ns(pkt):
+    from scapy.utils import EDecimal
+    return int(EDecimal(pkt.time) * 1000000000)
+
+
+def dissect_igmp_packet(pkt, time_ns=None):
+    """Get the IGMP contents of a dissected scapy packet
+    Returns a tuple with the IGMP version ("v2" or "v3"), the IGMP message type and an IGMPv2Message,
+    IGMPv3Query or IGMPv3Report, or None if the packet is not a supported IGMP packet.
+    The timestamp is taken from the packet unless time_ns is given.
+    """
+    from scapy.layers.inet import IP
+    from scapy.contrib.igmp import IGMP
+    from scapy.contrib.igmpv3 import IGMPv3, IGMPv3mr, IGMPv3mq
+    if time_ns is None:
+        time_ns = _pkt_time_ns(pkt)
+    if pkt.haslayer(IGMP):
+        ip_data = pkt[IP]
+        igmp_data = pkt[IGMP]
+        return "v2", igmp_data.type, IGMPv2Message(
+            src=ip_to_int(ip_data.src),
+            dst=ip_to_int(ip_data.dst),
+            mac=_ether_src(pkt),
+            gaddr=ip_to_int(igmp_data.gaddr),
+            mrcode=igmp_data.mrcode,
+            time_ns=time_ns,
+            )
+    if pkt.haslayer(IGMPv3) and pkt.haslayer(IGMPv3mq):
+        ip_data = pkt[IP]
+        igmp_data = pkt[IGMPv3]
+        if igmp_data.type != IGMPMessageType.MEMBERSHIP_QUERY.value:
+            return None
+        igmp_mq_data = pkt[IGMPv3mq]
+        return "v3", igmp_data.type, IGMPv3Query(
+            src=ip_to_int(ip_data.src),
+            dst=ip_to_int(ip_data.dst),
+            mac=_ether_src(pkt),
+            gaddr=ip_to_int(igmp_mq_data.gaddr),
+            mrcode=igmp_data.mrcode,
+            resv=igmp_mq_data.resv,
+            srcaddrs=tuple(ip_to_int(address) for address in igmp_mq_data.srcaddrs),
+            time_ns=time_ns,
+            )
+    if pkt.haslayer(IGMPv3) and pkt.haslayer(IGMPv3mr):
+        ip_data = pkt[IP]
+        igmp_data = pkt[IGMPv3]
+        if igmp_data.type != IGMPMessageType.V3_MEMBERSHIP_REPORT.value:
+            return None
+        igmp_data = pkt[IGMPv3mr]
+        # The scapy records are only used to build the group records, they are not kept
+        records = tuple(GroupRecord(record.rtype, ip_to_int(record.maddr),
+                                    tuple(ip_to_int(address) for address in record.srcaddrs))
+                        for record in igmp_data.records)
+        return "v3", IGMPMessageType.V3_MEMBERSHIP_REPORT.value, IGMPv3Report(
+            src=ip_to_int(ip_data.src),
+            dst=ip_to_int(ip_data.dst),
+            mac=_ether_src(pkt),
+            records=records,
+            time_ns=time_ns,
+            )
+    return None
+
+
+LINKTYPE_ETHERNET = 1
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+IPPROTO_IGMP = 2
+
+
+def _ip_int(frame, offset):
+    return _IPV4.unpack_from(frame, offset)[0]
+
+
+def _group_records(frame, offset, end):
+    """Decode the group records of an IGMPv3 membership report, None when the records are truncated"""
+    count = frame[offset + 6] << 8 | frame[offset + 7]
+    offset += 8
+    records = []
+    for _ in range(count):
+        if end < offset + 8:
+            return None
+        numsrc = frame[offset + 2] << 8 | frame[offset + 3]
+        # The auxiliary data length is in 32-bit words
+        record_end = offset + 8 + numsrc * 4 + frame[offset + 1] * 4
+        if end < record_end:
+            return None
+        records.append(GroupRecord(frame[offset], _ip_int(frame, offset + 4),
+                                   tuple(_ip_int(frame, offset + 8 + i * 4) for i in range(numsrc))))
+        offset = record_end
+    return tuple(records)
+
+
+def decode_igmp_frame(frame, time_ns=0, linktype=LINKTYPE_ETHERNET):  # noqa: C901
+    """Decode the IGMP contents of a raw frame without dissecting it with scapy
+    The Ethernet, VLAN, IPv4 and IGMP headers are read directly from the frame bytes.
+    IPv4 options, like the Router Alert option, are skipped using the header length.
+    Frames which are not IGMP are rejected after a couple of header reads. Frames with
+    another link type, stacked VLAN tags or truncated headers are handed to scapy instead.
+    Returns the same value as dissect_igmp_packet, with time_ns as timestamp.
+    """
+    if linktype != LINKTYPE_ETHERNET:
+        return _dissect_igmp_frame(frame, time_ns, linktype)
+
+    size = len(frame)
+    if size < 14:
+        return _dissect_igmp_frame(frame, time_ns, linktype)
+    ethertype = frame[12] << 8 | frame[13]
+    offset = 14
+    if ethertype == ETH_P_8021Q:
+        if size < 18:
+            return _dissect_igmp_frame(frame, time_ns, linktype)
+        ethertype = frame[16] << 8 | frame[17]
+        offset = 18
+    if ethertype != ETH_P_IP:
+        if ethertype == ETH_P_8021Q or ethertype == 0x88a8:
+            return _dissect_igmp_frame(frame, time_ns, linktype)
+        return None
+
+    # Scapy only dissects IGMP in unfragmented IPv4 packets with a TTL of 1
+    if size < offset + 20:
+        return _dissect_igmp_frame(frame, time_ns, linktype)
+    if frame[offset + 9] != IPPROTO_IGMP:
+        return None
+    if frame[offset + 8] != 1 or (frame[offset + 6] & 0x1F) or frame[offset + 7]:
+        return None
+    header_length = (frame[offset] & 0x0F) * 4
+    if frame[offset] >> 4 != 4 or header_length < 20:
+        return _dissect_igmp_frame(frame, time_ns, linktype)
+
+    # The IGMP message ends at the IP total length, Ethernet padding is not part of it
+    total_length = frame[offset + 2] << 8 | frame[offset + 3]
+    end = size
+    if total_length >= header_length:
+        end = min(size, offset + total_length)
+    ip_offset = offset
+    offset += header_length
+    length = end - offset
+    if length < 8:
+        return _dissect_igmp_frame(frame, time_ns, linktype)
+
+    type = frame[offset]
+    mrcode = frame[offset + 1]
+    src = _ip_int(frame, ip_offset + 12)
+    dst = _ip_int(frame, ip_offset + 16)
+    # Interned, so all messages of a device share the same string
+    mac = sys.intern(bytes(frame[6:12]).hex(":"))
+    if type in (0x12, 0x16, 0x17) or (type == 0x11 and length < 12):
+        return "v2", type, IGMPv2Message(src, dst, mac, _ip_int(frame, offset + 4), mrcode, time_ns)
+    if type == IGMPMessageType.MEMBERSHIP_QUERY.value:
+        numsrc = frame[offset + 10] << 8 | frame[offset + 11]
+        if length < 12 + numsrc * 4:
+            return _dissect_igmp_frame(frame, time_ns, linktype)
+        srcaddrs = tuple(_ip_int(frame, offset + 12 + i * 4) for i in range(numsrc))
+        return "v3", type, IGMPv3Query(src, dst, mac, _ip_int(frame, offset + 4), mrcode, frame[offset + 8] >> 4,
+                                       srcaddrs, time_ns)
+    if type == IGMPMessageType.V3_MEMBERSHIP_REPORT.value:
+        # Scapy only treats the message as a report when the reserved byte is 0
+        if mrcode != 0:
+            return None
+        records = _group_records(frame, offset, end)
+        if records is None:
+            return _dissect_igmp_frame(frame, time_ns, linktype)
+        return "v3", type, IGMPv3Report(src, dst, mac, records, time_ns)
+    return None
+
+
+def _dissect_igmp_frame(frame, time_ns, linktype):
+    from scapy.config import conf
+    # The IGMP layers are only bound to IP once they are imported
+    import scapy.contrib.igmp  # noqa: F401
+    import scapy.contrib.igmpv3  # noqa: F401
+    # Scapy fails on some truncated frames, e.g. a truncated group record, those are not IGMP messages either
+    try:
+        return dissect_igmp_packet(conf.l2types.num2layer[linktype](bytes(frame)), time_ns)
+    except Exception:
+        return None
+
+
+def _frame_time_ns(timestamp, resolution):
+    if timestamp is None:
+        return time.time_ns()
+    return timestamp * 1000000000 // resolution
+
+
+def iter_igmp_events(capture):
+    """Iterate over the IGMP packets of a capture
+    Yields the same tuples as decode_igmp_frame, with the timestamp set, in capture order.
+    The timestamp is kept as an integer number of nanoseconds in time_ns, without rounding.
+    The capture is streamed, so only the current IGMP packet is kept in memory.
+    """
+    for frame, linktype, timestamp, resolution in pcapfile.iter_frames(capture):
+        event = decode_igmp_frame(frame, _frame_time_ns(timestamp, resolution), linktype)
+        if event is not None:
+            yield event
+
+
+def extract_igmp_events(capture):
+    """Extract all IGMP packets from a capture in a single pass
+    The IGMP packets are sorted into an event table with an entry for IGMPv2 and IGMPv3 packets,
+    each containing a list of packets per IGMP message type.
+    The frames are decoded with decode_igmp_frame, so only IGMP frames with unusual headers
+    are dissected by scapy.
+    """
+    events = {"v2": {}, "v3": {}}
+    for version, type, pkt in iter_igmp_events(capture):
+        events[version].setdefault(type, []).append(pkt)
+    return events
+
+
+IGMP_COLUMNS = (
+    ("time", "d"),
+    ("time_ns", "q"),
+    ("version", "B"),
+    ("type", "B"),
+    ("src", "I"),
+    ("dst", "I"),
+    ("gaddr", "I"),
+    ("mrcode", "B"),
+)
+
+
+def igmp_rows(version, type, pkt):
+    """Get the rows of an IGMP message in the columns of read_igmp_columns, without the timestamps
+    Returns a tuple (version, type, src, dst, gaddr, mrcode) per row.
+    """
+    number = 3 if version == "v3" else 2
+    if type == IGMPMessageType.V3_MEMBERSHIP_REPORT.value:
+        return [(number, type, pkt.src, pkt.dst, record.maddr, 0) for record in pkt.records]
+    return [(number, type, pkt.src, pkt.dst, pkt.gaddr, pkt.mrcode)]
+
+
+def read_igmp_columns(capture):
+    """Read the IGMP packets of a capture into columnar NumPy arrays
+    Returns a dictionary with an array per column in IGMP_COLUMNS: the timestamp in seconds and in
+    nanoseconds (0 when the capture has no timestamps), the IGMP version (2 or 3), the IGMP message type,
+    the source and destination IP address, the group address and the max response code.
+    The addresses are stored as uint32.
+    There is a row per IGMPv2 message, per IGMPv3 query and per group record of an IGMPv3 report,
+    so a report for multiple groups results in multiple rows with the same timestamp.
+    The rows are collected in compact typed arrays while walking the capture, the capture
+    is never loaded in memory as a whole.
+    """
+    columns = {name: array.array(typecode) for name, typecode in IGMP_COLUMNS}
+    for frame, linktype, timestamp, resolution in pcapfile.iter_frames(capture):
+        event = decode_igmp_frame(frame, linktype=linktype)
+        if event is None:
+            continue
+        t = float("nan") if timestamp is None else timestamp / resolution
+        t_ns = 0 if timestamp is None else timestamp * 1000000000 // resolution
+        for row in igmp_rows(*event):
+            columns["time"].append(t)
+            columns["time_ns"].append(t_ns)
+            for (name, _), value in zip(IGMP_COLUMNS[2:], row):
+                columns[name].append(value)
+    return {name: np.array(values, dtype=values.typecode) for name, values in columns.items()}
+
+
+# Event tables of recently parsed captures, keyed by path, size and modification time
+# so that a capture which is overwritten (e.g. by a new test run) is parsed again.
+_event_cache = {}
+EVENT_CACHE_SIZE = 16
+
+
+@metrics.timed("parse")
+def get_igmp_events(capture):
+    """Get the IGMP event table of a capture
+    The capture is only parsed the first time, afterwards the event table is served from the cache
+    for as long as the capture file is not modified. Event tables are also kept in the analysis cache
+    on disk, see lib.cache, so a capture is not parsed again in a new run either.
+    """
+    key = _capture_key(capture)
+    events = _event_cache.pop(key, None)
+    if events is None:
+        events = cache.cached("igmp_events", capture, lambda: extract_igmp_events(capture))
+        while len(_event_cache) >= EVENT_CACHE_SIZE:
+            del _event_cache[next(iter(_event_cache))]
+    # (Re-)insert the entry so that the least recently used capture is evicted first
+    _event_cache[key] = events
+    return events
 
 
 def get_igmp_v2_packets(capture, type):
-    packets = []
-    for pkt in scapy.utils.PcapReader(capture):
-        if pkt.haslayer(IGMP):
-            ip_data = pkt[IP]
-            igmp_data = pkt[IGMP]
-            if igmp_data.type == type.value:
-                packets.append({
-                    "src": ip_data.src,
-                    "dst": ip_data.dst,
-                    "gaddr": igmp_data.gaddr,
-                    "time": pkt.time,
-                    "mrcode": igmp_data.mrcode
-                    })
-    return packets
+    return list(get_igmp_events(capture)["v2"].get(type.value, []))
 
 
 def get_v2_membership_queries(capture):
@@ -91,38 +772,43 @@ def get_v2_leaves(capture):
 
 
 def get_v3_membership_queries(capture):
-    packets = []
-    for pkt in scapy.utils.PcapReader(capture):
-        if pkt.haslayer(IGMPv3) and pkt.haslayer(IGMPv3mq):
-            ip_data = pkt[IP]
-            igmp_data = pkt[IGMPv3]
-            if igmp_data.type != IGMPMessageType.MEMBERSHIP_QUERY.value:
-                continue
-            igmp_mq_data = pkt[IGMPv3mq]
-            assert igmp_data.resv == 0, 'The reserved field should be set to 0'
-            packets.append({
-                "src": ip_data.src,
-                "dst": ip_data.dst,
-                "time": pkt.time,
-                "srcaddrs": igmp_mq_data.srcaddrs,
-                "mrcode": igmp_data.mrcode
-                })
-    return packets
+    packets = get_igmp_events(capture)["v3"].get(IGMPMessageType.MEMBERSHIP_QUERY.value, [])
+    for pkt in packets:
+        assert pkt.resv == 0, 'The reserved field should be set to 0'
+    return list(packets)
 
 
 def get_v3_membership_reports(capture):
-    packets = []
-    for pkt in scapy.utils.PcapReader(capture):
-        if pkt.haslayer(IGMPv3) and pkt.haslayer(IGMPv3mr):
-            ip_data = pkt[IP]
-            igmp_data = pkt[IGMPv3]
-            if igmp_data.type != IGMPMessageType.V3_MEMBERSHIP_REPORT.value:
-                continue
-            igmp_data = pkt[IGMPv3mr]
-            packets.append({
-                "src": ip_data.src,
-                "dst": ip_data.dst,
-                "time": pkt.time,
-                "records": igmp_data.records
-                })
-    return packets
+    return list(get_igmp_events(capture)["v3"].get(IGMPMessageType.V3_MEMBERSHIP_REPORT.value, []))
+
+
+def iter_igmp_packets(capture, version, type):
+    """Iterate over the IGMP packets of an IGMP version and message type in a capture
+    Streaming variant of the getters: the capture is walked without building or caching the event table,
+    so only the current packet is kept in memory.
+    """
+    for pkt_version, pkt_type, pkt in iter_igmp_events(capture):
+        if pkt_version == version and pkt_type == type.value:
+            yield pkt
+
+
+def iter_v2_membership_queries(capture):
+    return iter_igmp_packets(capture, "v2", IGMPMessageType.MEMBERSHIP_QUERY)
+
+
+def iter_v2_membership_reports(capture):
+    return iter_igmp_packets(capture, "v2", IGMPMessageType.V2_MEMBERSHIP_REPORT)
+
+
+def iter_v2_leaves(capture):
+    return iter_igmp_packets(capture, "v2", IGMPMessageType.LEAVE_GROUP)
+
+
+def iter_v3_membership_queries(capture):
+    for pkt in iter_igmp_packets(capture, "v3", IGMPMessageType.MEMBERSHIP_QUERY):
+        assert pkt.resv == 0, 'The reserved field should be set to 0'
+        yield pkt
+
+
+def iter_v3_membership_reports(capture):
+    return iter_igmp_packets(capture, "v3", IGMPMessageType.V3_MEMBERSHIP_REPORT)
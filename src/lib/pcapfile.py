@@ -0,0 +1,228 @@
+"""Memory-mapped pcap and pcapng reader
+The capture file is mapped into memory and the record headers are walked in place,
+so the frames are never copied out of the file unless they are needed.
+This keeps the memory usage flat, also for captures of multiple gigabytes.
+Gzip compressed captures can't be mapped, they are decompressed in chunks instead and the records are
+walked in every chunk, so only a chunk and the record which continues in the next chunk are kept in memory.
+Simple pcap and pcapng writers are included to generate captures, e.g. for benchmarks.
+"""
+import gzip
+import mmap
+import struct
+
+PCAP_MAGIC = {
+    b"\xa1\xb2\xc3\xd4": (">", 1000000),
+    b"\xd4\xc3\xb2\xa1": ("<", 1000000),
+    b"\xa1\xb2\x3c\x4d": (">", 1000000000),
+    b"\x4d\x3c\xb2\xa1": ("<", 1000000000),
+}
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+GZIP_MAGIC = b"\x1f\x8b"
+
+PCAPNG_BLOCK_IDB = 0x00000001
+PCAPNG_BLOCK_PB = 0x00000002
+PCAPNG_BLOCK_SPB = 0x00000003
+PCAPNG_BLOCK_EPB = 0x00000006
+PCAPNG_OPTION_TSRESOL = 9
+
+
+GZIP_CHUNK_SIZE = 1 << 20
+
+
+def _iter_chunks(capture):
+    """Iterate over the contents of a capture as memoryviews
+    A plain capture is a single memory map, a gzip compressed capture is decompressed in chunks.
+    """
+    with open(capture, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+        if not compressed:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise Exception(f"No data could be read from {capture}")
+    if not compressed:
+        yield memoryview(data)
+        return
+    with gzip.open(capture, "rb") as gz:
+        while True:
+            chunk = gz.read(GZIP_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield memoryview(chunk)
+
+
+def iter_frames(capture):
+    """Iterate over the frames of a pcap or pcapng capture
+    Yields a tuple (frame, linktype, timestamp, resolution) for each frame, where frame
+    is a memoryview into the capture and timestamp is the integer number of ticks since the epoch,
+    with resolution ticks per second. The timestamp is None for frames without a timestamp.
+    """
+    chunks = _iter_chunks(capture)
+    data = next(chunks, memoryview(b""))
+    magic = bytes(data[:4])
+    if magic in PCAP_MAGIC:
+        parse = _iter_pcap_frames
+    elif magic == PCAPNG_MAGIC:
+        parse = _iter_pcapng_frames
+    else:
+        raise Exception(f"{capture} is not a supported capture file (bad magic: {magic!r})")
+    # The parsers return the offset of the first incomplete record, which is completed by the next chunk,
+    # or None when the capture can't be parsed any further
+    state = {}
+    while True:
+        offset = yield from parse(data, state)
+        chunk = next(chunks, None)
+        if offset is None or chunk is None:
+            return
+        data = memoryview(bytes(data[offset:]) + chunk)
+
+
+def _iter_pcap_frames(data, state):
+    offset = 0
+    if not state:
+        if len(data) < 24:
+            raise Exception("Invalid pcap file (too short)")
+        endian, state["resolution"] = PCAP_MAGIC[bytes(data[:4])]
+        state["linktype"], = struct.unpack_from(endian + "I", data, 20)
+        state["record_header"] = struct.Struct(endian + "IIII")
+        offset = 24
+    linktype, resolution, record_header = state["linktype"], state["resolution"], state["record_header"]
+    size = len(data)
+    while offset + 16 <= size:
+        sec, frac, caplen, _ = record_header.unpack_from(data, offset)
+        if offset + 16 + caplen > size:
+            # Truncated record at the end of the data, for example a capture which is still being written
+            return offset
+        offset += 16
+        yield data[offset:offset + caplen], linktype, sec * resolution + frac, resolution
+        offset += caplen
+    return offset
+
+
+def _parse_tsresol(data, offset, end, endian):
+    option_header = struct.Struct(endian + "HH")
+    while offset + 4 <= end:
+        code, length = option_header.unpack_from(data, offset)
+        if code == 0:
+            break
+        if code == PCAPNG_OPTION_TSRESOL and length == 1:
+            tsresol = data[offset + 4]
+            return (2 if tsresol & 0x80 else 10) ** (tsresol & 0x7F)
+        offset += 4 + length + (-length) % 4
+    return 1000000
+
+
+def _iter_pcapng_frames(data, state):  # noqa: C901
+    size = len(data)
+    offset = 0
+    endian = state.get("endian", "<")
+    interfaces = state.setdefault("interfaces", [])
+    while offset + 12 <= size:
+        if bytes(data[offset:offset + 4]) == PCAPNG_MAGIC:
+            # Section header block, the byte order magic determines the endianness of the section
+            endian = state["endian"] = "<" if bytes(data[offset + 8:offset + 12]) == b"\x4d\x3c\x2b\x1a" else ">"
+            interfaces = state["interfaces"] = []
+        block_type, block_length = struct.unpack_from(endian + "II", data, offset)
+        if block_length < 12:
+            return None
+        if offset + block_length > size:
+            return offset
+        body = offset + 8
+        end = offset + block_length - 4
+        if block_type == PCAPNG_BLOCK_IDB:
+            linktype, snaplen = struct.unpack_from(endian + "HxxI", data, body)
+            interfaces.append((linktype, snaplen, _parse_tsresol(data, body + 8, end, endian)))
+        elif block_type == PCAPNG_BLOCK_EPB or block_type == PCAPNG_BLOCK_PB:
+            if block_type == PCAPNG_BLOCK_EPB:
+                interface, tshigh, tslow, caplen = struct.unpack_from(endian + "IIII", data, body)
+            else:
+                interface, _, tshigh, tslow, caplen = struct.unpack_from(endian + "HHIII", data, body)
+            if interface < len(interfaces) and body + 20 + caplen <= end:
+                linktype, _, resolution = interfaces[interface]
+                yield data[body + 20:body + 20 + caplen], linktype, (tshigh << 32) | tslow, resolution
+        elif block_type == PCAPNG_BLOCK_SPB and interfaces:
+            # Simple packet blocks have no timestamp
+            linktype, snaplen, resolution = interfaces[0]
+            wirelen, = struct.unpack_from(endian + "I", data, body)
+            caplen = min(wirelen, snaplen or wirelen, end - body - 4)
+            yield data[body + 4:body + 4 + caplen], linktype, None, resolution
+        offset += block_length
+    return offset
+
+
+LINKTYPE_ETHERNET = 1
+
+
+class PcapWriter:
+    def __init__(self, capture, nanosecond=False, snaplen=65535):
+        '''
+        Create PcapWriter, writing frames to a pcap file
+
+        Args:
+            capture: path of the capture file
+            nanosecond: True to write nanosecond timestamps instead of microsecond timestamps
+            snaplen: snapshot length written in the file header
+        '''
+        magic = b"\x4d\x3c\xb2\xa1" if nanosecond else b"\xd4\xc3\xb2\xa1"
+        self.resolution = PCAP_MAGIC[magic][1]
+        self._record_header = struct.Struct("<IIII")
+        self._file = open(capture, "wb")
+        self._file.write(magic + struct.pack("<HHiIII", 2, 4, 0, 0, snaplen, LINKTYPE_ETHERNET))
+
+    def write(self, frame, timestamp):
+        '''
+        Write a frame
+
+        Args:
+            frame: the frame bytes
+            timestamp: integer number of nanoseconds since the epoch
+        '''
+        sec, nsec = divmod(timestamp, 1000000000)
+        frac = nsec if self.resolution == 1000000000 else nsec // 1000
+        self._file.write(self._record_header.pack(sec, frac, len(frame), len(frame)))
+        self._file.write(frame)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PcapngWriter(PcapWriter):
+    def __init__(self, capture, nanosecond=False, snaplen=65535):
+        '''
+        Create PcapngWriter, writing frames to a pcapng file with a single Ethernet interface
+
+        Args:
+            capture: path of the capture file
+            nanosecond: True to write nanosecond timestamps instead of microsecond timestamps
+            snaplen: snapshot length of the interface
+        '''
+        self.resolution = 1000000000 if nanosecond else 1000000
+        self._file = open(capture, "wb")
+        # Section header block
+        self._file.write(struct.pack("<IIIHHqI", 0x0A0D0D0A, 28, 0x1A2B3C4D, 1, 0, -1, 28))
+        # Interface description block with the timestamp resolution option
+        options = struct.pack("<HHB3x", PCAPNG_OPTION_TSRESOL, 1, 9 if nanosecond else 6) + struct.pack("<HH", 0, 0)
+        length = 20 + len(options)
+        self._file.write(struct.pack("<IIHHI", PCAPNG_BLOCK_IDB, length, LINKTYPE_ETHERNET, 0, snaplen)
+                         + options + struct.pack("<I", length))
+
+    def write(self, frame, timestamp):
+        '''
+        Write a frame as an enhanced packet block
+
+        Args:
+            frame: the frame bytes
+            timestamp: integer number of nanoseconds since the epoch
+        '''
+        ticks = timestamp if self.resolution == 1000000000 else timestamp // 1000
+        padding = (-len(frame)) % 4
+        length = 32 + len(frame) + padding
+        self._file.write(struct.pack("<IIIIIII", PCAPNG_BLOCK_EPB, length, 0, ticks >> 32, ticks & 0xFFFFFFFF,
+                                     len(frame), len(frame)))
+        self._file.write(frame + b"\x00" * padding + struct.pack("<I", length))
@@ -0,0 +1,84 @@
+"""Shared memory ring buffer
+A ring buffer of fixed size records in shared memory, with a single producer and a single consumer.
+It is used to pass parsed IGMP events from the capturing process to the test process while capturing.
+The producer never blocks: when the consumer doesn't keep up, the oldest records are overwritten
+and counted as dropped by the consumer.
+"""
+from multiprocessing import shared_memory
+import struct
+
+# The header only contains the number of records written so far
+HEADER = struct.Struct("<Q")
+
+
+class RingBuffer:
+    def __init__(self, record_format, capacity=4096, name=None):
+        '''
+        Create a ring buffer, or attach to an existing one
+
+        Args:
+            record_format: struct format of a single record
+            capacity: number of records in the ring buffer
+            name: name of the shared memory of an existing ring buffer to attach to
+        '''
+        self.record_format = record_format
+        self.capacity = capacity
+        self._record = struct.Struct(record_format)
+        size = HEADER.size + capacity * self._record.size
+        self._shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self._write_index = 0
+        self._read_index = 0
+        self.dropped = 0
+
+    def __getstate__(self):
+        # Attach to the same shared memory when passed to a spawned process
+        return (self.record_format, self.capacity, self._shm.name)
+
+    def __setstate__(self, state):
+        record_format, capacity, name = state
+        self.__init__(record_format, capacity, name)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def put(self, *values):
+        '''
+        Write a record, this should only be called by the producer
+        '''
+        offset = HEADER.size + (self._write_index % self.capacity) * self._record.size
+        self._record.pack_into(self._shm.buf, offset, *values)
+        self._write_index += 1
+        # Publish the record only after it is completely written
+        HEADER.pack_into(self._shm.buf, 0, self._write_index)
+
+    def get(self):
+        '''
+        Read all records written since the previous call, this should only be called by the consumer
+
+        Returns:
+            list: a tuple per record
+        '''
+        write_index, = HEADER.unpack_from(self._shm.buf, 0)
+        if write_index - self._read_index > self.capacity:
+            self.dropped += write_index - self._read_index - self.capacity
+            self._read_index = write_index - self.capacity
+        records = []
+        for index in range(self._read_index, write_index):
+            offset = HEADER.size + (index % self.capacity) * self._record.size
+            records.append(self._record.unpack_from(self._shm.buf, offset))
+
+        # Records which were overwritten while reading them can't be trusted,
+        # including the record which might be in the process of being written
+        overwritten, = HEADER.unpack_from(self._shm.buf, 0)
+        overwritten += 1 - self.capacity - self._read_index
+        if overwritten > 0:
+            self.dropped += overwritten
+            records = records[overwritten:]
+        self._read_index = write_index
+        return records
+
+    def close(self, unlink=False):
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
@@ -0,0 +1,201 @@
+"""Simulated IGMP host
+An IGMPv2/IGMPv3 host emulator, used to run the test suites without a real DUT, for example on one end
+of a veth pair. The host is a member of a configurable number of groups and responds to membership queries
+with random delays as described in RFC 2236 and RFC 3376. Faults can be enabled to verify that the tests
+detect misbehaving devices.
+"""
+from multiprocessing import Process, Event
+import heapq
+import random
+import select
+import signal
+import sys
+from time import time
+import pcapy
+import lib.packet as packet
+from lib.capture import IGMP_SNAPLEN
+from lib.utils import v3_max_response_time
+
+SIMHOST_MAC = "02:00:00:00:00:01"
+SIMHOST_IP = "2.0.0.10"
+# Older Version Querier Present Timeout with the default robustness variable, query interval
+# and query response interval (RFC 3376 section 8.12)
+OLDER_VERSION_QUERIER_TIMEOUT = 260  # seconds
+WAKEUP_INTERVAL = 0.1  # seconds
+
+# Respond to all groups at the same time instead of spreading the responses over the maximum response time
+FAULT_BURST = "burst"
+# Respond after the maximum response time
+FAULT_LATE = "late"
+# Transmit membership reports periodically, also without queries
+FAULT_UNSOLICITED = "unsolicited"
+# Address membership reports to the all systems group instead of the group or 224.0.0.22
+FAULT_WRONG_DESTINATION = "wrong_destination"
+FAULTS = (FAULT_BURST, FAULT_LATE, FAULT_UNSOLICITED, FAULT_WRONG_DESTINATION)
+
+
+class SimulatedHost(Process):
+    def __init__(self, interface, groups=1, version="v3", mac=SIMHOST_MAC, ip=SIMHOST_IP, faults=(),
+                 unsolicited_interval=10, seed=None):
+        '''
+        Create SimulatedHost, a process emulating an IGMP host
+
+        Args:
+            interface: interface to receive queries on and transmit membership reports on
+            groups: number of groups the host is a member of, starting at 239.255.0.1 (sACN universe 1)
+            version: IGMP version of the host, "v2" or "v3". An IGMPv3 host falls back to IGMPv2
+                    when it receives an IGMPv2 query
+            mac: source MAC address of the host
+            ip: source IP address of the host
+            faults: faults to enable, see FAULTS
+            unsolicited_interval: interval of the unsolicited membership reports of FAULT_UNSOLICITED in seconds
+            seed: seed of the random response delays, None for a random seed
+        '''
+        for fault in faults:
+            if fault not in FAULTS:
+                raise Exception(f'Unknown fault: {fault}')
+        self.interface = interface
+        self.groups = [packet.group_address(index) for index in range(1, groups + 1)]
+        self.version = version
+        self.mac = mac
+        self.ip = ip
+        self.faults = set(faults)
+        self.unsolicited_interval = unsolicited_interval
+        self.seed = seed
+        self.ready_event = Event()
+
+        Process.__init__(self)
+
+    @staticmethod
+    def _handle_term(signum, frame):
+        sys.exit(0)
+
+    def start(self):
+        Process.start(self)
+        if not self.ready_event.wait(5):
+            raise Exception(f'Simulated host on {self.interface} did not start')
+
+    def stop(self):
+        self.ready_event.clear()
+        self.join(1)
+        if self.is_alive():
+            self.terminate()
+            self.join(8)
+
+    def _effective_version(self, now):
+        if self.version == "v2" or now < self._v2_querier_until:
+            return "v2"
+        return "v3"
+
+    def _delay(self, max_response_time):
+        if FAULT_LATE in self.faults:
+            return self._rng.uniform(max_response_time, max_response_time * 1.5)
+        return self._rng.uniform(0, max_response_time)
+
+    def _schedule(self, now, group, max_response_time, delay=None):
+        '''
+        Start the response timer of a group, or of the whole interface for group None (IGMPv3 general query)
+        A running timer is only reset when it would expire later than the new delay.
+        '''
+        due = now + (self._delay(max_response_time) if delay is None else delay)
+        running = self._timers.get(group)
+        if running is not None and running <= due:
+            return
+        self._timers[group] = due
+        heapq.heappush(self._heap, (due, group or "", group))
+
+    def _handle_query(self, now, version, data):
+        gaddr = packet.int_to_ip(data.gaddr)
+        if gaddr != "0.0.0.0" and gaddr not in self._members:
+            return
+        if version == "v2" and self.version == "v3":
+            self._v2_querier_until = now + OLDER_VERSION_QUERIER_TIMEOUT
+        if version == "v2" or self._effective_version(now) == "v2":
+            # An IGMPv2 host handles an IGMPv3 query as an IGMPv2 query
+            max_response_time = data.mrcode / 10
+        else:
+            max_response_time = v3_max_response_time(data.mrcode)
+        groups = self.groups if gaddr == "0.0.0.0" else [gaddr]
+
+        if FAULT_BURST in self.faults:
+            delay = self._delay(max_response_time)
+            for group in groups:
+                self._schedule(now, group, max_response_time, delay)
+        elif self._effective_version(now) == "v3" and gaddr == "0.0.0.0":
+            self._schedule(now, None, max_response_time)
+        else:
+            # A pending response to a general query which is sooner already covers the group
+            general = self._timers.get(None)
+            for group in groups:
+                if general is None or general > now + max_response_time:
+                    self._schedule(now, group, max_response_time)
+
+    def _handle_frame(self, hdr, frame):
+        if hdr is None:
+            return
+        event = packet.decode_igmp_frame(frame)
+        if event is None:
+            return
+        version, type, data = event
+        if type == packet.IGMPMessageType.MEMBERSHIP_QUERY.value:
+            self._handle_query(time(), version, data)
+
+    def _send_reports(self, now, groups):
+        wrong_destination = FAULT_WRONG_DESTINATION in self.faults
+        if self._effective_version(now) == "v2":
+            dst = "224.0.0.1" if wrong_destination else None
+            for group in groups:
+                self._sender.send(packet.build_igmp_v2_membership_report(self.mac, self.ip, group, dst))
+            return
+        dst = "224.0.0.1" if wrong_destination else "224.0.0.22"
+        records = [(packet.GroupRecordType.MODE_IS_EXCLUDE.value, group) for group in groups]
+        # The burst fault transmits a membership report per group instead of combining the groups
+        size = 1 if FAULT_BURST in self.faults else packet.V3_REPORT_MAX_RECORDS
+        for index in range(0, len(records), size):
+            self._sender.send(packet.build_igmp_v3_membership_report(self.mac, self.ip, records[index:index + size],
+                                                                     dst))
+
+    def _expire_timers(self, now):
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, group = heapq.heappop(self._heap)
+            # Timers which were reset leave an outdated entry in the heap
+            if self._timers.get(group) != due:
+                continue
+            del self._timers[group]
+            expired += self.groups if group is None else [group]
+        if expired:
+            self._send_reports(now, expired)
+
+    def run(self):
+        print(f"Starting simulated {self.version} host {self.mac} ({self.ip}) on interface {self.interface} "
+              f"with {len(self.groups)} groups and faults {sorted(self.faults)}")
+        self._rng = random.Random(self.seed)
+        self._members = set(self.groups)
+        self._timers = {}
+        self._heap = []
+        self._v2_querier_until = 0
+        cap = pcapy.open_live(self.interface, IGMP_SNAPLEN, True, 10)
+        cap.setfilter(f"ip proto 2 and not ether src {self.mac}")
+        cap.setnonblock(True)
+        self._sender = packet.QuerySender(self.interface, tx_timestamps=False)
+        signal.signal(signal.SIGTERM, self._handle_term)
+
+        next_unsolicited = time() + self.unsolicited_interval
+        self.ready_event.set()
+        try:
+            while self.ready_event.is_set():
+                now = time()
+                next_due = min(self._heap[0][0] if self._heap else now + WAKEUP_INTERVAL,
+                               next_unsolicited if FAULT_UNSOLICITED in self.faults else now + WAKEUP_INTERVAL)
+                select.select([cap.getfd()], [], [], min(WAKEUP_INTERVAL, max(0, next_due - now)))
+                cap.dispatch(-1, self._handle_frame)
+
+                now = time()
+                self._expire_timers(now)
+                if FAULT_UNSOLICITED in self.faults and now >= next_unsolicited:
+                    self._send_reports(now, self.groups)
+                    next_unsolicited = now + self.unsolicited_interval
+        finally:
+            self._sender.close()
+            cap.close()
@@ -0,0 +1,251 @@
+"""Membership report timing analysis
+Vectorized analysis of the response times of membership reports to a membership query.
+All calculations are done in batch with NumPy, so the analysis scales to captures with
+hundreds of thousands of membership reports, for example captures of a whole network.
+Timestamps are either integer nanoseconds or float seconds since the epoch. Integer timestamps
+are subtracted as integers, so the latencies keep the full nanosecond precision of the capture.
+"""
+import array
+import numpy as np
+
+# Membership reports which are transmitted closer together than this interval are considered a burst
+BURST_INTERVAL = 0.001  # seconds
+PERCENTILES = (50, 90, 99)
+# Window sizes of the sliding window report rates
+RATE_WINDOWS = (0.001, 0.01, 0.1)  # seconds
+
+
+def _is_ns(value):
+    return np.issubdtype(np.asarray(value).dtype, np.integer)
+
+
+def seconds_since(reference, times):
+    """Get the time elapsed since a reference time in seconds, as a float64 array
+    The times and the reference are nanoseconds when they are integers, otherwise seconds.
+    The reference is a single time or an array of a reference time per time.
+    """
+    times = np.asarray(times)
+    reference = np.asarray(reference)
+    if _is_ns(times) and _is_ns(reference):
+        return (times.astype(np.int64) - reference.astype(np.int64)) / 1e9
+    times = times / 1e9 if _is_ns(times) else times.astype(np.float64)
+    reference = reference / 1e9 if _is_ns(reference) else reference.astype(np.float64)
+    return times - reference
+
+
+def report_arrays(membership_reports):
+    """Get the timestamps, source addresses and group addresses of membership reports as NumPy arrays
+    The membership reports can be an iterable of reports as returned by the lib.packet getters and their
+    streaming variants, a dictionary with columns as returned by lib.packet.read_igmp_columns or an array
+    of timestamps. Returns a tuple (times, sources, group_times, groups). The times are integer nanoseconds
+    when the input contains them, otherwise float seconds, the addresses are integers. The group arrays
+    have an entry per group in a report, since an IGMPv3 membership report can contain multiple group records.
+    The sources and groups are None when they are not available in the input.
+    """
+    if isinstance(membership_reports, dict):
+        if "time_ns" in membership_reports:
+            times = np.asarray(membership_reports["time_ns"], dtype=np.int64)
+        else:
+            times = np.asarray(membership_reports["time"], dtype=np.float64)
+        return times, membership_reports["src"], times, membership_reports["gaddr"]
+    if isinstance(membership_reports, np.ndarray):
+        times = membership_reports if _is_ns(membership_reports) else membership_reports.astype(np.float64)
+        return times, None, times, None
+
+    # Collected in typed arrays, so the reports can be streamed
+    times = array.array("q")
+    sources = array.array("I")
+    group_times = array.array("q")
+    groups = array.array("I")
+    for report in membership_reports:
+        times.append(report.time_ns)
+        sources.append(report.src)
+        if hasattr(report, "records"):
+            for record in report.records:
+                group_times.append(report.time_ns)
+                groups.append(record.maddr)
+        else:
+            group_times.append(report.time_ns)
+            groups.append(report.gaddr)
+    return (np.array(times, dtype=np.int64), np.array(sources, dtype=np.uint32),
+            np.array(group_times, dtype=np.int64), np.array(groups, dtype=np.uint32))
+
+
+def _percentiles(ordered, starts, counts, percentiles):
+    """Calculate percentiles per group of a sorted array using linear interpolation, like numpy.percentile"""
+    result = {}
+    for percentile in percentiles:
+        position = starts + (counts - 1) * (percentile / 100)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        result[percentile] = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+    return result
+
+
+def analyse_timing_per_key(query_time, times, keys, percentiles=PERCENTILES):
+    """Analyse the response timing of membership reports per key (e.g. per source or per group)
+    For every key, the response latencies since the query, the gaps between consecutive responses,
+    percentiles of both and the size of the largest burst are calculated in one batch.
+    The gap of the first response of a key is the time since the query.
+    Returns a dictionary with the statistics per key, all times in seconds.
+    """
+    # Latencies relative to the query keep their precision as float64, absolute timestamps don't
+    times = seconds_since(query_time, times)
+    if len(times) == 0:
+        return {}
+    keys = np.asarray(keys)
+    unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+
+    order = np.lexsort((times, inverse))
+    latencies = times[order]
+    ordered_keys = inverse[order]
+    starts = np.cumsum(counts) - counts
+
+    gaps = np.diff(latencies, prepend=0.0)
+    gaps[starts] = latencies[starts]
+
+    # A burst is a run of responses where each response follows the previous one within the burst interval
+    in_burst = gaps < BURST_INTERVAL
+    in_burst[starts] = False
+    run_ids = np.cumsum(~in_burst)
+    max_burst = np.ones(len(unique_keys), dtype=np.int64)
+    if in_burst.any():
+        run_lengths = np.bincount(run_ids[in_burst])
+        burst_runs = np.flatnonzero(run_lengths)
+        # Every run starts with the response before the first response in burst
+        run_keys = ordered_keys[np.searchsorted(run_ids, burst_runs)]
+        np.maximum.at(max_burst, run_keys, run_lengths[burst_runs] + 1)
+
+    gap_order = np.lexsort((gaps, ordered_keys))
+    latency_percentiles = _percentiles(latencies, starts, counts, percentiles)
+    gap_percentiles = _percentiles(gaps[gap_order], starts, counts, percentiles)
+    first_latency = latencies[starts]
+    last_latency = latencies[starts + counts - 1]
+
+    stats = {}
+    for index, key in enumerate(unique_keys.tolist()):
+        stats[key] = {
+            "count": int(counts[index]),
+            "first_latency": float(first_latency[index]),
+            "last_latency": float(last_latency[index]),
+            "latency_percentiles": {p: float(values[index]) for p, values in latency_percentiles.items()},
+            "gap_percentiles": {p: float(values[index]) for p, values in gap_percentiles.items()},
+            "max_burst": int(max_burst[index]),
+        }
+    return stats
+
+
+def analyse_timing(query_time, times, percentiles=PERCENTILES):
+    """Analyse the response timing of all membership reports together
+    Returns a dictionary with the same statistics as analyse_timing_per_key, together with the
+    latencies and gaps arrays, sorted by arrival time.
+    """
+    latencies = np.sort(seconds_since(query_time, times))
+    stats = analyse_timing_per_key(0.0, latencies, np.zeros(len(latencies), dtype=np.int8), percentiles)
+    stats = stats.get(0, {"count": 0})
+    stats["latencies"] = latencies
+    stats["gaps"] = np.diff(latencies, prepend=0.0)
+    return stats
+
+
+def match_responses(query_times, response_times, max_response_time):
+    """Match every query with the first response after it, within the maximum response time
+    Returns an array with the response latency in seconds of every query, NaN for queries without
+    a response in time.
+    """
+    query_times = np.asarray(query_times)
+    response_times = np.sort(np.asarray(response_times))
+    latencies = np.full(len(query_times), np.nan)
+    if len(response_times) == 0:
+        return latencies
+    if not (_is_ns(query_times) and _is_ns(response_times)):
+        query_times = seconds_since(0, query_times)
+        response_times = seconds_since(0, response_times)
+    first = np.searchsorted(response_times, query_times, side="right")
+    answered = first < len(response_times)
+    latencies[answered] = seconds_since(query_times[answered], response_times[first[answered]])
+    latencies[latencies > max_response_time] = np.nan
+    return latencies
+
+
+def analyse_report_rates(times, keys=None, windows=RATE_WINDOWS):
+    """Analyse the peak rates of membership reports over sliding windows
+    For every window size, the largest number of membership reports within any window of that size is
+    calculated for all reports together and, when keys are given, per key (e.g. per source). The busiest
+    window always starts at a report, so the number of reports in the window starting at every report
+    is counted with a single binary search over the sorted timestamps per window size. The keys are
+    handled in the same search by spacing the timestamps of every key far apart.
+    A window of size w starting at t contains the reports in [t, t + w). The offsets and windows are
+    compared as integer nanoseconds, so with nanosecond timestamps a report exactly at the end of a window
+    isn't counted in it. Float timestamps since the epoch are only accurate to a fraction of a microsecond.
+    Returns a dictionary with the number of reports and, per window size, the peak number of reports,
+    the peak rate in reports per second and the start of the busiest window in seconds since the first
+    report. The peak rate is None when the busiest window contains less than 2 reports, a rate can't be
+    derived from a single report. The same statistics, without the start, are available per key in per_key.
+    """
+    times = np.asarray(times)
+    if len(times) == 0:
+        return {
+            "count": 0,
+            "windows": {window: {"peak_count": 0, "peak_rate": None, "peak_start": None} for window in windows},
+            "per_key": {},
+        }
+    if _is_ns(times):
+        offsets = times.astype(np.int64) - np.int64(times.min())
+    else:
+        offsets = np.round(seconds_since(times.min(), times) * 1e9).astype(np.int64)
+    windows_ns = {window: int(round(window * 1e9)) for window in windows}
+    ordered = np.sort(offsets)
+    indices = np.arange(len(ordered))
+    result = {"count": len(ordered), "windows": {}, "per_key": {}}
+    for window, window_ns in windows_ns.items():
+        counts = np.searchsorted(ordered, ordered + window_ns, side="left") - indices
+        peak = int(np.argmax(counts))
+        result["windows"][window] = {
+            "peak_count": int(counts[peak]),
+            "peak_rate": _peak_rate(counts[peak], window),
+            "peak_start": float(ordered[peak] / 1e9),
+        }
+    if keys is None:
+        return result
+
+    unique_keys, inverse = np.unique(np.asarray(keys), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.lexsort((offsets, inverse))
+    # Every key gets its own time range, further apart than the largest window
+    stride = int(ordered[-1]) + max(windows_ns.values()) + 1
+    spaced = offsets[order] + inverse[order].astype(np.int64) * stride
+    starts = np.searchsorted(inverse[order], np.arange(len(unique_keys)))
+    per_key = {window: np.maximum.reduceat(np.searchsorted(spaced, spaced + window_ns, side="left") - indices, starts)
+               for window, window_ns in windows_ns.items()}
+    for index, key in enumerate(unique_keys.tolist()):
+        result["per_key"][key] = {
+            window: {"peak_count": int(peaks[index]), "peak_rate": _peak_rate(peaks[index], window)}
+            for window, peaks in per_key.items()}
+    return result
+
+
+def _peak_rate(count, window):
+    return float(count / window) if count >= 2 else None
+
+
+def uniformity_test(samples, high):
+    """Kolmogorov-Smirnov goodness-of-fit test of samples against the uniform distribution on [0, high]
+    Returns the KS statistic (the largest distance between the empirical and the uniform distribution
+    function) and the p-value, calculated with the asymptotic Kolmogorov distribution and the correction
+    of Stephens for small samples. Samples outside [0, high] are clipped.
+    """
+    ordered = np.sort(np.clip(np.asarray(samples, dtype=np.float64) / high, 0, 1))
+    n = len(ordered)
+    if n == 0:
+        return float("nan"), float("nan")
+    ranks = np.arange(1, n + 1)
+    statistic = max(float(np.max(ranks / n - ordered)), float(np.max(ordered - (ranks - 1) / n)))
+    scaled = (np.sqrt(n) + 0.12 + 0.11 / np.sqrt(n)) * statistic
+    # The series converges slowly for small values, where the p-value is 1 anyway
+    if scaled < 0.2:
+        return statistic, 1.0
+    k = np.arange(1, 101)
+    p_value = 2 * np.sum((-1.0) ** (k - 1) * np.exp(-2 * k ** 2 * scaled ** 2))
+    return statistic, float(np.clip(p_value, 0, 1))
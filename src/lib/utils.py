@@ -1,10 +1,25 @@
-from configuration import IFACE, MGROUP_1, IGMP_MEMBERSHIP_REPORT_THRESHOLD
+from configuration import IFACE, MGROUP_1, IGMP_MEMBERSHIP_REPORT_THRESHOLD, MULTI_DUT, MULTI_DUT_DEVICES
+from configuration import QUERIER_REPORT_CAPACITY, QUERIER_REPORT_BURST, RANDOMNESS_SIGNIFICANCE
+import lib.cache as cache
+import lib.metrics as metrics
 import lib.packet as packet
+import lib.timing as timing
 import psutil
 import socket
 import os
 import warnings
 from statistics import median
+from itertools import chain
+import numpy as np
+
+# Tolerance added to the maximum response time to take into account network transit time and
+# timestamp inaccuracy: captures usually have microsecond precision host timestamps, taken by the
+# kernel after the network driver handled the frame (see CAPTURE_TIMESTAMP_TYPE).
+RESPONSE_TIME_TOLERANCE = 0.1  # seconds
+ALL_IGMPV3_ROUTERS = packet.ip_to_int("224.0.0.22")
+
+# Groups the DUT reported in response to general membership queries during this session
+known_groups = set()
 
 
 def check_interface_up(expected=True):
@@ -16,26 +31,57 @@ def check_interface_up(expected=True):
     assert up == expected, f'Interface {IFACE} is not in the expected link state (up = {expected})'
 
 
+def reported_groups(v2_membership_reports, v3_membership_reports=()):
+    """Get the groups of IGMPv2 membership reports and the group records of IGMPv3 membership reports"""
+    groups = {report.gaddr for report in v2_membership_reports}
+    for report in v3_membership_reports:
+        groups.update(record.maddr for record in report.records)
+    return {packet.int_to_ip(group) for group in groups}
+
+
+def expected_groups(gaddr="0.0.0.0"):
+    """Get the groups the DUT is expected to report in response to a membership query
+    For a group specific query, this is the queried group. For a general query, these are the groups the DUT
+    reported to earlier general queries. It is empty when the reported groups can't be predicted, e.g. when
+    testing multiple devices at once, so the full maximum response time has to be awaited.
+    """
+    if MULTI_DUT:
+        return set()
+    if gaddr != "0.0.0.0":
+        return {gaddr}
+    return set(known_groups)
+
+
+@metrics.timed("validation")
 def validate_igmpv2_reports(
         pcap_file,
         gaddr="0.0.0.0"):
     print("Check capture for V2 membership report")
     membership_reports = packet.get_v2_membership_reports(pcap_file)
+    print(membership_reports)
+    check_igmpv2_reports(membership_reports, gaddr)
+    if gaddr == "0.0.0.0":
+        known_groups.update(reported_groups(membership_reports))
+
+
+def check_igmpv2_reports(membership_reports, gaddr="0.0.0.0"):
+    """Validate IGMPv2 membership reports
+    This validates the membership reports received as a response to a single membership query.
+    """
     assert len(membership_reports) > 0, f"Found {len(membership_reports)} IGMPv2 membership " \
                                         f"reports, expected at least 1"
-    print(membership_reports)
 
     print("Check that for each membership report, the IP destination address is equal to the group address")
-    gaddrs = []
+    gaddrs = set()
     source_ips = {}
     for report in membership_reports:
-        src = report['src']
-        dst = report['dst']
-        rcv_gaddr = report['gaddr']
+        src = packet.int_to_ip(report.src)
+        dst = packet.int_to_ip(report.dst)
+        rcv_gaddr = packet.int_to_ip(report.gaddr)
         assert dst == rcv_gaddr, f"Received membership report from {src} where destination " \
                                  f"address {dst} is not equal to the group address {rcv_gaddr}"
         assert rcv_gaddr not in gaddrs, f"Received duplicate membership report for {rcv_gaddr}"
-        gaddrs.append(rcv_gaddr)
+        gaddrs.add(rcv_gaddr)
         if src in source_ips.keys():
             source_ips[src] += 1
         else:
@@ -45,11 +91,11 @@ def validate_igmpv2_reports(
         assert gaddr in gaddrs, f"No membership report for {gaddr} received"
         assert len(gaddrs) == 1, f"Received membership report for multiple " \
                                  f"addresses as a response to the specific " \
-                                 f"query for {gaddr}: {gaddrs}"
+                                 f"query for {gaddr}: {sorted(gaddrs)}"
 
     if len(source_ips) > 1:
         warnings.warn(UserWarning(f"INFO: Received membership reports from {len(source_ips)} "
-                                  "different sources. Make sure you only test 1 device at a time. "
+                                  "different sources. Make sure you only test 1 device at a time, or enable MULTI_DUT. "
                                   "[{source_ips.keys()}]."))
 
     for src, count in source_ips.items():
@@ -65,6 +111,7 @@ def validate_igmpv2_reports(
     assert True
 
 
+@metrics.timed("validation")
 def validate_igmpv3_reports(pcap_file, gaddr="0.0.0.0"):
     """Validate IGMPv3 reports
     This is a helper function to validate if a pcap file contains IGMPv2 or IGMPv3
@@ -72,29 +119,40 @@ def validate_igmpv3_reports(pcap_file, gaddr="0.0.0.0"):
     """
     v2_membership_reports = packet.get_v2_membership_reports(pcap_file)
     v3_membership_reports = packet.get_v3_membership_reports(pcap_file)
+    print(v2_membership_reports)
+    print(v3_membership_reports)
+    membership_reports = check_igmpv3_reports(v2_membership_reports, v3_membership_reports, gaddr)
+    if gaddr == "0.0.0.0":
+        known_groups.update(reported_groups(v2_membership_reports, v3_membership_reports))
+    return membership_reports
+
+
+def check_igmpv3_reports(v2_membership_reports, v3_membership_reports, gaddr="0.0.0.0"):
+    """Validate IGMPv2 or IGMPv3 membership reports as a response to a single IGMPv3 membership query
+    Returns all membership reports.
+    """
     assert len(v3_membership_reports) > 0 or len(v2_membership_reports) > 0, \
         "Found no IGMP membership " \
         "reports, expected at least 1"
-    print(v2_membership_reports)
-    print(v3_membership_reports)
 
     if len(v3_membership_reports) == 0:
         warnings.warn(UserWarning("INFO: DUT responded with V2 membership reports to V3 query"))
 
     print(f"Check that a v3 membership report is received for {MGROUP_1}")
 
+    mgroup_1 = packet.ip_to_int(MGROUP_1)
     found_mgroup_1_join = False
     for report in v2_membership_reports:
-        if report["gaddr"] == MGROUP_1:
+        if report.gaddr == mgroup_1:
             found_mgroup_1_join = True
-            assert report["gaddr"] == report["dst"], "Membership reports should use the same multicast destination " \
-                                                     "address as the address present in the IGMP payload"
+            assert report.gaddr == report.dst, "Membership reports should use the same multicast destination " \
+                                               "address as the address present in the IGMP payload"
     for report in v3_membership_reports:
-        assert report["dst"] == "224.0.0.22", "IGMPv3 packets should be addressed to 224.0.0.22"
+        assert report.dst == ALL_IGMPV3_ROUTERS, "IGMPv3 packets should be addressed to 224.0.0.22"
         if gaddr != '0.0.0.0':
-            assert len(report["records"]) == 1, 'Specific membership reports are expected to have 1 group record'
-        for record in report["records"]:
-            if record.maddr == MGROUP_1:
+            assert len(report.records) == 1, 'Specific membership reports are expected to have 1 group record'
+        for record in report.records:
+            if record.maddr == mgroup_1:
                 found_mgroup_1_join = True
 
     assert found_mgroup_1_join, f"Expected to get an IGMP membership report for multicast group {MGROUP_1}"
@@ -102,32 +160,46 @@ def validate_igmpv3_reports(pcap_file, gaddr="0.0.0.0"):
     return v2_membership_reports + v3_membership_reports
 
 
+@metrics.timed("validation")
 def validate_reports(query_time, max_response_time, membership_reports):
+    """Validate the timing of membership reports as a response to a membership query
+    The membership reports can be a list of reports as returned by the lib.packet getters, a dictionary
+    with the membership report columns as returned by lib.packet.read_igmp_columns or an array of timestamps.
+    Returns the response time of the first membership report.
+    """
     print("Verify for each membership report that it arrived in time")
-    # Add a small tolerance to the maximum response time to take into account
-    # network transit time and timestamp inaccuracy
-    max_resp = max_response_time + 0.1
-    last_resp = query_time
-    elapsed_list = []
-    response_time = None
-    for report in membership_reports:
-        # Calculate that the elapsed time since the query packet is within tolerance
-        elapsed = report["time"] - query_time
-        print(f"Got response in {elapsed} seconds. Max is {max_response_time} seconds")
+    max_resp = max_response_time + RESPONSE_TIME_TOLERANCE
+    times, sources, group_times, groups = timing.report_arrays(membership_reports)
+    result = timing.analyse_timing(query_time, times)
+    latencies = result["latencies"]
+    print(f"Got {result['count']} responses, first after {result.get('first_latency')} seconds and last after "
+          f"{result.get('last_latency')} seconds. Max is {max_response_time} seconds")
+
+    late = latencies >= max_resp
+    if late.any():
+        elapsed = latencies[late][0]
         assert elapsed < max_resp, f"Membership report received after {elapsed} seconds, " \
                                    f"but the maximum is {max_response_time} seconds"
-        # Only track first response for statistic calculations.
-        # Some devices may have lots of responses, this may disturb the result of the statistics
-        if response_time is None:
-            response_time = elapsed
-
-        # Calculate the elapsed time since the previous membership report and verify
-        # That these are not transmitted in a burst
-        elapsed = report["time"] - last_resp
-        last_resp = report["time"]
-        elapsed_list.append(elapsed)
-
-    median_inter_response_time = median(elapsed_list)
+    # Only track first response for statistic calculations.
+    # Some devices may have lots of responses, this may disturb the result of the statistics
+    response_time = result.get("first_latency")
+    metrics.record("first_response_latency", response_time)
+    metrics.record("report_count", result["count"])
+
+    # The elapsed time since the previous membership report is used to verify
+    # that these are not transmitted in a burst
+    if sources is not None:
+        for src, stats in timing.analyse_timing_per_key(query_time, times, sources).items():
+            print(f"Responses from {packet.int_to_ip(src)}: {stats['count']} responses, "
+                  f"latency percentiles {stats['latency_percentiles']}, "
+                  f"gap percentiles {stats['gap_percentiles']}, largest burst {stats['max_burst']}")
+    if groups is not None:
+        for group, stats in timing.analyse_timing_per_key(query_time, group_times, groups).items():
+            if stats["count"] > 1:
+                print(f"Received {stats['count']} responses for group {packet.int_to_ip(group)}, "
+                      f"largest burst {stats['max_burst']}")
+
+    median_inter_response_time = result["gap_percentiles"][50]
     assert median_inter_response_time > 0.001, \
         f"The median time between membership responses is {median_inter_response_time}. " \
         f"This might indicate that responses are transmitted in burst instead of randomly " \
@@ -135,14 +207,45 @@ def validate_reports(query_time, max_response_time, membership_reports):
         f"overload the IGMP querier and cause responses to be dropped, leading to the multicast " \
         f"registrations being dropped as well."
 
-    assert len(elapsed_list) <= IGMP_MEMBERSHIP_REPORT_THRESHOLD, \
-        f"Received {len(elapsed_list)} membership reports. " \
+    check_report_rates(times, sources)
+
+    assert result["count"] <= IGMP_MEMBERSHIP_REPORT_THRESHOLD, \
+        f"Received {result['count']} membership reports. " \
         f"There is a limit to the amount of membership reports network equipment can handle. " \
         f"Verify that all these multicast addresses are necessary for your application."
 
     return response_time
 
 
+def check_report_rates(times, sources=None):
+    """Validate that the peak membership report rates don't exceed the capacity of the querier
+    The median time between membership reports doesn't detect a burst of reports in between reports
+    which are spread out well, so the number of reports in sliding windows of 1, 10 and 100 ms is checked.
+    Returns the report rate analysis, see lib.timing.analyse_report_rates.
+    """
+    rates = timing.analyse_report_rates(times, sources)
+    for window, peak in rates["windows"].items():
+        # The number of reports, a rate derived from a single report in a small window is meaningless
+        metrics.record(f"peak_report_count_{window * 1000:g}ms", peak["peak_count"])
+        rate = f" ({peak['peak_rate']:.0f} reports/s)" if peak["peak_rate"] is not None else ""
+        print(f"Peak of {peak['peak_count']} membership reports within {window * 1000:g} ms{rate}, "
+              f"starting {peak['peak_start']} seconds after the first report")
+    for src, peaks in rates["per_key"].items():
+        counts = ", ".join(f"{peak['peak_count']} within {window * 1000:g} ms" for window, peak in peaks.items())
+        print(f"Peak membership reports of {packet.int_to_ip(src)}: {counts}")
+
+    overloaded = [f"{peak['peak_count']} membership reports within {window * 1000:g} ms"
+                  for window, peak in rates["windows"].items()
+                  if peak["peak_count"] > QUERIER_REPORT_BURST + QUERIER_REPORT_CAPACITY * window]
+    assert len(overloaded) == 0, \
+        f"Received {', '.join(overloaded)}. A querier handling {QUERIER_REPORT_CAPACITY} reports per second " \
+        f"with a queue of {QUERIER_REPORT_BURST} reports drops membership reports arriving in such a burst, " \
+        f"leading to the multicast registrations being dropped as well. Membership reports should be " \
+        f"spread randomly over the maximum response time."
+    return rates
+
+
+@metrics.timed("validation")
 def validate_igmpv2_packet_spacing(pcap_file):
     print("Check capture for V2 membership report")
     membership_reports = packet.get_v2_membership_reports(pcap_file)
@@ -156,12 +259,17 @@ def validate_igmpv2_packet_spacing(pcap_file):
     assert len(membership_query) == 1, f"Found {len(membership_reports)} IGMPv2 membership " \
                                        f"queries, expected exactly 1"
 
-    query_time = membership_query[0]["time"]
-    mrcode = membership_query[0]["mrcode"]
+    return check_igmpv2_packet_spacing(membership_query[0], membership_reports)
+
+
+def check_igmpv2_packet_spacing(membership_query, membership_reports):
+    query_time = membership_query.time_ns
+    mrcode = membership_query.mrcode
     max_response_time = mrcode / 10
     return validate_reports(query_time, max_response_time, membership_reports)
 
 
+@metrics.timed("validation")
 def validate_igmpv3_packet_spacing(pcap_file):
     print("Check capture for V3 membership report")
     membership_reports = validate_igmpv3_reports(pcap_file)
@@ -172,13 +280,252 @@ def validate_igmpv3_packet_spacing(pcap_file):
     assert len(membership_query) == 1, f"Found {len(membership_reports)} IGMPv3 membership " \
                                        f"queries, expected exactly 1"
 
-    print("Verify for each membership report that it arrived in time")
-    query_time = membership_query[0]["time"]
-    mrcode = membership_query[0]["mrcode"]
+    return check_igmpv3_packet_spacing(membership_query[0], membership_reports)
+
+
+def v3_max_response_time(mrcode):
+    """Get the maximum response time in seconds of an IGMPv3 max resp code"""
     if mrcode < 128:
         max_response_time = mrcode / 10
     else:
         exp = (mrcode & 0x70) > 4  # 0x70 = b'0111 0000'
         mant = mrcode & 0xF  # 0xF = b'0000 1111'
         max_response_time = (mant | 0x10) << (exp + 3)
+    return max_response_time
+
+
+def check_igmpv3_packet_spacing(membership_query, membership_reports):
+    print("Verify for each membership report that it arrived in time")
+    query_time = membership_query.time_ns
+    max_response_time = v3_max_response_time(membership_query.mrcode)
     return validate_reports(query_time, max_response_time, membership_reports)
+
+
+def iter_query_intervals(pcap_file, version="v2"):
+    """Split a capture into query intervals
+    A query interval starts at a membership query of the given IGMP version ("v2" or "v3") and lasts
+    until the next membership query of that version. The capture is walked once and every interval is
+    yielded as soon as the next query is found, so captures of any length can be processed.
+    Each interval is a dictionary with the membership query and the IGMPv2 and IGMPv3 membership reports
+    of the interval. Membership reports before the first query are yielded in an interval without query.
+    """
+    interval = {"query": None, "v2_reports": [], "v3_reports": []}
+    for pkt_version, type, pkt in packet.iter_igmp_events(pcap_file):
+        if type == packet.IGMPMessageType.MEMBERSHIP_QUERY.value:
+            if pkt_version != version:
+                continue
+            if interval["query"] is not None or interval["v2_reports"] or interval["v3_reports"]:
+                yield interval
+            interval = {"query": pkt, "v2_reports": [], "v3_reports": []}
+        elif type == packet.IGMPMessageType.V2_MEMBERSHIP_REPORT.value:
+            interval["v2_reports"].append(pkt)
+        elif type == packet.IGMPMessageType.V3_MEMBERSHIP_REPORT.value:
+            interval["v3_reports"].append(pkt)
+    if interval["query"] is not None or interval["v2_reports"] or interval["v3_reports"]:
+        yield interval
+
+
+@metrics.timed("validation")
+def validate_query_intervals(pcap_file, version="v2"):
+    """Validate every query interval of a capture
+    The capture is split into query intervals with iter_query_intervals and the membership reports of
+    every interval are grouped per device, every device is validated with the same checks as a capture
+    containing a single query of a single device. An interval fails when any of its devices failed.
+    The results are kept in the analysis cache, see lib.cache, so an unchanged capture is only
+    validated again when the configuration changed.
+    Returns a list with the result of every interval and a dictionary with the aggregated results.
+    """
+    if not cache.active():
+        return _validate_query_intervals(pcap_file, version)
+    key = cache.cache_key("query_intervals", pcap_file, version, cache.validation_settings())
+    found, result = cache.load(key)
+    if found:
+        print(f"Validated {result[1]['intervals']} query intervals (from the analysis cache): {result[1]}")
+        return result
+    result = _validate_query_intervals(pcap_file, version)
+    cache.store(key, result)
+    return result
+
+
+def _validate_query_intervals(pcap_file, version):
+    results = []
+    devices = set()
+    unanswered_reports = 0
+    for interval in iter_query_intervals(pcap_file, version):
+        query = interval["query"]
+        if query is None:
+            unanswered_reports += len(interval["v2_reports"]) + len(interval["v3_reports"])
+            continue
+        print(f"Validate query interval starting at {query.time}")
+        v3_reports = interval["v3_reports"] if version == "v3" else []
+        device_results = check_devices(interval["v2_reports"], v3_reports, version, packet.int_to_ip(query.gaddr),
+                                       query)
+        devices.update(device_results)
+        response_times = [result["response_time"] for result in device_results.values()
+                          if result["response_time"] is not None]
+        errors = [f"{device}: {result['error']}" for device, result in device_results.items()
+                  if result["error"] is not None]
+        if not device_results:
+            errors.append(f"Found no IGMP{version} membership reports, expected at least 1")
+        results.append({
+            "query_time": query.time,
+            "reports": len(interval["v2_reports"]) + len(interval["v3_reports"]),
+            "devices": len(device_results),
+            "response_time": min(response_times, default=None),
+            "error": "\n".join(errors) if errors else None,
+            })
+
+    response_times = [float(result["response_time"]) for result in results if result["response_time"] is not None]
+    summary = {
+        "intervals": len(results),
+        "devices": len(devices),
+        "passed": sum(1 for result in results if result["error"] is None),
+        "failed": sum(1 for result in results if result["error"] is not None),
+        "reports": sum(result["reports"] for result in results),
+        "reports_before_first_query": unanswered_reports,
+        "min_response_time": min(response_times, default=None),
+        "median_response_time": median(response_times) if response_times else None,
+        "max_response_time": max(response_times, default=None),
+        }
+    print(f"Validated {summary['intervals']} query intervals: {summary}")
+    return results, summary
+
+
+def group_reports_by_device(*membership_reports):
+    """Group membership reports per device
+    Devices are identified by their source MAC address, or by their source IP address when the
+    capture doesn't contain a MAC address. Every argument is a list of membership reports.
+    Returns a dictionary with a tuple per device, containing a list of membership reports of that
+    device for every argument.
+    """
+    devices = {}
+    for index, reports in enumerate(membership_reports):
+        for report in reports:
+            device = report.mac or packet.int_to_ip(report.src)
+            if device not in devices:
+                devices[device] = tuple([] for _ in membership_reports)
+            devices[device][index].append(report)
+    return devices
+
+
+def check_devices(v2_membership_reports, v3_membership_reports, version="v2", gaddr="0.0.0.0",
+                  membership_query=None):
+    """Validate the membership reports of every device separately
+    The membership reports are grouped per device and each device is validated with the same checks as when
+    testing a single device. When the membership query is given, the response timing is validated as well.
+    Returns a dictionary with the result per device, containing the error of the device when it failed.
+    """
+    results = {}
+    devices = group_reports_by_device(v2_membership_reports, v3_membership_reports)
+    for device, (v2_reports, v3_reports) in devices.items():
+        print(f"Validate membership reports of device {device}")
+        result = {
+            "src": sorted({packet.int_to_ip(report.src) for report in v2_reports + v3_reports}),
+            "reports": len(v2_reports) + len(v3_reports),
+            "response_time": None,
+            "error": None,
+            }
+        try:
+            with metrics.device(device):
+                if version == "v2":
+                    check_igmpv2_reports(v2_reports, gaddr)
+                    if membership_query is not None:
+                        result["response_time"] = check_igmpv2_packet_spacing(membership_query, v2_reports)
+                else:
+                    reports = check_igmpv3_reports(v2_reports, v3_reports, gaddr)
+                    if membership_query is not None:
+                        result["response_time"] = check_igmpv3_packet_spacing(membership_query, reports)
+        except AssertionError as e:
+            result["error"] = str(e)
+        results[device] = result
+    return results
+
+
+@metrics.timed("validation")
+def validate_devices(pcap_file, version="v2", gaddr="0.0.0.0", spacing=False):
+    """Validate the membership reports of every device in a capture separately
+    This is used to test multiple devices with a single membership query. The membership reports are
+    grouped per device and each device is validated with the same checks as when testing a single device.
+    When spacing is True, the response timing is validated as well.
+    Asserts that every device passed and returns a dictionary with the result per device.
+    """
+    v2_membership_reports = packet.get_v2_membership_reports(pcap_file)
+    v3_membership_reports = packet.get_v3_membership_reports(pcap_file) if version == "v3" else []
+    if spacing:
+        if version == "v2":
+            membership_query = packet.get_v2_membership_queries(pcap_file)
+        else:
+            membership_query = packet.get_v3_membership_queries(pcap_file)
+        assert len(membership_query) == 1, f"Found {len(membership_query)} IGMP{version} membership " \
+                                           f"queries, expected exactly 1"
+
+    results = check_devices(v2_membership_reports, v3_membership_reports, version, gaddr,
+                            membership_query[0] if spacing else None)
+
+    print(f"Received membership reports from {len(results)} devices")
+    assert len(results) > 0, "Found no IGMP membership reports, expected at least 1"
+
+    missing = [device for device in MULTI_DUT_DEVICES
+               if device.lower() not in results and not any(device in result["src"] for result in results.values())]
+    assert len(missing) == 0, f"Received no membership reports from {missing}"
+
+    failed = {device: result["error"] for device, result in results.items() if result["error"] is not None}
+    details = "\n".join(f"{device}: {error}" for device, error in failed.items())
+    assert len(failed) == 0, f"{len(failed)} of the {len(results)} devices failed:\n{details}"
+
+    return results
+
+
+@metrics.timed("validation")
+def validate_response_time_distribution(pcap_file, version="v2", max_response_time=1, gaddr=MGROUP_1):
+    """Validate that the response times of a device are uniformly distributed over the maximum response time
+    The capture contains a series of group specific membership queries for gaddr. Every query is paired
+    with the first membership report for the group after it, per device, and the response times of all
+    queries are tested against the uniform distribution on [0, max_response_time] with a Kolmogorov-Smirnov
+    test. Asserts that every device answered every query and that the uniform distribution isn't rejected
+    at RANDOMNESS_SIGNIFICANCE. Returns a dictionary with the result per device: the number of answered and
+    unanswered queries, the response times and the KS statistic and p-value.
+    """
+    group = packet.ip_to_int(gaddr)
+    if version == "v2":
+        queries = packet.get_v2_membership_queries(pcap_file)
+    else:
+        queries = packet.get_v3_membership_queries(pcap_file)
+    query_times = np.array([query.time_ns for query in queries if query.gaddr == group], dtype=np.int64)
+    print(f"Found {len(query_times)} IGMP{version} membership queries for group {gaddr}")
+    assert len(query_times) > 0, f"Found no IGMP{version} membership queries for group {gaddr}"
+
+    v2_membership_reports = packet.get_v2_membership_reports(pcap_file)
+    v3_membership_reports = packet.get_v3_membership_reports(pcap_file) if version == "v3" else []
+    results = {}
+    for device, reports in group_reports_by_device(v2_membership_reports, v3_membership_reports).items():
+        times, sources, group_times, groups = timing.report_arrays(chain(*reports))
+        latencies = timing.match_responses(query_times, group_times[groups == group],
+                                           max_response_time + RESPONSE_TIME_TOLERANCE)
+        response_times = latencies[~np.isnan(latencies)]
+        statistic, p_value = timing.uniformity_test(response_times, max_response_time)
+        with metrics.device(device):
+            metrics.record("response_time_p_value", p_value)
+        results[device] = {
+            "answered": len(response_times),
+            "unanswered": len(latencies) - len(response_times),
+            "response_times": response_times,
+            "statistic": statistic,
+            "p_value": p_value,
+            }
+        print(f"Device {device} answered {len(response_times)} of {len(latencies)} queries, "
+              f"Kolmogorov-Smirnov statistic {statistic:.3f}, p-value {p_value:.4f}")
+    assert len(results) > 0, "Found no IGMP membership reports, expected at least 1"
+
+    unanswered = {device: result["unanswered"] for device, result in results.items() if result["unanswered"]}
+    assert len(unanswered) == 0, \
+        f"Not all {len(query_times)} membership queries for group {gaddr} were answered within the maximum " \
+        f"response time, unanswered queries per device: {unanswered}"
+    not_uniform = {device: result["p_value"] for device, result in results.items()
+                   if not result["p_value"] >= RANDOMNESS_SIGNIFICANCE}
+    assert len(not_uniform) == 0, \
+        f"The response times of {', '.join(not_uniform)} aren't uniformly distributed over the maximum response " \
+        f"time of {max_response_time} seconds (p-values {not_uniform}, significance level " \
+        f"{RANDOMNESS_SIGNIFICANCE}). Devices have to delay their membership reports by a random time between " \
+        f"0 and the maximum response time, so that not all devices respond at the same time."
+    return results
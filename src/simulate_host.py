@@ -0,0 +1,66 @@
+"""Simulated DUT
+Runs a simulated IGMP host, so the test suites can be run without a real device.
+With --veth, a veth pair is created: the simulated host runs on one end and the tests run on the other end.
+
+Usage (Linux only, requires root privileges):
+    python src/simulate_host.py --veth --groups 100 --version v3
+    python src/simulate_host.py --veth --groups 10000 --fault burst --fault wrong_destination
+
+Afterwards set IFACE to "igmpsim0" in src/configuration.py and run the test suites in another terminal.
+The simulated host runs until it is interrupted with Ctrl+C.
+"""
+import argparse
+import subprocess
+import sys
+from time import sleep
+
+from lib.simhost import SimulatedHost, FAULTS, SIMHOST_MAC, SIMHOST_IP
+
+VETH_TESTER = "igmpsim0"
+VETH_HOST = "igmpsim1"
+# The tests check that the interface is up by looking for an IPv4 address
+TESTER_IP = "2.0.0.1/8"
+
+
+def create_veth_pair():
+    subprocess.run(["ip", "link", "add", VETH_TESTER, "type", "veth", "peer", "name", VETH_HOST], check=True)
+    subprocess.run(["ip", "addr", "add", TESTER_IP, "dev", VETH_TESTER], check=True)
+    for interface in (VETH_TESTER, VETH_HOST):
+        subprocess.run(["ip", "link", "set", interface, "up"], check=True)
+
+
+def delete_veth_pair():
+    subprocess.run(["ip", "link", "del", VETH_TESTER], check=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a simulated IGMP host")
+    parser.add_argument("--interface", default=VETH_HOST, help="interface of the simulated host")
+    parser.add_argument("--veth", action="store_true", help=f"create a veth pair {VETH_TESTER}/{VETH_HOST}")
+    parser.add_argument("--groups", type=int, default=1, help="number of groups, starting at 239.255.0.1")
+    parser.add_argument("--version", choices=["v2", "v3"], default="v3", help="IGMP version of the host")
+    parser.add_argument("--fault", action="append", default=[], choices=FAULTS, help="fault to enable")
+    parser.add_argument("--mac", default=SIMHOST_MAC, help="MAC address of the host")
+    parser.add_argument("--ip", default=SIMHOST_IP, help="IP address of the host")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random response delays")
+    args = parser.parse_args(argv)
+
+    if args.veth:
+        create_veth_pair()
+    host = SimulatedHost(args.interface, groups=args.groups, version=args.version, mac=args.mac, ip=args.ip,
+                         faults=args.fault, seed=args.seed)
+    try:
+        host.start()
+        while host.is_alive():
+            sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        host.stop()
+        if args.veth:
+            delete_veth_pair()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
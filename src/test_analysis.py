@@ -0,0 +1,37 @@
+"""Capture analysis test suite
+The tests in this test suite validate the analysis of captures against synthetic captures generated
+with lib.corpus, so they run without a DUT or network interface.
+"""
+import gzip
+import pytest
+import lib.corpus as corpus
+import lib.pcapfile as pcapfile
+import lib.utils as utils
+
+
+@pytest.mark.parametrize("version", ["v2", "v3"])
+def test_query_intervals_multiple_devices(tmp_path, version):
+    """Verify that every query interval of a capture of multiple devices is validated per device"""
+    capture = str(tmp_path / f"5d_16g_3i_{version}.pcap")
+    corpus.generate_capture(capture, devices=5, groups=16, intervals=3, version=version, sacn_ratio=1)
+
+    results, summary = utils.validate_query_intervals(capture, version)
+    assert summary["intervals"] == 3
+    assert summary["devices"] == 5
+    assert summary["failed"] == 0, [result["error"] for result in results]
+    assert all(result["devices"] == 5 for result in results)
+
+
+@pytest.mark.parametrize("pcapng", [False, True])
+def test_gzip_capture_chunks(tmp_path, monkeypatch, pcapng):
+    """Verify that a gzip compressed capture, decompressed in chunks which split the records, reads the same frames"""
+    capture = str(tmp_path / ("capture.pcapng" if pcapng else "capture.pcap"))
+    corpus.generate_capture(capture, devices=2, groups=8, intervals=2, sacn_ratio=1, pcapng=pcapng)
+    with open(capture, "rb") as f, gzip.open(capture + ".gz", "wb") as gz:
+        gz.write(f.read())
+    monkeypatch.setattr(pcapfile, "GZIP_CHUNK_SIZE", 1000)
+
+    expected = [(bytes(frame), timestamp) for frame, _, timestamp, _ in pcapfile.iter_frames(capture)]
+    frames = [(bytes(frame), timestamp) for frame, _, timestamp, _ in pcapfile.iter_frames(capture + ".gz")]
+    assert len(expected) > 0
+    assert frames == expected
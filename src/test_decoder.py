@@ -0,0 +1,117 @@
+"""IGMP decoder test suite
+The tests in this test suite validate that the raw bytes IGMP decoder of lib/packet.py returns the same
+IGMP messages as the scapy dissection it replaces, for a generated corpus of IGMP and other frames.
+They don't need a DUT or network interface.
+"""
+import random
+import struct
+import pytest
+from scapy.layers.l2 import ARP, Dot1Q, Ether
+from scapy.layers.inet import IP, UDP, IPOption_Router_Alert
+from scapy.layers.inet6 import IPv6
+from scapy.contrib.igmp import IGMP
+from scapy.contrib.igmpv3 import IGMPv3, IGMPv3gr, IGMPv3mq, IGMPv3mr
+import lib.corpus as corpus
+import lib.packet as packet
+
+CORPUS_SIZE = 2000
+TIME_NS = corpus.START_TIME + 123456789
+
+
+def _address(rng, prefix):
+    return f"{prefix}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def _sources(rng):
+    return [_address(rng, "10.0") for _ in range(rng.choice((0, 0, 1, 3)))]
+
+
+def _igmp(rng):
+    kind = rng.choice(("v1_report", "v2_query", "v2_report", "v2_leave", "v3_query", "v3_report"))
+    group = _address(rng, "239.255")
+    if kind == "v1_report":
+        return group, IGMP(type=0x12, gaddr=group)
+    if kind == "v2_query":
+        return "224.0.0.1", IGMP(type=0x11, mrcode=rng.randint(0, 255), gaddr=rng.choice(("0.0.0.0", group)))
+    if kind == "v2_report":
+        return group, IGMP(type=0x16, gaddr=group)
+    if kind == "v2_leave":
+        return "224.0.0.2", IGMP(type=0x17, gaddr=group)
+    if kind == "v3_query":
+        sources = _sources(rng)
+        return "224.0.0.1", IGMPv3(type=0x11, mrcode=rng.randint(0, 255)) / IGMPv3mq(
+            gaddr=group if sources or rng.random() < 0.5 else "0.0.0.0", resv=rng.choice((0, 0, 1)),
+            qrv=rng.randint(0, 7), qqic=rng.randint(0, 255), srcaddrs=sources)
+    records = [IGMPv3gr(rtype=rng.randint(1, 6), maddr=_address(rng, "239.255"), srcaddrs=_sources(rng))
+               for _ in range(rng.randint(0, 4))]
+    return "224.0.0.22", IGMPv3(type=0x22) / IGMPv3mr(records=records)
+
+
+def _frame(rng):
+    """Build a random frame: mostly IGMP messages, optionally VLAN tagged, with or without the router alert
+    option, with a TTL other than 1 or as a fragment, and some frames which are not IGMP at all
+    """
+    ether = Ether(src=f"02:00:00:00:00:{rng.randint(1, 255):02x}")
+    if rng.random() < 0.3:
+        ether = ether / Dot1Q(vlan=rng.randint(1, 4094))
+    kind = rng.random()
+    if kind < 0.05:
+        return bytes(Ether() / ARP())
+    if kind < 0.1:
+        return bytes(ether / IPv6() / UDP())
+    if kind < 0.15:
+        return corpus.sacn_frame("02:00:00:00:00:01", "2.0.0.1", rng.randint(1, 10), rng.randint(0, 255))
+    dst, igmp = _igmp(rng)
+    ip = IP(src=_address(rng, "2.0"), dst=dst, ttl=1 if rng.random() < 0.8 else rng.randint(2, 64))
+    if rng.random() < 0.7:
+        ip.options = [IPOption_Router_Alert()]
+    if rng.random() < 0.05:
+        ip.flags = "MF"
+    frame = bytes(ether / ip / igmp)
+    if kind > 0.97:
+        # Truncated frames
+        return frame[:rng.randint(1, len(frame) - 1)]
+    # Ethernet padding up to the minimum frame size
+    return frame + bytes(max(0, 60 - len(frame)))
+
+
+def _dissect(frame):
+    # Frames scapy fails to dissect, like truncated frames, are not IGMP messages
+    try:
+        return packet.dissect_igmp_packet(Ether(frame), TIME_NS)
+    except Exception:
+        return None
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_decode_igmp_frame_matches_scapy(seed):
+    """Verify that decode_igmp_frame decodes every frame of a generated corpus like the scapy dissection"""
+    rng = random.Random(seed)
+    decoded = 0
+    for _ in range(CORPUS_SIZE):
+        frame = _frame(rng)
+        expected = _dissect(frame)
+        assert packet.decode_igmp_frame(frame, TIME_NS) == expected, f"Decoded {frame.hex()} differently"
+        decoded += expected is not None
+    # The corpus has to contain IGMP messages, not only frames which are rejected
+    assert decoded > CORPUS_SIZE // 2
+
+
+def test_decode_igmp_frame_builders():
+    """Verify the frames built by this tool and the corpus generator, including VLAN tagged copies"""
+    frames = [
+        packet.build_igmp_v2_membership_query(),
+        packet.build_igmp_v2_membership_query(mrcode=10, gaddr="239.255.0.1"),
+        packet.build_igmp_v3_membership_query(),
+        packet.build_igmp_v3_membership_query(mrcode=200, gaddr="239.255.0.1"),
+        packet.build_igmp_v2_membership_report("02:00:00:00:00:01", "2.0.0.1", "239.255.0.1"),
+        packet.build_igmp_v3_membership_report("02:00:00:00:00:01", "2.0.0.1",
+                                               [(packet.GroupRecordType.MODE_IS_EXCLUDE.value, "239.255.0.1"),
+                                                (packet.GroupRecordType.CHANGE_TO_INCLUDE_MODE.value, "239.255.0.2")]),
+    ]
+    for frame in frames:
+        tagged = frame[:12] + struct.pack("!HH", 0x8100, 10) + frame[12:]
+        for variant in (frame, tagged):
+            expected = _dissect(variant)
+            assert expected is not None
+            assert packet.decode_igmp_frame(variant, TIME_NS) == expected
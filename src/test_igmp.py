@@ -2,11 +2,13 @@
 The tests in this test suite are automatic tests focussed on the IGMPv2 behavior
 of devices that want to receive multicast data.
 """
-from time import sleep
+import pytest
+from time import perf_counter, sleep
 import lib.packet as packet
-from lib.capture import start_capture, stop_capture
-from lib.utils import check_interface_up, validate_igmpv2_reports, validate_igmpv2_packet_spacing
-from configuration import IFACE, MGROUP_1
+from lib.capture import start_capture, stop_capture, waitfor_capture, GroupsReported
+from lib.utils import check_interface_up, expected_groups, validate_igmpv2_reports, validate_igmpv2_packet_spacing, \
+    validate_devices, validate_response_time_distribution
+from configuration import IFACE, MGROUP_1, MULTI_DUT, RANDOMNESS_TRIALS, RANDOMNESS_MAX_RESPONSE_TIME  # noqa: F401
 
 
 def validate_membership_reports(
@@ -22,7 +24,7 @@ def validate_membership_reports(
     check_interface_up()
 
     print(f"Start capture on interface {IFACE} to file {pcap_file}")
-    start_capture(IFACE, pcap_file)
+    start_capture(IFACE, pcap_file, stop_cb=GroupsReported(expected_groups(gaddr)))
 
     max_response_time = 1  # seconds
     mrcode = max_response_time * 10
@@ -33,13 +35,14 @@ def validate_membership_reports(
             mrcode=mrcode,
             gaddr=gaddr)
 
-    print("Wait membership response timeout + a little margin")
-    sleep(max_response_time + 1)
-
-    print("Stop capture")
-    stop_capture(pcap_file)
+    print("Wait for the expected membership reports, at most the membership response timeout + a little margin")
+    if waitfor_capture(pcap_file, max_response_time + 1):
+        print("Stopped capture after the membership response timeout")
 
-    validate_igmpv2_reports(pcap_file, gaddr)
+    if MULTI_DUT:
+        validate_devices(pcap_file, "v2", gaddr)
+    else:
+        validate_igmpv2_reports(pcap_file, gaddr)
 
 
 def test_v2_general_query_response():
@@ -152,27 +155,62 @@ def test_maximum_response_time():
     check_interface_up()
 
     max_response_times = [1, 3, 5, 10, 20]
-    response_times = []
+    response_times = {}
     for response_time in max_response_times:
         pcap_file = f"output/maximum_response_time_{response_time}_sec.pcap"
         print(f"Start capture on interface {IFACE} to file {pcap_file}")
-        start_capture(IFACE, pcap_file)
+        start_capture(IFACE, pcap_file, stop_cb=GroupsReported(expected_groups()))
 
         mrcode = response_time * 10
         print("Send IGMPv2 membership query")
         packet.send_igmp_v2_membership_query(mrcode=mrcode)
 
-        print("Wait for the maximum response time")
-        sleep(response_time + 2)
+        print("Wait for the expected membership reports, at most the maximum response time")
+        if waitfor_capture(pcap_file, response_time + 2):
+            print("Stopped capture after the maximum response time")
+
+        if MULTI_DUT:
+            for device, result in validate_devices(pcap_file, "v2", spacing=True).items():
+                response_times.setdefault(device, []).append(result["response_time"])
+        else:
+            response_times.setdefault("the DUT", []).append(validate_igmpv2_packet_spacing(pcap_file))
+
+    for device, device_response_times in response_times.items():
+        var = variance(device_response_times)
+        print(device, device_response_times)
+        assert var > 0.2, f"It looks like the membership response times of {device} aren't randomly distributed " \
+                          f"Variance is {var}"
+
+
+@pytest.mark.skipif("not RANDOMNESS_TRIALS")
+def test_response_time_distribution():
+    """Verify that the response times of the DUT are uniformly distributed over the maximum response time
+    A handful of response times can't tell a random timer from a fixed or badly seeded one. This test
+    transmits RANDOMNESS_TRIALS group specific queries for MGROUP_1 within a single capture, each after the
+    responses to the previous query are due, pairs every query with the response of the DUT and tests the
+    response times against the uniform distribution between 0 and the maximum response time.
+    This test assumes that the DUT is configured to receive multicast from MGROUP_1.
+    """
+    print(f"Detect link up on interface {IFACE}")
+    check_interface_up()
 
-        print("Stop capture")
-        stop_capture(pcap_file)
+    pcap_file = "output/v2_response_time_distribution.pcap"
+    print(f"Start capture on interface {IFACE} to file {pcap_file}")
+    start_capture(IFACE, pcap_file)
 
-        response_times.append(validate_igmpv2_packet_spacing(pcap_file))
+    mrcode = int(RANDOMNESS_MAX_RESPONSE_TIME * 10)
+    query_interval = RANDOMNESS_MAX_RESPONSE_TIME + 0.5
+    print(f"Send {RANDOMNESS_TRIALS} IGMPv2 membership queries for {MGROUP_1}, every {query_interval} seconds")
+    start = perf_counter()
+    for trial in range(RANDOMNESS_TRIALS):
+        # Scheduled relative to the start, so the interval doesn't drift with the time needed to send
+        sleep(max(0, start + trial * query_interval - perf_counter()))
+        packet.send_igmp_v2_membership_query(mrcode=mrcode, gaddr=MGROUP_1)
+
+    print("Wait for the responses to the last query, the maximum response time + a little margin")
+    sleep(query_interval)
+    stop_capture(pcap_file)
 
-    var = variance(response_times)
-    print(response_times)
-    assert var > 0.2, f"It looks like the membership response times aren't randomly distributed " \
-                      f"Variance is {var}"
+    validate_response_time_distribution(pcap_file, "v2", mrcode / 10, MGROUP_1)
 
     assert True
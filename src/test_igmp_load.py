@@ -0,0 +1,94 @@
+"""IGMP querier load test suite
+The tests in this test suite validate how the DUT behaves when the querier is noisy: many group specific
+queries per second, from multiple querier IPs, mixing IGMPv2 and IGMPv3.
+While the load is transmitted, a group specific probe query for MGROUP_1 is transmitted every second.
+The DUT is expected to answer every probe query in time, also at high query rates.
+The load doesn't contain general queries or queries for MGROUP_1, the DUT would answer those with a
+membership report for MGROUP_1 as well, which can't be told apart from the answer to a probe query.
+The tests in this suite are skipped unless QUERY_LOAD_RATES is configured.
+"""
+import pytest
+from itertools import chain
+from time import sleep
+import numpy as np
+import lib.packet as packet
+import lib.timing as timing
+from lib.capture import start_capture, stop_capture, capture_statistics
+from lib.loadgen import QueryLoadGenerator, DEFAULT_LOAD_GROUPS
+from lib.utils import check_interface_up, RESPONSE_TIME_TOLERANCE
+from configuration import IFACE, MGROUP_1, QUERY_LOAD_RATES, QUERY_LOAD_DURATION, QUERY_LOAD_MAX_LOSS  # noqa: F401
+
+PROBE_INTERVAL = 1  # seconds
+PROBE_MAX_RESPONSE_TIME = 0.5  # seconds
+REPORT_TYPES = (packet.IGMPMessageType.V2_MEMBERSHIP_REPORT.value, packet.IGMPMessageType.V3_MEMBERSHIP_REPORT.value)
+
+
+def group_report_times(pcap_file, events, gaddr):
+    """Get the times of the membership reports for a group, in nanoseconds
+    The IGMP events decoded while capturing are used, so the capture under load doesn't have to be read again.
+    The capture file is only read when events were dropped before they were read.
+    """
+    if not (capture_statistics.get(pcap_file) or {}).get("events_dropped"):
+        reports = np.isin(events["type"], REPORT_TYPES) & (events["gaddr"] == packet.ip_to_int(gaddr))
+        return events["time_ns"][reports]
+    print("Not all IGMP events were read while capturing, reading the membership reports from the capture file")
+    # The reports are streamed, a capture under load can contain a lot of them
+    membership_reports = chain(packet.iter_v2_membership_reports(pcap_file),
+                               packet.iter_v3_membership_reports(pcap_file))
+    _, _, group_times, groups = timing.report_arrays(membership_reports)
+    return group_times[groups == packet.ip_to_int(gaddr)]
+
+
+def measure_query_load(rate):
+    """Transmit queries at a rate and measure the responses of the DUT to the probe queries
+    Returns the achieved query rate, the loss rate and the latencies of the answered probe queries.
+    """
+    pcap_file = f"output/query_load_{rate}_qps.pcap"
+    print(f"Start capture on interface {IFACE} to file {pcap_file}")
+    start_capture(IFACE, pcap_file, events=True)
+
+    print(f"Send {rate} membership queries per second for {QUERY_LOAD_DURATION} seconds")
+    probe_frame = packet.build_igmp_v2_membership_query(mrcode=int(PROBE_MAX_RESPONSE_TIME * 10), gaddr=MGROUP_1)
+    load_groups = [group for group in DEFAULT_LOAD_GROUPS if group != MGROUP_1]
+    generator = QueryLoadGenerator(IFACE, rate, general_ratio=0, groups=load_groups)
+    result = generator.run(QUERY_LOAD_DURATION, probe_frame=probe_frame, probe_interval=PROBE_INTERVAL)
+    generator.close()
+
+    print("Wait for the responses to the last probe query")
+    sleep(PROBE_MAX_RESPONSE_TIME + 1)
+
+    print("Stop capture")
+    events = stop_capture(pcap_file)
+
+    report_times = group_report_times(pcap_file, events, MGROUP_1)
+    latencies = timing.match_responses(result["probe_times"], report_times,
+                                       PROBE_MAX_RESPONSE_TIME + RESPONSE_TIME_TOLERANCE)
+    answered = latencies[~np.isnan(latencies)]
+    loss = 1 - len(answered) / len(latencies) if len(latencies) else 1.0
+    return result["tx_rate"], loss, answered
+
+
+@pytest.mark.skipif("not QUERY_LOAD_RATES")
+def test_query_load(record_property):
+    """Verify that the DUT keeps responding to membership queries when the querier is noisy
+    In big networks, or when multiple queriers are active, a device can receive a lot of membership queries.
+    The DUT should keep responding in time to the queries for the groups it is a member of, without being
+    overwhelmed by the queries it doesn't have to respond to.
+    """
+    print(f"Detect link up on interface {IFACE}")
+    check_interface_up()
+
+    losses = {}
+    for rate in sorted(QUERY_LOAD_RATES):
+        tx_rate, loss, latencies = measure_query_load(rate)
+        losses[rate] = loss
+        latency = np.percentile(latencies, [50, 99]).tolist() if len(latencies) else None
+        print(f"{rate} queries/s (transmitted {tx_rate:.0f}/s): {loss:.1%} of the probe queries unanswered, "
+              f"latency percentiles (50, 99): {latency}")
+        record_property(f"query load {rate} tx_rate", tx_rate)
+        record_property(f"query load {rate} loss", loss)
+        record_property(f"query load {rate} latency", latency)
+
+    failed = {rate: loss for rate, loss in losses.items() if loss > QUERY_LOAD_MAX_LOSS}
+    assert len(failed) == 0, f"The DUT left too many probe queries unanswered at a query rate of " \
+                             f"{', '.join(f'{rate}/s ({loss:.1%})' for rate, loss in failed.items())}"
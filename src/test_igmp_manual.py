@@ -62,14 +62,14 @@ def test_report_on_link(user_input):
 
     found_mgroup_1_join = False
     for report in v2_membership_reports:
-        if report["gaddr"] == MGROUP_1:
+        if packet.int_to_ip(report.gaddr) == MGROUP_1:
             found_mgroup_1_join = True
-            assert report["gaddr"] == report["dst"], "Membership reports should use the same multicast destination " \
-                                                     "address as the address present in the IGMP payload"
+            assert report.gaddr == report.dst, "Membership reports should use the same multicast destination " \
+                                               "address as the address present in the IGMP payload"
     for report in v3_membership_reports:
-        assert report["dst"] == "224.0.0.22", "IGMPv3 packets should be addressed to 224.0.0.22"
-        for record in report["records"]:
-            if record.maddr == MGROUP_1:
+        assert packet.int_to_ip(report.dst) == "224.0.0.22", "IGMPv3 packets should be addressed to 224.0.0.22"
+        for record in report.records:
+            if packet.int_to_ip(record.maddr) == MGROUP_1:
                 found_mgroup_1_join = True
 
     assert found_mgroup_1_join, f"Expected to get an IGMP membership report for multicast group {MGROUP_1}"
@@ -114,21 +114,23 @@ def test_leave_on_config_change(user_input):
     print(f"Validate that the DUT transmitted a leave for {MGROUP_1}")
     found_mgroup_1_leave = False
     for leave in leaves:
-        assert leave["dst"] == "224.0.0.2", f"IGMP leaves are expected to be transmitted to " \
-                                            f"224.0.0.2, but a leave with destination {leave['dst']} is discovered"
-        assert leave["gaddr"] != "0.0.0.0", "IGMP leave discovered with IGMP multicast address set  " \
-                                            "0.0.0.0, which is an unexpected value"
-        if leave["gaddr"] == MGROUP_1:
+        dst = packet.int_to_ip(leave.dst)
+        gaddr = packet.int_to_ip(leave.gaddr)
+        assert dst == "224.0.0.2", f"IGMP leaves are expected to be transmitted to " \
+                                   f"224.0.0.2, but a leave with destination {dst} is discovered"
+        assert gaddr != "0.0.0.0", "IGMP leave discovered with IGMP multicast address set  " \
+                                   "0.0.0.0, which is an unexpected value"
+        if gaddr == MGROUP_1:
             found_mgroup_1_leave = True
     assert found_mgroup_1_leave, f"Expected to get an IGMP leave for multicast group {MGROUP_1}"
 
     print(f"Validate that the DUT transmitted a membership report for {MGROUP_2}")
     found_mgroup_2_join = False
     for report in membership_reports:
-        if report["gaddr"] == MGROUP_2:
+        if packet.int_to_ip(report.gaddr) == MGROUP_2:
             found_mgroup_2_join = True
-            assert report["gaddr"] == report["dst"], "Membership reports should use the same multicast destination " \
-                                                     "address as the address present in the IGMP payload"
+            assert report.gaddr == report.dst, "Membership reports should use the same multicast destination " \
+                                               "address as the address present in the IGMP payload"
     assert found_mgroup_2_join, f"Expected to get an IGMP membership report for multicast group {MGROUP_2}"
 
     assert True
@@ -171,14 +173,14 @@ def test_report_on_boot(user_input):
 
     found_mgroup_1_join = False
     for report in v2_membership_reports:
-        if report["gaddr"] == MGROUP_1:
+        if packet.int_to_ip(report.gaddr) == MGROUP_1:
             found_mgroup_1_join = True
-            assert report["gaddr"] == report["dst"], "Membership reports should use the same multicast destination " \
-                                                     "address as the address present in the IGMP payload"
+            assert report.gaddr == report.dst, "Membership reports should use the same multicast destination " \
+                                               "address as the address present in the IGMP payload"
     for report in v3_membership_reports:
-        assert report["dst"] == "224.0.0.22", "IGMPv3 packets should be addressed to 224.0.0.22"
-        for record in report["records"]:
-            if record.maddr == MGROUP_1:
+        assert packet.int_to_ip(report.dst) == "224.0.0.22", "IGMPv3 packets should be addressed to 224.0.0.22"
+        for record in report.records:
+            if packet.int_to_ip(record.maddr) == MGROUP_1:
                 found_mgroup_1_join = True
 
     assert found_mgroup_1_join, f"Expected to get an IGMP membership report for multicast group {MGROUP_1}"
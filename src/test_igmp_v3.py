@@ -5,11 +5,13 @@ IGMPv3 is defined in RFC 3376 (https://datatracker.ietf.org/doc/html/rfc3376)
 The tests in this suite can be skipped by configuring the IGMPv3_SUPPORT parameter
 """
 import pytest
-from time import sleep
+from time import perf_counter, sleep
 import lib.packet as packet
-from lib.capture import start_capture, stop_capture
-from lib.utils import check_interface_up, validate_igmpv3_reports, validate_igmpv3_packet_spacing
-from configuration import IFACE, MGROUP_1, IGMPV3_SUPPORT  # noqa: F401
+from lib.capture import start_capture, stop_capture, waitfor_capture, GroupsReported
+from lib.utils import check_interface_up, expected_groups, validate_igmpv3_reports, validate_igmpv3_packet_spacing, \
+    validate_devices, validate_response_time_distribution, v3_max_response_time
+from configuration import IFACE, MGROUP_1, IGMPV3_SUPPORT, MULTI_DUT  # noqa: F401
+from configuration import RANDOMNESS_TRIALS, RANDOMNESS_MAX_RESPONSE_TIME  # noqa: F401
 
 
 def validate_membership_reports(
@@ -25,7 +27,7 @@ def validate_membership_reports(
     check_interface_up()
 
     print(f"Start capture on interface {IFACE} to file {pcap_file}")
-    start_capture(IFACE, pcap_file)
+    start_capture(IFACE, pcap_file, stop_cb=GroupsReported(expected_groups(gaddr)))
 
     max_response_time = 1  # seconds
     mrcode = max_response_time * 10
@@ -36,14 +38,15 @@ def validate_membership_reports(
             mrcode=mrcode,
             gaddr=gaddr)
 
-    print("Wait membership response timeout + a little margin")
-    sleep(max_response_time + 1)
-
-    print("Stop capture")
-    stop_capture(pcap_file)
+    print("Wait for the expected membership reports, at most the membership response timeout + a little margin")
+    if waitfor_capture(pcap_file, max_response_time + 1):
+        print("Stopped capture after the membership response timeout")
 
     print("Check capture for membership report")
-    validate_igmpv3_reports(pcap_file, gaddr)
+    if MULTI_DUT:
+        validate_devices(pcap_file, "v3", gaddr)
+    else:
+        validate_igmpv3_reports(pcap_file, gaddr)
 
 
 @pytest.mark.skipif("not IGMPV3_SUPPORT")
@@ -104,27 +107,62 @@ def test_maximum_response_time():
     check_interface_up()
 
     max_response_times = [1, 3, 5, 10, 20, 300]
-    response_times = []
+    response_times = {}
     for max_response_time in max_response_times:
         pcap_file = f"output/v3_maximum_response_time_{max_response_time}_sec.pcap"
         print(f"Start capture on interface {IFACE} to file {pcap_file}")
-        start_capture(IFACE, pcap_file)
+        start_capture(IFACE, pcap_file, stop_cb=GroupsReported(expected_groups()))
 
         mrcode = max_response_time * 10
         print("Send IGMPv3 membership query")
         packet.send_igmp_v3_membership_query(mrcode=mrcode)
 
-        print("Wait for the maximum response time")
-        sleep(max_response_time + 2)
-
-        print("Stop capture")
-        stop_capture(pcap_file)
+        print("Wait for the expected membership reports, at most the maximum response time")
+        if waitfor_capture(pcap_file, max_response_time + 2):
+            print("Stopped capture after the maximum response time")
 
-        response_times.append(validate_igmpv3_packet_spacing(pcap_file))
+        if MULTI_DUT:
+            for device, result in validate_devices(pcap_file, "v3", spacing=True).items():
+                response_times.setdefault(device, []).append(result["response_time"])
+        else:
+            response_times.setdefault("the DUT", []).append(validate_igmpv3_packet_spacing(pcap_file))
 
-    var = variance(response_times)
-    print(response_times)
-    assert var > 0.2, f"It looks like the membership response times aren't randomly distributed " \
-                      f"Variance is {var}"
+    for device, device_response_times in response_times.items():
+        var = variance(device_response_times)
+        print(device, device_response_times)
+        assert var > 0.2, f"It looks like the membership response times of {device} aren't randomly distributed " \
+                          f"Variance is {var}"
 
     assert True
+
+
+@pytest.mark.skipif("not IGMPV3_SUPPORT or not RANDOMNESS_TRIALS")
+def test_response_time_distribution():
+    """Verify that the response times of the DUT are uniformly distributed over the maximum response time
+    IGMPv3 variant of the IGMPv2 test: RANDOMNESS_TRIALS group specific queries for MGROUP_1 are transmitted
+    within a single capture and the response times are tested against the uniform distribution between 0
+    and the maximum response time.
+    This test assumes that the DUT is configured to receive multicast from MGROUP_1.
+    """
+    print(f"Detect link up on interface {IFACE}")
+    check_interface_up()
+
+    pcap_file = "output/v3_response_time_distribution.pcap"
+    print(f"Start capture on interface {IFACE} to file {pcap_file}")
+    start_capture(IFACE, pcap_file)
+
+    mrcode = int(RANDOMNESS_MAX_RESPONSE_TIME * 10)
+    max_response_time = v3_max_response_time(mrcode)
+    query_interval = max_response_time + 0.5
+    print(f"Send {RANDOMNESS_TRIALS} IGMPv3 membership queries for {MGROUP_1}, every {query_interval} seconds")
+    start = perf_counter()
+    for trial in range(RANDOMNESS_TRIALS):
+        # Scheduled relative to the start, so the interval doesn't drift with the time needed to send
+        sleep(max(0, start + trial * query_interval - perf_counter()))
+        packet.send_igmp_v3_membership_query(mrcode=mrcode, gaddr=MGROUP_1)
+
+    print("Wait for the responses to the last query, the maximum response time + a little margin")
+    sleep(query_interval)
+    stop_capture(pcap_file)
+
+    validate_response_time_distribution(pcap_file, "v3", max_response_time, MGROUP_1)
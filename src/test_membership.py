@@ -0,0 +1,106 @@
+"""Membership timeline test suite
+The tests in this test suite validate the interval index and the membership timeline of lib/membership.py
+against intervals and captures with a known answer, so they run without a DUT or network interface.
+"""
+import random
+from scapy.layers.l2 import Ether
+from scapy.layers.inet import IP
+from scapy.contrib.igmp import IGMP
+from scapy.contrib.igmpv3 import IGMPv3, IGMPv3gr, IGMPv3mr
+import lib.membership as membership
+import lib.packet as packet
+from lib.pcapfile import PcapWriter
+
+START_TIME = 1704067200 * 1000000000
+SECOND = 1000000000
+HOST_1 = "2.0.0.1"
+HOST_2 = "2.0.0.2"
+HOST_3 = "2.0.0.3"
+GROUP_1 = "239.255.0.1"
+GROUP_2 = "239.255.0.2"
+
+
+def _interval(start_ns, end_ns, host=1):
+    return membership.MembershipInterval(host, 1, start_ns, end_ns, membership.MODE_EXCLUDE, frozenset(), start_ns,
+                                         membership.END_CAPTURE)
+
+
+def test_interval_index_matches_brute_force():
+    """Verify the intervals containing a time against a scan of all intervals, including the interval bounds"""
+    rng = random.Random(0)
+    intervals = []
+    for host in range(500):
+        start_ns = rng.randint(0, 1000)
+        intervals.append(_interval(start_ns, start_ns + rng.choice((0, 1, rng.randint(1, 300))), host))
+    index = membership.IntervalIndex(intervals)
+    times = {interval.start_ns for interval in intervals} | {interval.end_ns for interval in intervals}
+    for time_ns in sorted(times | {-1, 1400}):
+        expected = {interval for interval in intervals if interval.start_ns <= time_ns < interval.end_ns}
+        found = index.at(time_ns)
+        assert len(found) == len(expected)
+        assert set(found) == expected
+
+
+def test_interval_index_empty():
+    """Verify that empty intervals and an empty index don't contain any time"""
+    assert membership.IntervalIndex([]).at(0) == []
+    assert membership.IntervalIndex([_interval(5, 5)]).at(5) == []
+    assert membership.IntervalIndex([_interval(5, 6)]).at(6) == []
+
+
+def _v3_report(host, records):
+    igmp = IGMPv3(type=0x22) / IGMPv3mr(records=[IGMPv3gr(rtype=rtype, maddr=group, srcaddrs=sources)
+                                                 for rtype, group, sources in records])
+    return bytes(Ether(src="02:00:00:00:00:01") / IP(src=host, dst="224.0.0.22", ttl=1) / igmp)
+
+
+def _write_capture(capture):
+    v2_leave = packet.IGMPMessageType.LEAVE_GROUP.value
+    report_1 = packet.build_igmp_v2_membership_report("02:00:00:00:00:01", HOST_1, GROUP_1)
+    frames = [
+        (0, report_1),
+        (5, _v3_report(HOST_3, [(packet.GroupRecordType.MODE_IS_INCLUDE.value, GROUP_2, ["10.0.0.1"])])),
+        (8, _v3_report(HOST_3, [(packet.GroupRecordType.ALLOW_NEW_SOURCES.value, GROUP_2, ["10.0.0.2"])])),
+        (10, report_1),
+        (15, packet.build_igmp_v2_membership_report("02:00:00:00:00:02", HOST_2, GROUP_1)),
+        (20, bytes(Ether() / IP(src=HOST_1, dst="224.0.0.2", ttl=1) / IGMP(type=v2_leave, gaddr=GROUP_1))),
+        (30, _v3_report(HOST_3, [(packet.GroupRecordType.BLOCK_OLD_SOURCES.value, GROUP_2,
+                                  ["10.0.0.1", "10.0.0.2"])])),
+        (40, report_1),
+        (400, packet.build_igmp_v2_membership_report("02:00:00:00:00:03", HOST_3, GROUP_2)),
+    ]
+    with PcapWriter(capture, nanosecond=True) as writer:
+        for offset, frame in frames:
+            writer.write(frame, START_TIME + offset * SECOND)
+
+
+def test_build_timeline(tmp_path):
+    """Verify the membership intervals replayed from a capture with joins, leaves, timeouts and filter changes"""
+    capture = str(tmp_path / "membership.pcap")
+    _write_capture(capture)
+    timeline = membership.build_timeline(capture)
+    assert timeline.groups() == [packet.ip_to_int(GROUP_1), packet.ip_to_int(GROUP_2)]
+    assert timeline.hosts(GROUP_1) == [packet.ip_to_int(HOST_1), packet.ip_to_int(HOST_2)]
+
+    intervals = [(interval.start_ns - START_TIME) // SECOND for interval in timeline.host_intervals(HOST_1, GROUP_1)]
+    assert intervals == [0, 40]
+    first, second = timeline.host_intervals(HOST_1, GROUP_1)
+    assert (first.end_ns, first.last_report_ns, first.end_reason) == \
+           (START_TIME + 20 * SECOND, START_TIME + 10 * SECOND, membership.END_LEAVE)
+    assert (second.end_ns, second.end_reason) == (START_TIME + 300 * SECOND, membership.END_TIMEOUT)
+
+    include, allowed = timeline.host_intervals(HOST_3, GROUP_2)[:2]
+    assert (include.mode, include.sources, include.end_reason) == \
+           (membership.MODE_INCLUDE, frozenset([packet.ip_to_int("10.0.0.1")]), membership.END_FILTER_CHANGE)
+    assert (allowed.start_ns, allowed.end_ns, allowed.end_reason) == \
+           (START_TIME + 8 * SECOND, START_TIME + 30 * SECOND, membership.END_LEAVE)
+    assert timeline.host_intervals(HOST_3, GROUP_2)[2].end_reason == membership.END_CAPTURE
+
+    members = timeline.members(GROUP_1, START_TIME + 17 * SECOND)
+    assert [packet.int_to_ip(interval.host) for interval in members] == [HOST_1, HOST_2]
+    assert timeline.membership(HOST_1, GROUP_1, START_TIME + 20 * SECOND) is None
+    assert timeline.membership(HOST_2, GROUP_1, START_TIME + 20 * SECOND).start_ns == START_TIME + 15 * SECOND
+    # After the leave of the first host, the second host keeps the group joined until the first host joined
+    # again, which times out last
+    assert timeline.joined_until(GROUP_1, START_TIME + 20 * SECOND) == START_TIME + 300 * SECOND
+    assert timeline.joined_until(GROUP_1, START_TIME + 350 * SECOND) is None
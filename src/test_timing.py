@@ -0,0 +1,103 @@
+"""Timing analysis test suite
+The tests in this test suite validate the membership report timing analysis of lib/timing.py
+against timestamps with a known answer, so they run without a DUT or network interface.
+"""
+import numpy as np
+import pytest
+import lib.timing as timing
+
+START_TIME = 1704067200 * 1000000000
+
+
+def test_report_rates_window_boundary():
+    """Verify that a report exactly at the end of a window isn't counted in that window"""
+    times = START_TIME + np.arange(100, dtype=np.int64) * 100000
+    rates = timing.analyse_report_rates(times, np.repeat([1, 2], 50))
+    assert rates["windows"][0.001]["peak_count"] == 10
+    assert rates["windows"][0.01]["peak_count"] == 100
+    assert rates["per_key"][1][0.001]["peak_count"] == 10
+    assert rates["per_key"][2][0.01]["peak_count"] == 50
+
+
+def test_report_rates_single_report():
+    """Verify that no rate is derived from a window containing a single report"""
+    rates = timing.analyse_report_rates(np.array([START_TIME, START_TIME + 500000000]))
+    for window in timing.RATE_WINDOWS:
+        assert rates["windows"][window]["peak_count"] == 1
+        assert rates["windows"][window]["peak_rate"] is None
+
+
+def test_timing_per_key():
+    """Verify the latencies, gaps, percentiles and bursts per key against a straightforward calculation"""
+    rng = np.random.default_rng(0)
+    latencies = rng.uniform(0, 1, 300)
+    keys = rng.integers(0, 5, 300)
+    stats = timing.analyse_timing_per_key(START_TIME, START_TIME + (latencies * 1e9).astype(np.int64), keys)
+    assert sorted(stats) == [0, 1, 2, 3, 4]
+    for key, result in stats.items():
+        expected = np.sort(np.floor(latencies[keys == key] * 1e9) / 1e9)
+        gaps = np.diff(expected, prepend=0.0)
+        assert result["count"] == len(expected)
+        assert result["first_latency"] == pytest.approx(expected[0])
+        assert result["last_latency"] == pytest.approx(expected[-1])
+        for percentile in timing.PERCENTILES:
+            assert result["latency_percentiles"][percentile] == pytest.approx(np.percentile(expected, percentile))
+            assert result["gap_percentiles"][percentile] == pytest.approx(np.percentile(gaps, percentile))
+
+
+def test_timing_bursts():
+    """Verify that the largest burst counts the responses following each other within the burst interval"""
+    offsets = [0.1, 0.1005, 0.101, 0.1012, 0.5, 0.5009, 0.9, 0.2, 0.3, 0.4]
+    keys = [1, 1, 1, 1, 1, 1, 1, 2, 2, 2]
+    times = START_TIME + (np.array(offsets) * 1e9).astype(np.int64)
+    stats = timing.analyse_timing_per_key(START_TIME, times, keys)
+    assert stats[1]["max_burst"] == 4
+    assert stats[2]["max_burst"] == 1
+
+    result = timing.analyse_timing(START_TIME, times)
+    assert result["count"] == len(offsets)
+    assert result["max_burst"] == 4
+    assert result["latencies"] == pytest.approx(sorted(offsets))
+
+
+def test_timing_nanosecond_precision():
+    """Verify that nanosecond timestamps keep their precision, which float seconds since the epoch don't"""
+    latencies = timing.seconds_since(START_TIME, np.array([START_TIME + 1, START_TIME + 1000000001]))
+    assert latencies.tolist() == [1e-9, 1.000000001]
+
+
+def test_match_responses():
+    """Verify that every query is matched with the first response after it, within the maximum response time"""
+    queries = START_TIME + np.array([0, 2000, 4000, 6000]) * 1000000
+    responses = START_TIME + np.array([4900, 3500, 400]) * 1000000
+    latencies = timing.match_responses(queries, responses, 1.0)
+    assert latencies[0] == pytest.approx(0.4)
+    assert np.isnan(latencies[1])
+    assert latencies[2] == pytest.approx(0.9)
+    assert np.isnan(latencies[3])
+
+
+def _samples_with_statistic(n, scaled):
+    # Evenly spread samples compressed towards 0, the largest distance to the uniform distribution function
+    # is at the last sample: D = 1 - c + c / (2n)
+    statistic = scaled / (np.sqrt(n) + 0.12 + 0.11 / np.sqrt(n))
+    c = (1 - statistic) / (1 - 0.5 / n)
+    return c * (np.arange(n) + 0.5) / n, statistic
+
+
+@pytest.mark.parametrize("scaled, p_value", [(1.224, 0.10), (1.358, 0.05), (1.628, 0.01)])
+def test_uniformity_test_critical_values(scaled, p_value):
+    """Verify the statistic and the p-value at the critical values of the Kolmogorov distribution"""
+    samples, statistic = _samples_with_statistic(50, scaled)
+    result = timing.uniformity_test(samples * 2, 2)
+    assert result[0] == pytest.approx(statistic)
+    assert result[1] == pytest.approx(p_value, abs=0.001)
+
+
+def test_uniformity_test_samples():
+    """Verify that uniform samples aren't rejected and clustered samples are"""
+    rng = np.random.default_rng(0)
+    assert timing.uniformity_test(rng.uniform(0, 1, 50), 1)[1] > 0.05
+    assert timing.uniformity_test(rng.uniform(0, 0.3, 50), 1)[1] < 1e-6
+    statistic, p_value = timing.uniformity_test([], 1)
+    assert np.isnan(statistic) and np.isnan(p_value)
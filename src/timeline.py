@@ -0,0 +1,62 @@
+"""Membership timeline
+Reconstructs the IGMP membership of every host and group in a capture, e.g. to debug dropped streams
+in field captures: which hosts were a member of a group when the stream dropped, and when did they leave.
+
+Usage:
+    python src/timeline.py capture.pcapng
+    python src/timeline.py capture.pcapng --group 239.255.0.1 --at 1700000000.5
+    python src/timeline.py capture.pcapng --host 10.0.0.20 --group 239.255.0.1
+
+Times are in seconds since the epoch, as shown by Wireshark with View > Time Display Format > Seconds Since Epoch.
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+
+import lib.membership as membership
+import lib.packet as packet
+
+
+def format_time(time_ns):
+    return datetime.fromtimestamp(time_ns / 1e9, timezone.utc).isoformat(timespec="microseconds")
+
+
+def print_interval(interval):
+    sources = ", ".join(packet.int_to_ip(source) for source in sorted(interval.sources))
+    print(f"  {packet.int_to_ip(interval.host):<15} {packet.int_to_ip(interval.group):<15} "
+          f"{format_time(interval.start_ns)} - {format_time(interval.end_ns)} "
+          f"({(interval.end_ns - interval.start_ns) / 1e9:.3f} s) {interval.mode}({sources}), "
+          f"last report {format_time(interval.last_report_ns)}, ended by {interval.end_reason}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconstruct the IGMP membership timeline of a capture")
+    parser.add_argument("capture", help="pcap or pcapng file")
+    parser.add_argument("--group", help="only show this group")
+    parser.add_argument("--host", help="only show this host")
+    parser.add_argument("--at", type=float, help="only show the memberships at this time (seconds since the epoch)")
+    parser.add_argument("--membership-interval", type=float, default=membership.GROUP_MEMBERSHIP_INTERVAL,
+                        help="time in seconds after the last report at which a membership times out")
+    args = parser.parse_args(argv)
+
+    timeline = membership.build_timeline(args.capture, args.membership_interval)
+    groups = [packet.ip_to_int(args.group)] if args.group else timeline.groups()
+    at_ns = int(args.at * 1e9) if args.at is not None else None
+    for group in groups:
+        print(f"Group {packet.int_to_ip(group)}:")
+        if at_ns is not None:
+            intervals = timeline.members(group, at_ns)
+            until = timeline.joined_until(group, at_ns)
+            if until is not None:
+                print(f"  joined without interruption until {format_time(until)}")
+        else:
+            hosts = [args.host] if args.host else timeline.hosts(group)
+            intervals = [interval for host in hosts for interval in timeline.host_intervals(host, group)]
+        for interval in intervals:
+            if args.host is None or interval.host == packet.ip_to_int(args.host):
+                print_interval(interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())